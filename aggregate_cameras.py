@@ -2,144 +2,51 @@
 """
 Traffic Camera Data Aggregator
 Processes camera data from multiple sources into a standardized JSON format.
+
+Works on feeds already saved to disk (e.g. with curl) and normalizes them
+with the same field mappings as fetch_all_cameras.py. Source metadata
+comes from SOURCES there, so nothing is duplicated here.
+
+Usage:
+    python aggregate_cameras.py [--input-dir DIR] [--output PATH] [--feeds FILE]
+                                [--coords flag|fix]
 """
 
+import argparse
 import json
-from datetime import datetime
+import os
+from datetime import datetime, timezone
+
+from camera_table import to_json
+from fetch_all_cameras import OUTPUT_FILE, SOURCES
+from field_mappings import PROCESSORS, load_feeds
+from output_writers import temp_path
+from validate_coordinates import print_report, total_issues, validate_sources
+
+# Configuration
+INPUT_DIR = "."
+LOCAL_FEEDS = [  # (source id in SOURCES, saved feed file under the input dir)
+    ("ny_nycdot", "nyc_cameras.json"),
+    ("ca_caltrans_d7", "caltrans_d7.json"),
+    ("ny_511ny", "511ny_cameras.json"),
+    ("fl_fl511", "fl511_cameras.json"),
+]
 
 def load_json(filepath):
     """Load JSON from file."""
     with open(filepath, 'r') as f:
         return json.load(f)
 
-def process_nyc_dot(data):
-    """Process NYC DOT camera data."""
-    cameras = []
-    for cam in data:
-        cameras.append({
-            "camera_id": cam.get("id", ""),
-            "name": cam.get("name", ""),
-            "latitude": cam.get("latitude"),
-            "longitude": cam.get("longitude"),
-            "image_url": cam.get("imageUrl", ""),
-            "stream_url": None,
-            "direction": None,
-            "road": None,
-            "status": "online" if cam.get("isOnline") == "true" else "offline",
-            "raw_metadata": {
-                "area": cam.get("area", "")
-            }
-        })
-    return {
-        "source_id": "ny_nycdot",
-        "source_name": "NYC DOT",
-        "source_url": "https://webcams.nyctmc.org/api/cameras",
-        "state": "NY",
-        "jurisdiction_type": "City",
-        "last_fetched": datetime.utcnow().isoformat() + "Z",
-        "api_type": "REST/JSON",
-        "camera_count": len(cameras),
-        "cameras": cameras
-    }
-
-def process_caltrans_d7(data):
-    """Process Caltrans District 7 camera data."""
-    cameras = []
-    for item in data.get("data", []):
-        cam = item.get("cctv", {})
-        loc = cam.get("location", {})
-        img = cam.get("imageData", {})
-        static = img.get("static", {})
-
-        cameras.append({
-            "camera_id": cam.get("index", ""),
-            "name": loc.get("locationName", ""),
-            "latitude": float(loc.get("latitude", 0)) if loc.get("latitude") else None,
-            "longitude": float(loc.get("longitude", 0)) if loc.get("longitude") else None,
-            "image_url": static.get("currentImageURL", ""),
-            "stream_url": img.get("streamingVideoURL"),
-            "direction": loc.get("direction"),
-            "road": loc.get("route"),
-            "status": "online" if cam.get("inService") == "true" else "offline",
-            "raw_metadata": {
-                "district": loc.get("district"),
-                "county": loc.get("county"),
-                "nearbyPlace": loc.get("nearbyPlace"),
-                "elevation": loc.get("elevation"),
-                "postmile": loc.get("postmile"),
-                "milepost": loc.get("milepost")
-            }
-        })
-    return {
-        "source_id": "ca_caltrans_d7",
-        "source_name": "Caltrans District 7 - LA Metro",
-        "source_url": "https://cwwp2.dot.ca.gov/data/d7/cctv/cctvStatusD07.json",
-        "state": "CA",
-        "jurisdiction_type": "State District",
-        "last_fetched": datetime.utcnow().isoformat() + "Z",
-        "api_type": "REST/JSON",
-        "camera_count": len(cameras),
-        "cameras": cameras
-    }
-
-def process_511ny(data):
-    """Process 511NY camera data."""
-    cameras = []
-    cam_list = data.get("item2", [])
-    for cam in cam_list:
-        loc = cam.get("location", [])
-        cameras.append({
-            "camera_id": cam.get("itemId", ""),
-            "name": cam.get("title", ""),
-            "latitude": loc[0] if len(loc) > 0 else None,
-            "longitude": loc[1] if len(loc) > 1 else None,
-            "image_url": f"https://511ny.org/map/Ede/Cameras/{cam.get('itemId', '')}",
-            "stream_url": None,
-            "direction": None,
-            "road": None,
-            "status": "online",
-            "raw_metadata": {}
-        })
+def process_file(source, filepath):
+    """Normalize one saved feed into a source entry."""
+    cameras = PROCESSORS[source["processor"]](load_json(filepath), source)
     return {
-        "source_id": "ny_511ny",
-        "source_name": "511NY - New York State",
-        "source_url": "https://511ny.org/map/mapIcons/Cameras",
-        "state": "NY",
-        "jurisdiction_type": "State",
-        "last_fetched": datetime.utcnow().isoformat() + "Z",
-        "api_type": "REST/JSON",
-        "camera_count": len(cameras),
-        "cameras": cameras
-    }
-
-def process_fl511(data):
-    """Process FL511 camera data."""
-    cameras = []
-    cam_list = data.get("item2", [])
-    for cam in cam_list:
-        loc = cam.get("location", [])
-        expando = cam.get("expando", {})
-        cameras.append({
-            "camera_id": cam.get("itemId", ""),
-            "name": cam.get("title", ""),
-            "latitude": loc[0] if len(loc) > 0 else None,
-            "longitude": loc[1] if len(loc) > 1 else None,
-            "image_url": f"https://fl511.com/map/Cameras/{cam.get('itemId', '')}",
-            "stream_url": None,
-            "direction": None,
-            "road": None,
-            "status": "online",
-            "raw_metadata": {
-                "videoEnabled": expando.get("videoEnabled", False)
-            }
-        })
-    return {
-        "source_id": "fl_fl511",
-        "source_name": "FL511 - Florida",
-        "source_url": "https://fl511.com/map/mapIcons/Cameras",
-        "state": "FL",
-        "jurisdiction_type": "State",
-        "last_fetched": datetime.utcnow().isoformat() + "Z",
+        "source_id": source["id"],
+        "source_name": source["name"],
+        "source_url": source["url"],
+        "state": source["state"],
+        "jurisdiction_type": source["type"],
+        "last_fetched": datetime.now(timezone.utc).isoformat(),
         "api_type": "REST/JSON",
         "camera_count": len(cameras),
         "cameras": cameras
@@ -147,63 +54,47 @@ def process_fl511(data):
 
 def main():
     """Main function to aggregate all camera data."""
+    parser = argparse.ArgumentParser(description="Aggregate camera feeds saved to disk.")
+    parser.add_argument("--input-dir", default=INPUT_DIR,
+                        help=f"directory holding the saved feeds (default: {INPUT_DIR})")
+    parser.add_argument("--output", default=OUTPUT_FILE,
+                        help=f"output path (default: {OUTPUT_FILE})")
+    parser.add_argument("--feeds", action="append", default=[], metavar="FILE",
+                        help="JSON file of extra mappings and sources; sources with a "
+                             "\"file\" key are read from the input dir (repeatable)")
+    parser.add_argument("--coords", choices=("flag", "fix"),
+                        help="validate all coordinates in one pass (needs numpy): flag only "
+                             "counts problems, fix also repairs them")
+    args = parser.parse_args()
+
+    by_id = {source["id"]: source for source in SOURCES}
+    local = [(by_id[source_id], filename) for source_id, filename in LOCAL_FEEDS]
+    for path in args.feeds:
+        local += [(source, source["file"]) for source in load_feeds(path) if source.get("file")]
+
     sources = []
     total_cameras = 0
     sources_processed = 0
     sources_failed = 0
 
-    # Process NYC DOT
-    try:
-        nyc_data = load_json("/tmp/nyc_cameras.json")
-        nyc_source = process_nyc_dot(nyc_data)
-        sources.append(nyc_source)
-        total_cameras += nyc_source["camera_count"]
-        sources_processed += 1
-        print(f"NYC DOT: {nyc_source['camera_count']} cameras")
-    except Exception as e:
-        print(f"Failed to process NYC DOT: {e}")
-        sources_failed += 1
-
-    # Process Caltrans D7
-    try:
-        caltrans_data = load_json("/tmp/caltrans_d7.json")
-        caltrans_source = process_caltrans_d7(caltrans_data)
-        sources.append(caltrans_source)
-        total_cameras += caltrans_source["camera_count"]
-        sources_processed += 1
-        print(f"Caltrans D7: {caltrans_source['camera_count']} cameras")
-    except Exception as e:
-        print(f"Failed to process Caltrans D7: {e}")
-        sources_failed += 1
-
-    # Process 511NY
-    try:
-        ny511_data = load_json("/tmp/511ny_cameras.json")
-        ny511_source = process_511ny(ny511_data)
-        sources.append(ny511_source)
-        total_cameras += ny511_source["camera_count"]
-        sources_processed += 1
-        print(f"511NY: {ny511_source['camera_count']} cameras")
-    except Exception as e:
-        print(f"Failed to process 511NY: {e}")
-        sources_failed += 1
-
-    # Process FL511
-    try:
-        fl511_data = load_json("/tmp/fl511_cameras.json")
-        fl511_source = process_fl511(fl511_data)
-        sources.append(fl511_source)
-        total_cameras += fl511_source["camera_count"]
-        sources_processed += 1
-        print(f"FL511: {fl511_source['camera_count']} cameras")
-    except Exception as e:
-        print(f"Failed to process FL511: {e}")
-        sources_failed += 1
+    for source, filename in local:
+        try:
+            entry = process_file(source, os.path.join(args.input_dir, filename))
+            sources.append(entry)
+            total_cameras += entry["camera_count"]
+            sources_processed += 1
+            print(f"{source['name']}: {entry['camera_count']} cameras")
+        except Exception as e:
+            print(f"Failed to process {source['name']}: {e}")
+            sources_failed += 1
+
+    if args.coords:
+        coordinate_report = validate_sources(sources, fix=args.coords == "fix")
 
     # Create aggregated output
     output = {
         "metadata": {
-            "generated_at": datetime.utcnow().isoformat() + "Z",
+            "generated_at": datetime.now(timezone.utc).isoformat(),
             "total_cameras": total_cameras,
             "sources_processed": sources_processed,
             "sources_failed": sources_failed,
@@ -211,14 +102,19 @@ def main():
         },
         "sources": sources
     }
+    if args.coords:
+        output["metadata"]["coordinate_issues"] = total_issues(coordinate_report)
 
     # Write output file
-    output_path = "/Users/robert/Desktop/getargus_projects/Camera location test file/traffic_cameras_aggregated.json"
-    with open(output_path, 'w') as f:
-        json.dump(output, f, indent=2)
+    tmp = temp_path(args.output)
+    with open(tmp, 'w') as f:
+        json.dump(output, f, indent=2, default=to_json)
+    os.replace(tmp, args.output)
 
+    if args.coords:
+        print_report(coordinate_report, fixed=args.coords == "fix")
     print(f"\nAggregated {total_cameras} cameras from {sources_processed} sources")
-    print(f"Output written to: {output_path}")
+    print(f"Output written to: {args.output}")
 
 if __name__ == "__main__":
     main()
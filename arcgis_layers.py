@@ -0,0 +1,204 @@
+#!/usr/bin/env python3
+"""
+Complete, trimmed downloads of ArcGIS MapServer/FeatureServer layers.
+
+A plain ``query?where=1=1&outFields=*&f=json`` is silently cut off at the
+layer's maxRecordCount and returns every attribute. For sources whose URL
+is a layer query and whose mapping reads Esri "features", fetch_layer()
+instead:
+
+    1. reads the layer description (?f=json) for maxRecordCount, the
+       object-id field and the field list
+    2. asks for the matching object ids only (returnIdsOnly=true)
+    3. splits the sorted ids into ranges of at most maxRecordCount and
+       fetches the ranges in parallel as
+       ``(<where>) AND OBJECTID >= lo AND OBJECTID <= hi``, halving any
+       range the server still reports as exceededTransferLimit
+    4. requests only the attributes the field mapping reads, in WGS84
+       (outSR=4326), and skips the geometry when the mapping can take
+       latitude/longitude from attributes the layer has
+
+The pages are concatenated in object-id order and normalized by the
+source's processor in one call. Layers without the metadata (older
+servers, non-query URLs) return None so the caller falls back to the
+single request.
+
+Cached layers are revalidated on the layer description: it is the first
+request anyway, it is small, and it carries the layer's last edit date,
+so its validators change with the data. A 304 there returns NOT_MODIFIED
+before any query runs on the server.
+
+Usage:
+    python arcgis_layers.py "<layer query URL>"
+"""
+
+import json
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+import metrics
+from camera_table import to_json
+from feed_stream import loads
+from field_mappings import MAPPINGS, PROCESSORS
+
+# Configuration
+PAGE_WORKERS = 4  # Pages of one layer fetched concurrently
+DEFAULT_MAX_RECORDS = 1000  # When the layer does not advertise maxRecordCount
+GEOMETRY_PRECISION = 6  # Decimal places of returned coordinates (~0.1 m)
+
+NOT_MODIFIED = "not modified"  # fetch_layer() result for a 304 layer description
+
+
+def is_layer_query(source):
+    """True for Esri query URLs whose mapping reads the "features" array."""
+    spec = MAPPINGS.get(source["processor"], {})
+    return spec.get("items") == "features" and urlsplit(source["url"]).path.endswith("/query")
+
+
+def mapping_paths(spec):
+    """All dotted paths a field-mapping spec reads."""
+    paths = []
+
+    def walk(field):
+        if isinstance(field, str):
+            paths.append(field)
+        elif isinstance(field, dict):
+            path = field.get("path")
+            paths.extend([path] if isinstance(path, str) else path or [])
+            paths.extend(field.get("coalesce", []))
+            if "when" in field:
+                paths.append(field["when"])
+            for nested in field.get("fields", {}).values():
+                walk(nested)
+
+    for field in spec["fields"].values():
+        walk(field)
+    return paths
+
+
+def _get(fetch, url, params, headers=None):
+    with metrics.timed("request"):
+        response = fetch(f"{url}?{urlencode(params)}", headers=headers)
+    if response is None:
+        raise ConnectionError(f"request to {url} failed")
+    return response
+
+
+def _get_json(fetch, url, params):
+    return _read_json(_get(fetch, url, params))
+
+
+def _read_json(response):
+    try:
+        with metrics.timed("parse"):
+            data = loads(response.content)
+        metrics.response_done(response)
+    finally:
+        response.close()
+    if isinstance(data, dict) and "error" in data:
+        error = data["error"]
+        raise ValueError(f"ArcGIS error {error.get('code')}: {error.get('message')}")
+    return data
+
+
+def plan_pages(object_ids, page_size):
+    """Sorted ids split into pages of at most page_size ids."""
+    ids = sorted(object_ids)
+    return [ids[i:i + page_size] for i in range(0, len(ids), page_size)]
+
+
+def fetch_layer(source, fetch, workers=PAGE_WORKERS, headers=None):
+    """Fetch every feature of a layer query source and normalize it.
+
+    ``fetch(url, headers=None)`` returns a response or None
+    (fetch_response). ``headers`` are sent with the layer description
+    only, normally FeedCache.conditional_headers(). Returns ``(cameras,
+    pages, validators)`` with the description's response headers as the
+    validators, NOT_MODIFIED when the description answered 304, or None
+    when the layer does not describe itself well enough to page through.
+    """
+    parts = urlsplit(source["url"])
+    query_url = urlunsplit((parts.scheme, parts.netloc, parts.path, "", ""))
+    layer_url = query_url[:-len("/query")]
+    where = dict(parse_qsl(parts.query)).get("where", "1=1")
+
+    try:
+        response = _get(fetch, layer_url, {"f": "json"}, headers)
+        if response.status_code == 304:
+            metrics.response_done(response)
+            response.close()
+            return NOT_MODIFIED
+        validators = response.headers
+        layer = _read_json(response)
+    except (ConnectionError, ValueError):
+        return None
+    fields = {field["name"]: field.get("type") for field in layer.get("fields") or []}
+    oid_field = layer.get("objectIdField") or next(
+        (name for name, kind in fields.items() if kind == "esriFieldTypeOID"), None)
+    if not fields or oid_field is None:
+        return None
+    page_size = layer.get("maxRecordCount") or DEFAULT_MAX_RECORDS
+
+    ids = _get_json(fetch, query_url, {"where": where, "returnIdsOnly": "true", "f": "json"})
+    oid_field = ids.get("objectIdFieldName") or oid_field
+    object_ids = ids.get("objectIds") or []
+
+    paths = mapping_paths(MAPPINGS[source["processor"]])
+    wanted = sorted({path.split(".")[1] for path in paths if path.startswith("attributes.")}
+                    & fields.keys())
+    # Geometry is only a fallback; skip it when the attributes carry the position
+    needs_geometry = any(path.startswith("geometry") for path in paths) and not (
+        {"lat", "long"} <= set(wanted))
+    params = {"outFields": ",".join(wanted) or oid_field, "outSR": "4326", "f": "json",
+              "returnGeometry": "true" if needs_geometry else "false"}
+    if needs_geometry:
+        params["geometryPrecision"] = GEOMETRY_PRECISION
+
+    def fetch_page(page):
+        page_where = f"({where}) AND {oid_field} >= {page[0]} AND {oid_field} <= {page[-1]}"
+        data = _get_json(fetch, query_url, dict(params, where=page_where))
+        if data.get("exceededTransferLimit") and len(page) > 1:
+            # The server capped the page below maxRecordCount; split it
+            half = len(page) // 2
+            return fetch_page(page[:half]) + fetch_page(page[half:])
+        return data.get("features", [])
+
+    record = metrics.current()
+
+    def run_page(page):
+        # Pool threads report into the caller's process_source record
+        with metrics.branch(record):
+            return fetch_page(page)
+
+    pages = plan_pages(object_ids, page_size)
+    features = []
+    if pages:
+        with ThreadPoolExecutor(max_workers=max(1, min(workers, len(pages)))) as pool:
+            for page in pool.map(run_page, pages):
+                features.extend(page)
+    with metrics.timed("normalize"):
+        cameras = PROCESSORS[source["processor"]]({"features": features}, source)
+    return cameras, len(pages), validators
+
+
+def main():
+    from fetch_all_cameras import fetch_response
+
+    if len(sys.argv) < 2:
+        print(__doc__)
+        sys.exit(1)
+    source = {"id": "arcgis_layer", "name": "ArcGIS layer", "url": sys.argv[1],
+              "processor": "arcgis", "state": "", "type": ""}
+    fetched = fetch_layer(source, fetch_response)
+    if fetched is None:
+        print("Layer metadata unavailable; use a plain query instead")
+        sys.exit(1)
+    cameras, pages, _ = fetched
+    print(f"{len(cameras)} cameras in {pages} pages")
+    json.dump(cameras[:3], sys.stdout, indent=2, default=to_json)
+    print()
+
+
+if __name__ == "__main__":
+    main()
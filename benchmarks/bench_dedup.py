@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Check and benchmark cross-source deduplication.
+
+A few hand-built cases with known answers are run first (overlapping
+sources, the NB/SB cameras of one interchange next to a single camera
+from another source, a chain of near cameras within one source), then
+dedup() is timed on synthetic overlapping sources. Exits non-zero when a
+case gives the wrong clusters.
+
+Usage:
+    python benchmarks/bench_dedup.py [cameras_per_source] [repeats]
+"""
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dedup_cameras import dedup
+
+# ============================================================================
+# CASES
+# ============================================================================
+
+def camera(camera_id, name, lat, lon, road="I-95"):
+    return {"camera_id": camera_id, "name": name, "road": road,
+            "latitude": lat, "longitude": lon}
+
+def source(source_id, *cameras):
+    return {"source_id": source_id, "cameras": list(cameras)}
+
+# (name, sources, expected clusters as sorted "source:camera_id" lists)
+CASES = [
+    ("cross-source pair",
+     [source("A", camera("a1", "I-95 @ Exit 5", 40.0, -74.0)),
+      source("B", camera("b1", "I-95 @ Exit 5", 40.0002, -74.0))],
+     [["A:a1", "B:b1"]]),
+    ("interchange NB/SB with one other-source camera",
+     [source("A", camera("a1", "I-95 @ Exit 5 NB", 40.0, -74.0),
+                  camera("a2", "I-95 @ Exit 5 SB", 40.0004, -74.0)),
+      source("B", camera("b1", "I-95 @ Exit 5", 40.0003, -74.0))],
+     [["A:a1"], ["A:a2", "B:b1"]]),
+    ("same-source chain through two other sources",
+     [source("A", camera("a1", "I-95 @ Exit 5", 40.0, -74.0),
+                  camera("a2", "I-95 @ Exit 5", 40.0008, -74.0)),
+      source("B", camera("b1", "I-95 @ Exit 5", 40.0002, -74.0)),
+      source("C", camera("c1", "I-95 @ Exit 5", 40.0006, -74.0))],
+     [["A:a1", "B:b1"], ["A:a2", "C:c1"]]),
+    ("dissimilar names stay apart",
+     [source("A", camera("a1", "Main St @ 1st Ave", 40.0, -74.0, road="Main St")),
+      source("B", camera("b1", "I-95 @ Exit 5", 40.0002, -74.0))],
+     [["A:a1"], ["B:b1"]]),
+]
+
+def clusters(canonical):
+    return sorted(sorted(f"{link['source_id']}:{link['camera_id']}" for link in record["sources"])
+                  for record in canonical)
+
+def check_cases():
+    failures = 0
+    for name, sources, expected in CASES:
+        canonical, report = dedup(sources)
+        got = clusters(canonical)
+        removed = sum(report["removed_by_source"].values())
+        ok = got == sorted(expected) and removed == report["duplicates_removed"]
+        failures += not ok
+        print(f"{'ok' if ok else 'FAIL':<5} {name}" + ("" if ok else f": {got}"))
+    return failures
+
+# ============================================================================
+# SYNTHETIC SOURCES
+# ============================================================================
+
+def overlapping_sources(n, count=3):
+    """``count`` sources covering the same n cameras, each slightly offset."""
+    return [source(f"s{k}", *(camera(f"{k}-{i}", f"I-87 @ Exit {i}",
+                                     42.0 + i * 1e-3 + k * 1e-4, -73.8 + (i % 7) * 1e-3)
+                              for i in range(n)))
+            for k in range(count)]
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    repeats = int(sys.argv[2]) if len(sys.argv) > 2 else 3
+
+    failures = check_cases()
+    sources = overlapping_sources(n)
+    total = sum(len(s["cameras"]) for s in sources)
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        _, report = dedup(sources)
+        best = min(best, time.perf_counter() - start)
+    print(f"dedup {total:,} cameras: {total / best:,.0f} c/s, "
+          f"{report['unique_cameras']:,} unique")
+    sys.exit(1 if failures else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+"""
+Benchmark the compiled field mappings against the hand-written processors
+they replaced.
+
+The original process_* functions are kept below verbatim as the
+reference. For every feed format a synthetic feed is normalized by both,
+the outputs are checked for equality and the best-of-N throughput is
+printed.
+
+Usage:
+    python benchmarks/bench_field_mappings.py [cameras_per_feed] [repeats]
+"""
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from field_mappings import PROCESSORS
+
+# ============================================================================
+# REFERENCE (HAND-WRITTEN) PROCESSORS
+# ============================================================================
+
+def process_nyc_dot(data, source):
+    """Process NYC DOT format."""
+    cameras = []
+    for cam in data:
+        cameras.append({
+            "camera_id": cam.get("id", ""),
+            "name": cam.get("name", ""),
+            "latitude": cam.get("latitude"),
+            "longitude": cam.get("longitude"),
+            "image_url": cam.get("imageUrl", ""),
+            "stream_url": None,
+            "direction": None,
+            "road": None,
+            "status": "online" if cam.get("isOnline") == "true" else "offline",
+            "raw_metadata": {"area": cam.get("area", "")}
+        })
+    return cameras
+
+def process_511_system(data, source):
+    """Process 511 system format (item1=icon, item2=cameras array)."""
+    return process_511_items(data.get("item2", []), source)
+
+def process_511_items(cam_list, source):
+    """Normalize an iterable of 511 "item2" entries."""
+    cameras = []
+    base_url = source["url"].rsplit("/map/", 1)[0]
+    for cam in cam_list:
+        loc = cam.get("location", [])
+        expando = cam.get("expando", {})
+        video_url = (expando.get("videoUrl") or expando.get("VideoUrl")
+                     or cam.get("videoUrl") or cam.get("VideoUrl"))
+        cameras.append({
+            "camera_id": str(cam.get("itemId", "")),
+            "name": cam.get("title", ""),
+            "latitude": loc[0] if len(loc) > 0 else None,
+            "longitude": loc[1] if len(loc) > 1 else None,
+            "image_url": f"{base_url}/map/Cameras/{cam.get('itemId', '')}",
+            "stream_url": video_url,
+            "direction": None,
+            "road": None,
+            "status": "online",
+            "raw_metadata": {"videoEnabled": expando.get("videoEnabled", False)} if expando else {}
+        })
+    return cameras
+
+def process_caltrans(data, source):
+    """Process Caltrans format."""
+    return process_caltrans_items(data.get("data", []), source)
+
+def process_caltrans_items(items, source):
+    """Normalize an iterable of Caltrans "data" entries."""
+    cameras = []
+    for item in items:
+        cam = item.get("cctv", {})
+        loc = cam.get("location", {})
+        img = cam.get("imageData", {})
+        static = img.get("static", {})
+        cameras.append({
+            "camera_id": cam.get("index", ""),
+            "name": loc.get("locationName", ""),
+            "latitude": float(loc.get("latitude", 0)) if loc.get("latitude") else None,
+            "longitude": float(loc.get("longitude", 0)) if loc.get("longitude") else None,
+            "image_url": static.get("currentImageURL", ""),
+            "stream_url": img.get("streamingVideoURL"),
+            "direction": loc.get("direction"),
+            "road": loc.get("route"),
+            "status": "online" if cam.get("inService") == "true" else "offline",
+            "raw_metadata": {
+                "district": loc.get("district"),
+                "county": loc.get("county"),
+                "nearbyPlace": loc.get("nearbyPlace"),
+                "elevation": loc.get("elevation"),
+                "postmile": loc.get("postmile"),
+                "milepost": loc.get("milepost")
+            }
+        })
+    return cameras
+
+def process_arcgis(data, source):
+    """Process ArcGIS REST API format."""
+    return process_arcgis_items(data.get("features", []), source)
+
+def process_arcgis_items(features, source):
+    """Normalize an iterable of ArcGIS "features" entries."""
+    cameras = []
+    for feature in features:
+        attrs = feature.get("attributes", {})
+        geom = feature.get("geometry", {})
+        cameras.append({
+            "camera_id": str(attrs.get("OBJECTID", attrs.get("feedID", ""))),
+            "name": attrs.get("location", attrs.get("name", "")),
+            "latitude": attrs.get("lat", geom.get("y")),
+            "longitude": attrs.get("long", geom.get("x")),
+            "image_url": attrs.get("url", ""),
+            "stream_url": None,
+            "direction": None,
+            "road": None,
+            "status": "online",
+            "raw_metadata": {
+                "county": attrs.get("county"),
+                "feedID": attrs.get("feedID")
+            }
+        })
+    return cameras
+
+LEGACY_PROCESSORS = {
+    "nyc_dot": process_nyc_dot,
+    "511_system": process_511_system,
+    "caltrans": process_caltrans,
+    "arcgis": process_arcgis,
+}
+
+# ============================================================================
+# SYNTHETIC FEEDS
+# ============================================================================
+
+def nyc_dot_feed(n):
+    return [{"id": f"nyc-{i}", "name": f"Broadway @ {i} St", "latitude": 40.7 + i * 1e-5,
+             "longitude": -74.0 + i * 1e-5, "imageUrl": f"https://webcams.nyctmc.org/{i}.jpg",
+             "isOnline": "true" if i % 5 else "false", "area": "Manhattan"} for i in range(n)]
+
+def feed_511(n):
+    cameras = []
+    for i in range(n):
+        camera = {"itemId": i, "title": f"I-87 @ Exit {i}", "location": [42.0 + i * 1e-4, -73.8]}
+        if i % 2:
+            camera["expando"] = {"videoEnabled": True, "videoUrl": f"https://v.example/{i}.m3u8"}
+        cameras.append(camera)
+    return {"item1": {"icon": "camera"}, "item2": cameras}
+
+def caltrans_feed(n):
+    return {"data": [{"cctv": {
+        "index": str(i), "inService": "true" if i % 3 else "false",
+        "location": {"locationName": f"I-5 at Exit {i}",
+                     "latitude": str(34.0 + i * 1e-4) if i % 50 else "",
+                     "longitude": str(-118.2 + i * 1e-4), "direction": "North",
+                     "route": "I-5", "district": "7", "county": "Los Angeles",
+                     "nearbyPlace": "Burbank", "elevation": "150", "postmile": "20.1",
+                     "milepost": "20.1"},
+        "imageData": {"static": {"currentImageURL": f"https://cwwp2.dot.ca.gov/{i}.jpg"},
+                      "streamingVideoURL": f"https://wzmedia.dot.ca.gov/{i}.m3u8"}}}
+        for i in range(n)]}
+
+def arcgis_feed(n):
+    return {"features": [{"attributes": {"OBJECTID": i, "location": f"MD {i}",
+                                         "lat": 39.0 + i * 1e-4, "long": -76.6,
+                                         "url": f"https://chart.example/{i}",
+                                         "county": "Howard", "feedID": f"f{i}"},
+                          "geometry": {"x": -76.6, "y": 39.0}} for i in range(n)]}
+
+FEEDS = {
+    "nyc_dot": (nyc_dot_feed, "https://webcams.nyctmc.org/api/cameras"),
+    "511_system": (feed_511, "https://511ny.org/map/mapIcons/Cameras"),
+    "caltrans": (caltrans_feed, "https://cwwp2.dot.ca.gov/data/d7/cctv/cctvStatusD07.json"),
+    "arcgis": (arcgis_feed, "https://example.gov/arcgis/rest/services/0/query"),
+}
+
+def best_of(func, data, source, repeats):
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        func(data, source)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    repeats = int(sys.argv[2]) if len(sys.argv) > 2 else 7
+
+    print(f"{'format':<12} {'hand-written':>14} {'compiled':>14} {'speedup':>8}  outputs")
+    regressions = 0
+    for name, (make_feed, url) in FEEDS.items():
+        data = make_feed(n)
+        source = {"id": f"bench_{name}", "url": url, "processor": name}
+        same = LEGACY_PROCESSORS[name](data, source) == PROCESSORS[name](data, source)
+        legacy = best_of(LEGACY_PROCESSORS[name], data, source, repeats)
+        compiled = best_of(PROCESSORS[name], data, source, repeats)
+        speedup = legacy / compiled
+        if not same or speedup < 0.95:
+            regressions += 1
+        print(f"{name:<12} {n / legacy:>10,.0f} c/s {n / compiled:>10,.0f} c/s "
+              f"{speedup:>7.2f}x  {'equal' if same else 'DIFFER'}")
+    sys.exit(1 if regressions else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Scaled feed payloads built from the recorded fixtures.
+
+fixtures/<processor>.json holds one small payload per feed format. scale()
+repeats its camera records N times, giving every copy a distinct id and a
+slightly shifted position so dedup, indexing and hashing see realistic
+distinct cameras rather than N identical ones.
+
+Usage:
+    python benchmarks/generate.py caltrans 100 > caltrans_x100.json
+"""
+
+import copy
+import json
+import os
+import sys
+
+FIXTURE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+PROCESSOR_TYPES = ("nyc_dot", "511_system", "caltrans", "arcgis")
+ITEM_KEYS = {"nyc_dot": None, "511_system": "item2", "caltrans": "data", "arcgis": "features"}
+SHIFT_DEG = 0.0007  # Per copy, so copies are never within dedup distance
+
+
+def load_fixture(processor):
+    with open(os.path.join(FIXTURE_DIR, f"{processor}.json"), 'r') as f:
+        return json.load(f)
+
+
+def _items(payload, processor):
+    key = ITEM_KEYS[processor]
+    return payload if key is None else payload[key]
+
+
+def _shift(value, delta):
+    """Shift a coordinate kept as a float or as a numeric string."""
+    if isinstance(value, str):
+        return f"{float(value) + delta:.6f}" if value else value
+    return round(value + delta, 6) if value is not None else None
+
+
+def _copy_record(record, processor, k):
+    record = copy.deepcopy(record)
+    delta = SHIFT_DEG * k
+    if processor == "nyc_dot":
+        record["id"] = f"{record['id']}-{k}"
+        record["latitude"] = _shift(record["latitude"], delta)
+        record["longitude"] = _shift(record["longitude"], delta)
+        record["imageUrl"] = record["imageUrl"].replace("/image", f"-{k}/image")
+    elif processor == "511_system":
+        record["itemId"] = f"{record['itemId']}{k:04d}"
+        record["location"] = [_shift(v, delta) for v in record["location"]]
+    elif processor == "caltrans":
+        cctv = record["cctv"]
+        cctv["index"] = f"{cctv['index']}.{k}"
+        cctv["location"]["latitude"] = _shift(cctv["location"]["latitude"], delta)
+        cctv["location"]["longitude"] = _shift(cctv["location"]["longitude"], delta)
+    else:
+        attrs = record["attributes"]
+        attrs["OBJECTID"] = attrs["OBJECTID"] * 100000 + k
+        attrs["lat"] = _shift(attrs["lat"], delta)
+        attrs["long"] = _shift(attrs["long"], delta)
+        record["geometry"] = {"x": attrs["long"], "y": attrs["lat"]}
+    return record
+
+
+def scale(processor, factor=1, payload=None):
+    """Fixture payload with its cameras repeated ``factor`` times."""
+    payload = payload if payload is not None else load_fixture(processor)
+    records = _items(payload, processor)
+    scaled = list(records)
+    for k in range(1, max(1, int(factor))):
+        scaled.extend(_copy_record(record, processor, k) for record in records)
+    if ITEM_KEYS[processor] is None:
+        return scaled
+    return dict(payload, **{ITEM_KEYS[processor]: scaled})
+
+
+def sized(processor, cameras):
+    """Payload with at least ``cameras`` cameras."""
+    per_copy = len(_items(load_fixture(processor), processor))
+    return scale(processor, -(-cameras // per_copy))
+
+
+def payload_bytes(processor, factor=1):
+    return json.dumps(scale(processor, factor), separators=(",", ":")).encode("utf-8")
+
+
+def main():
+    if len(sys.argv) < 2 or sys.argv[1] not in PROCESSOR_TYPES:
+        print(__doc__)
+        sys.exit(1)
+    factor = int(sys.argv[2]) if len(sys.argv) > 2 else 1
+    sys.stdout.buffer.write(payload_bytes(sys.argv[1], factor))
+
+
+if __name__ == "__main__":
+    main()
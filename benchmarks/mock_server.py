@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for the DOT feed servers.
+
+Serves a fixed path -> payload table over HTTP/1.1 keep-alive with
+configurable behaviour:
+
+    latency        seconds before the response headers
+    bandwidth      bytes/second for the body (0 = unlimited)
+    error_rate     fraction of requests answered 503
+    not_modified   fraction of conditional requests with a matching ETag
+                   answered 304 (the rest get the full body again)
+
+Each real host in SOURCES is mapped to its own loopback address
+(127.0.0.2, 127.0.0.3, ...) on Linux, so per-host politeness and connection
+pooling behave as they do against the live servers.
+
+Usage:
+    python benchmarks/mock_server.py [--port 8765] [--scale 10] [--latency 0.05]
+"""
+
+import argparse
+import hashlib
+import os
+import random
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.generate import payload_bytes  # noqa: E402
+
+# Configuration
+PORT = 8765
+CHUNK = 16 * 1024
+DISTINCT_LOOPBACKS = sys.platform.startswith("linux")  # Other systems only route 127.0.0.1
+
+
+class FeedServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, latency=0.0, bandwidth=0, error_rate=0.0, not_modified=1.0,
+                 seed=1):
+        super().__init__(address, _Handler)
+        self.payloads = {}  # path -> (body, etag)
+        self.latency = latency
+        self.bandwidth = bandwidth
+        self.error_rate = error_rate
+        self.not_modified = not_modified
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.counts = {"requests": 0, "200": 0, "304": 0, "503": 0, "404": 0, "bytes": 0}
+
+    def add(self, path, body):
+        self.payloads[path] = (body, '"%s"' % hashlib.sha1(body).hexdigest())
+
+    def count(self, key, n=1):
+        with self.lock:
+            self.counts[key] += n
+
+    def chance(self, rate):
+        with self.lock:
+            return self.random.random() < rate
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def _empty(self, status, etag=None):
+        self.send_response(status)
+        if etag:
+            self.send_header("ETag", etag)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def do_GET(self):
+        server = self.server
+        server.count("requests")
+        if server.latency:
+            time.sleep(server.latency)
+        entry = server.payloads.get(urlsplit(self.path).path)
+        if entry is None:
+            server.count("404")
+            return self._empty(404)
+        if server.error_rate and server.chance(server.error_rate):
+            server.count("503")
+            return self._empty(503)
+        body, etag = entry
+        if self.headers.get("If-None-Match") == etag and server.chance(server.not_modified):
+            server.count("304")
+            return self._empty(304, etag)
+
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("ETag", etag)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        for start in range(0, len(body), CHUNK):
+            chunk = body[start:start + CHUNK]
+            self.wfile.write(chunk)
+            if server.bandwidth:
+                time.sleep(len(chunk) / server.bandwidth)
+        server.count("200")
+        server.count("bytes", len(body))
+
+
+def mirror_sources(server, sources, scale=1, port=PORT):
+    """Serve a scaled fixture for every source; returns copies pointing at the server."""
+    hosts = {}
+    bodies = {}
+    mirrored = []
+    for source in sources:
+        url = urlsplit(source["url"])
+        if DISTINCT_LOOPBACKS:
+            ip = hosts.setdefault(url.netloc, f"127.0.0.{len(hosts) + 2}")
+        else:
+            ip = "127.0.0.1"
+        body = bodies.get(source["processor"])
+        if body is None:
+            body = bodies[source["processor"]] = payload_bytes(source["processor"], scale)
+        server.add(url.path, body)
+        query = f"?{url.query}" if url.query else ""
+        mirrored.append(dict(source, url=f"http://{ip}:{port}{url.path}{query}"))
+    return mirrored
+
+
+def start(port=PORT, **options):
+    """Run a FeedServer on a background thread."""
+    server = FeedServer(("0.0.0.0" if DISTINCT_LOOPBACKS else "127.0.0.1", port), **options)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    from fetch_all_cameras import SOURCES
+
+    parser = argparse.ArgumentParser(description="Serve scaled camera feed fixtures locally.")
+    parser.add_argument("--port", type=int, default=PORT)
+    parser.add_argument("--scale", type=int, default=1, help="repeat fixture cameras N times")
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--bandwidth", type=float, default=0, help="bytes/second per response")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--not-modified", type=float, default=1.0)
+    args = parser.parse_args()
+
+    server = start(args.port, latency=args.latency, bandwidth=args.bandwidth,
+                   error_rate=args.error_rate, not_modified=args.not_modified)
+    for source in mirror_sources(server, SOURCES, args.scale, args.port):
+        print(f"{source['id']:<20} {source['url']}")
+    print("Serving; Ctrl-C to stop.")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
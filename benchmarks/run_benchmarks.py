@@ -0,0 +1,297 @@
+#!/usr/bin/env python3
+"""
+Offline end-to-end benchmarks for fetch_all_cameras.py and aggregate_cameras.py.
+
+Nothing touches the network. The recorded fixtures in benchmarks/fixtures
+are scaled up (see generate.py) and served by mock_server.py, with every
+real feed host mapped to its own loopback address. Each run executes the
+real main() in a fresh subprocess so peak RSS is per run, and reports:
+
+    wall       end-to-end seconds of main()
+    cams/s     cameras written per wall second
+    peak RSS   max resident set of the run (and its parse workers)
+    stages     seconds summed over all calls of each stage:
+               fetch      fetch_response (headers; whole body when not streaming)
+               parse      parse_cameras / load_json (streaming parses download too)
+               normalize  the compiled field mapping (streamed feeds normalize
+                          while parsing, so it is counted under parse)
+               write      output writer / json.dump
+
+Stage times are summed across fetch threads, so they can exceed wall.
+
+Runs per scale:
+    fetch        cold cache, every feed answered 200
+    fetch-304    same cache again, feeds answered 304 Not Modified
+    aggregate    the LOCAL_FEEDS files written to a temporary input dir
+
+Usage:
+    python benchmarks/run_benchmarks.py [--scales 1 10 100] [--latency 0.05]
+        [--bandwidth BYTES_PER_S] [--error-rate 0.0] [--save FILE]
+        [--baseline FILE] [-- extra fetch_all_cameras.py args]
+
+With --baseline, exits 1 if any run's wall time regressed by more than
+--tolerance (default 20%) against the saved results.
+"""
+
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import types
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# Configuration
+SCALES = (1, 10, 100)
+LATENCY = 0.05  # Seconds before each mock response
+TOLERANCE = 0.20  # Allowed wall-time regression against --baseline
+STAGES = ("fetch", "parse", "normalize", "write")
+
+
+# ============================================================================
+# HARNESS (runs inside the benchmark subprocess)
+# ============================================================================
+
+class StageTimer:
+    """Thread-safe per-stage call counts and summed seconds."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.stages = {stage: {"calls": 0, "seconds": 0.0} for stage in STAGES}
+        self.cameras = 0
+
+    def wrap(self, stage, func):
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                elapsed = time.perf_counter() - start
+                with self.lock:
+                    self.stages[stage]["calls"] += 1
+                    self.stages[stage]["seconds"] += elapsed
+        return timed
+
+    def count(self, cameras):
+        with self.lock:
+            self.cameras += cameras
+
+
+class _TimedWriter:
+    def __init__(self, writer, timer):
+        self.write_source = timer.wrap("write", self._write_source)
+        self.close = timer.wrap("write", writer.close)
+        self._writer = writer
+        self._timer = timer
+
+    def _write_source(self, index, result):
+        if result:
+            self._timer.count(result["camera_count"])
+        return self._writer.write_source(index, result)
+
+
+def _time_processors(timer):
+    from field_mappings import PROCESSORS
+    for name, processor in list(PROCESSORS.items()):
+        PROCESSORS[name] = timer.wrap("normalize", processor)
+
+
+def harness_fetch(timer, sources_file, argv):
+    import fetch_all_cameras
+
+    with open(sources_file, 'r') as f:
+        fetch_all_cameras.SOURCES = json.load(f)
+    _time_processors(timer)
+    fetch_all_cameras.fetch_response = timer.wrap("fetch", fetch_all_cameras.fetch_response)
+    fetch_all_cameras.parse_cameras = timer.wrap("parse", fetch_all_cameras.parse_cameras)
+    open_writer = fetch_all_cameras.open_writer
+    fetch_all_cameras.open_writer = lambda fmt, path: _TimedWriter(open_writer(fmt, path), timer)
+    fetch_all_cameras.main(argv)
+
+
+def harness_aggregate(timer, argv):
+    import aggregate_cameras
+
+    _time_processors(timer)
+    aggregate_cameras.load_json = timer.wrap("parse", aggregate_cameras.load_json)
+    aggregate_cameras.json = types.SimpleNamespace(load=json.load,
+                                                   dump=timer.wrap("write", json.dump))
+    process_file = aggregate_cameras.process_file
+
+    def counted(source, filepath):
+        entry = process_file(source, filepath)
+        timer.count(entry["camera_count"])
+        return entry
+    aggregate_cameras.process_file = counted
+    sys.argv = ["aggregate_cameras.py"] + argv
+    aggregate_cameras.main()
+
+
+def run_harness(args):
+    os.chdir(args.workdir)
+    timer = StageTimer()
+    start = time.perf_counter()
+    if args.harness == "fetch":
+        harness_fetch(timer, args.sources, args.rest)
+    else:
+        harness_aggregate(timer, args.rest)
+    wall = time.perf_counter() - start
+    peak_kb = max(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+                  resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)
+    with open(args.report, 'w') as f:
+        json.dump({"wall": wall, "cameras": timer.cameras, "peak_rss_kb": peak_kb,
+                   "stages": timer.stages}, f)
+
+
+# ============================================================================
+# RUNNER
+# ============================================================================
+
+def run_one(kind, workdir, rest, sources_file=None):
+    """Run one harness subprocess; returns its report dict or None on failure."""
+    report = os.path.join(workdir, f"{kind}.report.json")
+    command = [sys.executable, os.path.abspath(__file__), "--harness", kind,
+               "--workdir", workdir, "--report", report]
+    if sources_file:
+        command += ["--sources", sources_file]
+    proc = subprocess.run(command + ["--"] + rest, cwd=workdir, capture_output=True,
+                          text=True, env=dict(os.environ, PYTHONPATH=ROOT))
+    if proc.returncode != 0:
+        print(f"  {kind} failed:\n{proc.stdout[-2000:]}{proc.stderr[-2000:]}")
+        return None
+    with open(report, 'r') as f:
+        return json.load(f)
+
+
+def write_local_feeds(input_dir, scale):
+    from aggregate_cameras import LOCAL_FEEDS
+    from benchmarks.generate import payload_bytes
+    from fetch_all_cameras import SOURCES
+
+    by_id = {source["id"]: source for source in SOURCES}
+    for source_id, filename in LOCAL_FEEDS:
+        with open(os.path.join(input_dir, filename), 'wb') as f:
+            f.write(payload_bytes(by_id[source_id]["processor"], scale))
+
+
+def bench_scale(scale, server, port, fetch_args):
+    from benchmarks.mock_server import mirror_sources
+    from fetch_all_cameras import SOURCES
+
+    results = {}
+    with tempfile.TemporaryDirectory(prefix=f"bench_x{scale}_") as workdir:
+        sources_file = os.path.join(workdir, "sources.json")
+        with open(sources_file, 'w') as f:
+            json.dump(mirror_sources(server, SOURCES, scale, port), f)
+
+        rest = ["--output", os.path.join(workdir, "out.json"),
+                "--cache-dir", os.path.join(workdir, "cache")] + fetch_args
+        for kind in ("fetch", "fetch-304"):
+            before = dict(server.counts)
+            report = run_one("fetch", workdir, rest, sources_file)
+            if report:
+                report["server"] = {key: server.counts[key] - before[key] for key in before}
+                results[f"{kind} x{scale}"] = report
+
+        input_dir = os.path.join(workdir, "feeds")
+        os.makedirs(input_dir)
+        write_local_feeds(input_dir, scale)
+        report = run_one("aggregate", workdir, ["--input-dir", input_dir,
+                                                "--output", os.path.join(workdir, "agg.json")])
+        if report:
+            results[f"aggregate x{scale}"] = report
+    return results
+
+
+def print_results(results, baseline=None):
+    header = f"{'run':<18} {'wall':>8} {'cameras':>9} {'cams/s':>10} {'peak RSS':>9}"
+    header += "".join(f" {stage:>9}" for stage in STAGES)
+    if baseline:
+        header += f" {'vs base':>8}"
+    print(header)
+    for name, r in results.items():
+        rate = r["cameras"] / r["wall"] if r["wall"] else 0
+        line = (f"{name:<18} {r['wall']:>7.2f}s {r['cameras']:>9,} {rate:>10,.0f} "
+                f"{r['peak_rss_kb'] / 1024:>7.0f}MB")
+        line += "".join(f" {r['stages'][stage]['seconds']:>8.2f}s" for stage in STAGES)
+        if baseline and name in baseline:
+            line += f" {r['wall'] / baseline[name]['wall']:>7.2f}x"
+        print(line)
+
+
+def regressions(results, baseline, tolerance):
+    return [name for name, r in results.items()
+            if name in baseline and r["wall"] > baseline[name]["wall"] * (1 + tolerance)]
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Offline end-to-end camera pipeline benchmarks.")
+    parser.add_argument("--scales", type=int, nargs="+", default=list(SCALES),
+                        help="fixture scale factors (default: 1 10 100)")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=LATENCY)
+    parser.add_argument("--bandwidth", type=float, default=0,
+                        help="mock response bandwidth in bytes/second (default: unlimited)")
+    parser.add_argument("--error-rate", type=float, default=0.0,
+                        help="fraction of mock responses answered 503")
+    parser.add_argument("--save", metavar="FILE", help="write results as JSON")
+    parser.add_argument("--baseline", metavar="FILE", help="compare with saved results")
+    parser.add_argument("--tolerance", type=float, default=TOLERANCE)
+    parser.add_argument("--harness", choices=("fetch", "aggregate"), help=argparse.SUPPRESS)
+    parser.add_argument("--workdir", help=argparse.SUPPRESS)
+    parser.add_argument("--report", help=argparse.SUPPRESS)
+    parser.add_argument("--sources", help=argparse.SUPPRESS)
+    parser.add_argument("rest", nargs="*", help="extra fetch_all_cameras.py arguments after --")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.harness:
+        run_harness(args)
+        return
+
+    from benchmarks.mock_server import start
+
+    server = start(args.port, latency=args.latency, bandwidth=args.bandwidth,
+                   error_rate=args.error_rate)
+    # No politeness delay against the mock; it would dominate every run
+    fetch_args = ["--delay", "0"] + args.rest
+    results = {}
+    try:
+        for scale in args.scales:
+            print(f"Scale x{scale}...", flush=True)
+            results.update(bench_scale(scale, server, args.port, fetch_args))
+    finally:
+        server.shutdown()
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, 'r') as f:
+            baseline = json.load(f)["results"]
+    print()
+    print_results(results, baseline)
+
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump({"generated_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                       "options": {"latency": args.latency, "bandwidth": args.bandwidth,
+                                   "error_rate": args.error_rate, "fetch_args": fetch_args},
+                       "results": results}, f, indent=2)
+        print(f"\nResults saved to: {args.save}")
+
+    if baseline:
+        regressed = regressions(results, baseline, args.tolerance)
+        if regressed:
+            print(f"\nREGRESSED (> {args.tolerance:.0%} slower): {', '.join(regressed)}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,459 @@
+#!/usr/bin/env python3
+"""
+Spatial index and query API over the aggregated cameras.
+
+The index is a uniform lat/lon grid (CELL_DEG degrees per cell). Cameras
+are sorted by cell key (row * ncols + col), so every grid row of a query
+window maps to one contiguous slice found with two binary searches. It is
+written to a .camidx file next to the aggregated output and memory-mapped
+at query time together with the .camcol export (columnar_export), which
+supplies the camera attributes and the state/status/road filter codes.
+
+    bbox(min_lat, min_lon, max_lat, max_lon)  -> [row, ...]
+    radius(lat, lon, km)                      -> [(distance_km, row), ...]
+    nearest(lat, lon, k)                      -> [(distance_km, row), ...]
+    nearest_batch(lats, lons, k)              -> (distances, rows) arrays
+
+Rows are .camcol row numbers; camera(row) materializes one record. All
+queries accept state=, status= and road= filters (a value or a list).
+
+Usage:
+    python camera_index.py build traffic_cameras_aggregated.json
+    python camera_index.py nearest traffic_cameras_aggregated.json LAT LON [K]
+    python camera_index.py bbox traffic_cameras_aggregated.json MIN_LAT MIN_LON MAX_LAT MAX_LON
+"""
+
+import math
+import os
+import sys
+from array import array
+from bisect import bisect_left, bisect_right
+
+from columnar_export import (BufferFile, CameraColumns, columnar_path, export_columnar,
+                             write_container)
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+INDEX_MAGIC = b"CAMIDX1\0"
+CELL_DEG = 0.05  # ~5.5 km north-south
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEG = math.pi / 180 * EARTH_RADIUS_KM
+MAX_SEARCH_KM = 2 * math.pi * EARTH_RADIUS_KM
+MAX_RINGS = 8  # Cell rings searched by nearest() before widening by radius
+BATCH_REACHES = (1, 4, 16)  # Block half-widths (in cells) tried by nearest_batch()
+BATCH_CHUNK = 2048  # Queries scored together in one nearest_batch() pass
+FILTER_COLUMNS = ("state", "status", "road")
+
+
+def index_path(output_path):
+    """Default .camidx path next to an aggregated output file."""
+    return os.path.splitext(output_path)[0] + ".camidx"
+
+
+def grid_cell(lat, lon, cell_deg=CELL_DEG):
+    """(row, col) of the grid cell containing a point."""
+    return int((lat + 90.0) // cell_deg), int((lon + 180.0) // cell_deg)
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    """Great-circle distance in kilometres."""
+    p1 = math.radians(lat1)
+    p2 = math.radians(lat2)
+    a = (math.sin((p2 - p1) / 2) ** 2
+         + math.cos(p1) * math.cos(p2) * math.sin(math.radians(lon2 - lon1) / 2) ** 2)
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+def _columnar_stamp(camcol):
+    stat = os.stat(camcol)
+    return {"columnar_size": stat.st_size, "columnar_mtime_ns": stat.st_mtime_ns}
+
+
+def build_index(output_path, path=None, cell_deg=CELL_DEG):
+    """Build the .camidx for an aggregated output (exporting .camcol if stale)."""
+    path = path or index_path(output_path)
+    camcol = columnar_path(output_path)
+    if (not os.path.exists(camcol)
+            or os.path.getmtime(camcol) < os.path.getmtime(output_path)):
+        export_columnar(output_path, camcol)
+
+    ncols = int(math.ceil(360.0 / cell_deg)) + 1
+    with CameraColumns(camcol) as columns:
+        stamp = _columnar_stamp(camcol)
+        lats = columns.buffer(columns.header["columns"]["latitude"]["values"], "d", numpy=False)
+        lons = columns.buffer(columns.header["columns"]["longitude"]["values"], "d", numpy=False)
+        entries = []
+        for row in range(columns.rows):
+            lat = lats[row]
+            lon = lons[row]
+            if not (-90.0 <= lat <= 90.0 and -180.0 <= lon <= 180.0):
+                continue  # NaN or not lat/lon
+            r, c = grid_cell(lat, lon, cell_deg)
+            entries.append((r * ncols + c, row, lat, lon))
+        column_rows = columns.rows
+        del lats, lons
+    entries.sort()
+
+    cell_keys = array("q")
+    cell_starts = array("q")
+    for position, (key, _, _, _) in enumerate(entries):
+        if not cell_keys or cell_keys[-1] != key:
+            cell_keys.append(key)
+            cell_starts.append(position)
+    cell_starts.append(len(entries))
+
+    buffers = [
+        bytes(cell_keys),
+        bytes(cell_starts),
+        bytes(array("i", (e[1] for e in entries))),
+        bytes(array("d", (e[2] for e in entries))),
+        bytes(array("d", (e[3] for e in entries))),
+    ]
+    header = dict(
+        stamp,
+        cell_deg=cell_deg,
+        ncols=ncols,
+        points=len(entries),
+        cells=len(cell_keys),
+        columnar=os.path.basename(camcol),
+        columnar_rows=column_rows,
+    )
+    write_container(path, header, buffers, magic=INDEX_MAGIC)
+    return path, len(entries)
+
+
+class CameraIndex(BufferFile):
+    """Memory-mapped grid index plus the matching .camcol attributes."""
+
+    def __init__(self, path):
+        super().__init__(path, magic=INDEX_MAGIC)
+        header = self.header
+        self.cell_deg = header["cell_deg"]
+        self.ncols = header["ncols"]
+        self.columns = CameraColumns(os.path.join(os.path.dirname(os.path.abspath(path)),
+                                                  header["columnar"]))
+        # Same row count is not enough: a re-export can reorder or replace rows
+        current = dict(_columnar_stamp(self.columns.path), columnar_rows=self.columns.rows)
+        if any(header.get(key) != value for key, value in current.items()):
+            raise ValueError(f"{path} is out of date with {self.columns.path}; rebuild it")
+        # memoryviews for scalar queries, NumPy views for batch queries
+        self._keys = self.buffer(0, "q", numpy=False)
+        self._starts = self.buffer(1, "q", numpy=False)
+        self._rows = self.buffer(2, "i", numpy=False)
+        self._lat = self.buffer(3, "d", numpy=False)
+        self._lon = self.buffer(4, "d", numpy=False)
+        self._codes = {name: self.columns.buffer(
+            self.columns.header["columns"][name]["codes"], "i", numpy=False)
+            for name in FILTER_COLUMNS}
+
+    @classmethod
+    def for_output(cls, output_path):
+        """Open the index persisted next to an aggregated output file."""
+        return cls(index_path(output_path))
+
+    def __len__(self):
+        return self.header["points"]
+
+    # -- filters ------------------------------------------------------------
+
+    def _filter_codes(self, filters):
+        """{column: set(codes)} for the non-None filters."""
+        wanted = {}
+        for name, value in filters.items():
+            if value is None:
+                continue
+            if name not in FILTER_COLUMNS:
+                raise TypeError(f"unknown filter {name!r}")
+            values = [value] if isinstance(value, str) else value
+            dictionary = self.columns.column(name).dictionary
+            wanted[name] = {dictionary.index(v) for v in values if v in dictionary}
+        return wanted
+
+    def _matches(self, wanted, row):
+        for name, codes in wanted.items():
+            if self._codes[name][row] not in codes:
+                return False
+        return True
+
+    # -- scalar queries -----------------------------------------------------
+
+    def _window(self, min_lat, min_lon, max_lat, max_lon):
+        """Yield index positions whose cell intersects the window."""
+        r0, c0 = grid_cell(max(min_lat, -90.0), max(min_lon, -180.0), self.cell_deg)
+        r1, c1 = grid_cell(min(max_lat, 90.0), min(max_lon, 180.0), self.cell_deg)
+        keys = self._keys
+        starts = self._starts
+        for r in range(r0, r1 + 1):
+            base = r * self.ncols
+            lo = bisect_left(keys, base + c0)
+            hi = bisect_right(keys, base + c1, lo)
+            if lo < hi:
+                yield from range(starts[lo], starts[hi])
+
+    def bbox(self, min_lat, min_lon, max_lat, max_lon, state=None, status=None, road=None):
+        """Rows of cameras inside a lat/lon box (min_lon <= max_lon)."""
+        wanted = self._filter_codes({"state": state, "status": status, "road": road})
+        lat = self._lat
+        lon = self._lon
+        rows = self._rows
+        found = []
+        for p in self._window(min_lat, min_lon, max_lat, max_lon):
+            if min_lat <= lat[p] <= max_lat and min_lon <= lon[p] <= max_lon:
+                row = rows[p]
+                if not wanted or self._matches(wanted, row):
+                    found.append(row)
+        return found
+
+    def radius(self, lat, lon, km, state=None, status=None, road=None):
+        """(distance_km, row) for cameras within ``km``, nearest first."""
+        wanted = self._filter_codes({"state": state, "status": status, "road": road})
+        return self._radius(lat, lon, km, wanted)
+
+    def _radius(self, lat, lon, km, wanted):
+        dlat = km / KM_PER_DEG
+        edge = min(90.0, abs(lat) + dlat)
+        cos_edge = math.cos(math.radians(edge))
+        dlon = 360.0 if cos_edge < 1e-9 else min(360.0, km / (KM_PER_DEG * cos_edge))
+        lats = self._lat
+        lons = self._lon
+        rows = self._rows
+        found = []
+        for p in self._window(lat - dlat, lon - dlon, lat + dlat, lon + dlon):
+            d = haversine_km(lat, lon, lats[p], lons[p])
+            if d <= km:
+                row = rows[p]
+                if not wanted or self._matches(wanted, row):
+                    found.append((d, row))
+        found.sort()
+        return found
+
+    def nearest(self, lat, lon, k=1, state=None, status=None, road=None,
+                max_km=MAX_SEARCH_KM):
+        """The ``k`` nearest cameras as (distance_km, row), nearest first.
+
+        Searches outward one ring of grid cells at a time and stops once
+        the k-th best distance is closer than any unvisited cell.
+        """
+        if k <= 0:
+            return []
+        wanted = self._filter_codes({"state": state, "status": status, "road": road})
+        cell = self.cell_deg
+        r, c = grid_cell(lat, lon, cell)
+        max_ring = min(MAX_RINGS, int(max_km / (cell * KM_PER_DEG)) + 1)
+        lats = self._lat
+        lons = self._lon
+        rows = self._rows
+        found = []
+        for ring in range(max_ring + 1):
+            for p in self._ring(r, c, ring):
+                d = haversine_km(lat, lon, lats[p], lons[p])
+                if d <= max_km:
+                    row = rows[p]
+                    if not wanted or self._matches(wanted, row):
+                        found.append((d, row))
+            if len(found) >= k:
+                found.sort()
+                del found[k:]
+                # Closest any point outside the visited square can be
+                lat_lo = (r - ring) * cell - 90.0
+                lat_hi = (r + ring + 1) * cell - 90.0
+                lon_gap = min(lon - ((c - ring) * cell - 180.0),
+                              (c + ring + 1) * cell - 180.0 - lon)
+                cos_edge = math.cos(math.radians(min(90.0, max(abs(lat_lo), abs(lat_hi)))))
+                bound = min((lat - lat_lo) * KM_PER_DEG, (lat_hi - lat) * KM_PER_DEG,
+                            lon_gap * KM_PER_DEG * cos_edge * 0.99)
+                if found[-1][0] <= bound:
+                    return found
+
+        # Sparse area: switch to radius searches that double each time
+        km = MAX_RINGS * cell * KM_PER_DEG
+        while True:
+            km = min(km * 2, max_km)
+            found = self._radius(lat, lon, km, wanted)
+            if len(found) >= k or km >= max_km:
+                return found[:k]
+
+    def _ring(self, r, c, ring):
+        """Index positions in the cells exactly ``ring`` steps from (r, c)."""
+        keys = self._keys
+        starts = self._starts
+        ncols = self.ncols
+        for rr in range(r - ring, r + ring + 1):
+            if rr < 0:
+                continue
+            if rr in (r - ring, r + ring):
+                spans = ((c - ring, c + ring),)
+            else:
+                spans = ((c - ring, c - ring), (c + ring, c + ring))
+            base = rr * ncols
+            for c0, c1 in spans:
+                lo = bisect_left(keys, base + max(c0, 0))
+                hi = bisect_right(keys, base + min(c1, ncols - 1), lo)
+                if lo < hi:
+                    yield from range(starts[lo], starts[hi])
+
+    # -- batch queries ------------------------------------------------------
+
+    def nearest_batch(self, lats, lons, k=1, state=None, status=None, road=None):
+        """Vectorized k-nearest for many points at once (requires NumPy).
+
+        Every query is scored against the cameras in a block of cells
+        around it, with all (query, camera) pairs of a pass computed and
+        ranked in flat NumPy arrays. A result is accepted when its k-th
+        distance lies inside the searched block; the rest retry with wider
+        blocks (BATCH_REACHES) and, in very sparse areas, fall back to
+        nearest(). Returns ``(distances, rows)`` arrays of shape (n, k),
+        padded with inf / -1 when fewer than k cameras match.
+        """
+        if np is None:
+            raise RuntimeError("nearest_batch requires numpy")
+        wanted = self._filter_codes({"state": state, "status": status, "road": road})
+        qlat = np.asarray(lats, dtype=np.float64)
+        qlon = np.asarray(lons, dtype=np.float64)
+        n = len(qlat)
+        k = max(k, 0)
+        out_d = np.full((n, k), np.inf)
+        out_r = np.full((n, k), -1, dtype=np.int64)
+        if not k:
+            return out_d, out_r
+
+        rows = self.buffer(2, "i")
+        allowed = None
+        if wanted:
+            allowed = np.ones(len(rows), dtype=bool)
+            for name, codes in wanted.items():
+                column_codes = self.columns.buffer(
+                    self.columns.header["columns"][name]["codes"], "i")
+                allowed &= np.isin(column_codes[rows], list(codes))
+
+        pending = np.arange(n)
+        for reach in BATCH_REACHES:
+            if not len(pending):
+                break
+            # Chunked so dense areas don't build huge pair arrays
+            pending = np.concatenate([
+                self._batch_pass(qlat, qlon, chunk, k, reach, allowed, out_d, out_r)
+                for chunk in np.array_split(pending, (len(pending) - 1) // BATCH_CHUNK + 1)])
+
+        filters = {"state": state, "status": status, "road": road}
+        for i in pending.tolist():
+            for j, (d, row) in enumerate(self.nearest(float(qlat[i]), float(qlon[i]), k,
+                                                      **filters)):
+                out_d[i, j] = d
+                out_r[i, j] = row
+        return out_d, out_r
+
+    def _batch_pass(self, qlat, qlon, pending, k, reach, allowed, out_d, out_r):
+        """Score ``pending`` queries against blocks of +/- ``reach`` cells.
+
+        Fills the outputs for resolved queries and returns the rest.
+        """
+        keys = self.buffer(0, "q")
+        starts = self.buffer(1, "q")
+        rows = self.buffer(2, "i")
+        cell = self.cell_deg
+        lat = qlat[pending]
+        lon = qlon[pending]
+        qr = np.floor((lat + 90.0) / cell).astype(np.int64)
+        qc = np.floor((lon + 180.0) / cell).astype(np.int64)
+
+        # One contiguous slice of the index per grid row of each block
+        grid_rows = qr[:, None] + np.arange(-reach, reach + 1)
+        lo = np.searchsorted(keys, grid_rows * self.ncols + (qc - reach)[:, None], "left")
+        hi = np.searchsorted(keys, grid_rows * self.ncols + (qc + reach)[:, None], "right")
+        first = starts[lo].ravel()
+        counts = (starts[hi] - starts[lo]).ravel()
+        per_query = counts.reshape(len(pending), -1).sum(axis=1)
+
+        # Flatten every (query, camera) pair of the pass
+        total = int(counts.sum())
+        offsets = np.repeat(np.cumsum(counts) - counts, counts)
+        positions = np.arange(total) - offsets + np.repeat(first, counts)
+        query = np.repeat(np.arange(len(pending)), per_query)
+        if allowed is not None:
+            keep = allowed[positions]
+            positions = positions[keep]
+            query = query[keep]
+
+        plat = np.radians(self.buffer(3, "d")[positions])
+        plon = np.radians(self.buffer(4, "d")[positions])
+        glat = np.radians(lat)[query]
+        glon = np.radians(lon)[query]
+        a = (np.sin((plat - glat) / 2) ** 2
+             + np.cos(glat) * np.cos(plat) * np.sin((plon - glon) / 2) ** 2)
+        dist = 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+        # Rank pairs by (query, distance) and keep the first k per query
+        order = np.lexsort((dist, query))
+        query = query[order]
+        found = np.bincount(query, minlength=len(pending))
+        rank = np.arange(len(query)) - np.repeat(np.cumsum(found) - found, found)
+        top = rank < k
+        query = query[top]
+        rank = rank[top]
+        dist = dist[order][top]
+        positions = positions[order][top]
+
+        # Distance from each query to the edge of its searched block
+        lat_lo = (qr - reach) * cell - 90.0
+        lat_hi = (qr + reach + 1) * cell - 90.0
+        lon_lo = (qc - reach) * cell - 180.0
+        lon_hi = (qc + reach + 1) * cell - 180.0
+        cos_edge = np.cos(np.radians(np.minimum(90.0, np.maximum(np.abs(lat_lo),
+                                                                  np.abs(lat_hi)))))
+        margin = np.minimum(
+            np.minimum(lat - lat_lo, lat_hi - lat) * KM_PER_DEG,
+            np.minimum(lon - lon_lo, lon_hi - lon) * KM_PER_DEG * cos_edge * 0.99)
+        kth = np.full(len(pending), np.inf)
+        last = rank == k - 1
+        kth[query[last]] = dist[last]
+        resolved = kth <= margin
+
+        take = resolved[query]
+        targets = pending[query[take]]
+        out_d[targets, rank[take]] = dist[take]
+        out_r[targets, rank[take]] = rows[positions[take]]
+        return pending[~resolved]
+
+    # -- records ------------------------------------------------------------
+
+    def camera(self, row):
+        """Camera record for a row, with its source_id and state."""
+        camera = self.columns.row(row)
+        camera["source_id"] = self.columns.column("source_id")[row]
+        camera["state"] = self.columns.column("state")[row]
+        return camera
+
+    def close(self):
+        del self._keys, self._starts, self._rows, self._lat, self._lon
+        self._codes.clear()
+        self.columns.close()
+        super().close()
+
+
+def main():
+    if len(sys.argv) < 3 or sys.argv[1] not in ("build", "nearest", "bbox"):
+        print(__doc__)
+        sys.exit(1)
+    command, output_path, args = sys.argv[1], sys.argv[2], [float(a) for a in sys.argv[3:]]
+    if command == "build":
+        path, points = build_index(output_path)
+        print(f"Indexed {points:,} cameras in {path}")
+        return
+    with CameraIndex.for_output(output_path) as index:
+        if command == "nearest":
+            k = int(args[2]) if len(args) > 2 else 1
+            hits = index.nearest(args[0], args[1], k)
+        else:
+            hits = [(None, row) for row in index.bbox(*args[:4])]
+        for distance, row in hits:
+            camera = index.camera(row)
+            where = f"{distance:.2f} km  " if distance is not None else ""
+            print(f"  {where}{camera['source_id']}/{camera['camera_id']}  {camera['name']}")
+
+
+if __name__ == "__main__":
+    main()
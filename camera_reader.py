@@ -0,0 +1,393 @@
+#!/usr/bin/env python3
+"""
+Lazy, memory-mapped access to the aggregated camera output.
+
+aggregate_cameras.load_json and output_writers.read_output parse the whole
+document before a single camera can be looked at. CameraReader instead
+maps the output file read-only and consults a .camoff sidecar that records
+where every source and camera lives in it:
+
+    header    output size/mtime it was built from, format, metadata and
+              the per-source summaries (everything but the cameras), each
+              with its first camera position and camera count
+    buffers   camera start and end byte offsets (uint64), and the camera
+              ids as uint64 offsets into a UTF-8 data buffer
+
+Only the bytes of the cameras a caller asks for are ever parsed, so
+iterating one source or fetching a handful of cameras costs a file open
+and a header read, whatever the size of the output. All OUTPUT_FORMATS
+are supported; NDJSON metadata comes from its .meta.json sidecar.
+
+The index is built in one pass over the mapping (the C JSON decoder steps
+over each camera, a regex over the structure around them) and is rebuilt
+automatically when the output's size or mtime no longer match it.
+
+Usage:
+    python camera_reader.py build traffic_cameras_aggregated.json
+    python camera_reader.py sources traffic_cameras_aggregated.json
+    python camera_reader.py source traffic_cameras_aggregated.json SOURCE_ID
+    python camera_reader.py camera traffic_cameras_aggregated.json SOURCE_ID CAMERA_ID
+"""
+
+import codecs
+import json
+import mmap
+import os
+import re
+import sys
+from array import array
+
+from columnar_export import BufferFile, write_container
+from feed_stream import loads
+from output_writers import detect_format, sidecar_path
+
+OFFSETS_MAGIC = b"CAMOFF1\0"
+
+# One token per string (object keys with their colon) or bracket; numbers,
+# literals, commas and whitespace are skipped
+_TOKEN = re.compile(r'"(?:[^"\\]|\\.)*"(\s*:)?|[\[\]{}]')
+_SKIP = re.compile(r'[\s,]*')
+_DECODER = json.JSONDecoder()
+_NDJSON_LINE = re.compile(rb'\{"source_id":("(?:[^"\\]|\\.)*"),"camera_id":'
+                          rb'("(?:[^"\\]|\\.)*"|[^\s,}]+)')
+
+
+def offsets_path(output_path):
+    """Default .camoff path next to an aggregated output file."""
+    return os.path.splitext(output_path)[0] + ".camoff"
+
+
+def _id_text(token):
+    """camera_id JSON token as lookup text (strings unquoted, others verbatim)."""
+    value = json.loads(token)
+    return value if isinstance(value, str) else json.dumps(value)
+
+
+def _stamp(output_path):
+    stat = os.stat(output_path)
+    stamp = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+    if output_path.endswith(".ndjson"):
+        sidecar = sidecar_path(output_path)
+        # No sidecar yet while the run that writes the file is in progress
+        stamp["sidecar_mtime_ns"] = (os.stat(sidecar).st_mtime_ns if os.path.exists(sidecar)
+                                     else None)
+    return stamp
+
+
+class _Offsets:
+    """Camera byte ranges and ids collected while scanning."""
+
+    def __init__(self):
+        self.starts = array("Q")
+        self.ends = array("Q")
+        self.id_offsets = array("Q", [0])
+        self.id_data = bytearray()
+
+    def add(self, start, end, camera_id):
+        self.starts.append(start)
+        self.ends.append(end)
+        if camera_id is not None:
+            self.id_data += camera_id.encode("utf-8")
+        self.id_offsets.append(len(self.id_data))
+
+    def buffers(self):
+        return [bytes(self.starts), bytes(self.ends), bytes(self.id_offsets),
+                bytes(self.id_data)]
+
+
+def _scan_cameras(buf, text, start, offsets):
+    """Index the cameras of the array opening at ``start``; returns its end."""
+    decode = _DECODER.raw_decode
+    position = _SKIP.match(text, start + 1).end()
+    while text[position] != "]":
+        camera, end = decode(text, position)
+        camera_id = camera.get("camera_id") if isinstance(camera, dict) else None
+        if isinstance(camera_id, str):
+            if not camera_id.isascii():
+                # Raw UTF-8 and \u escapes both decode differently as latin-1
+                camera_id = loads(buf[position:end])["camera_id"]
+        elif camera_id is not None:
+            camera_id = json.dumps(camera_id)
+        offsets.add(position, end, camera_id)
+        position = _SKIP.match(text, end).end()
+    return position + 1
+
+
+def _scan_document(buf):
+    """Index a json/compact document: (metadata, summaries, offsets).
+
+    The mapping is decoded as latin-1, which turns every byte into one
+    character, so character positions are byte offsets and the C JSON
+    decoder can step over each camera. Outside the camera arrays a regex
+    visits only the keys and brackets.
+    """
+    text = codecs.latin_1_decode(buf)[0]
+    offsets = _Offsets()
+    summaries = []
+    metadata = None
+    # Frames are (role, start); roles name the levels of
+    # {"metadata": {...}, "sources": [{..., "cameras": [...]}, ...]}
+    stack = []
+    key = None
+    source = None
+    position = 0
+    while True:
+        match = _TOKEN.search(text, position)
+        if match is None:
+            break
+        position = match.end()
+        token = text[match.start()]
+        if token == '"':
+            if match.group(1) is not None:
+                key = text[match.start() + 1:match.start(1) - 1]
+            continue
+        if token in "[{":
+            parent = stack[-1][0] if stack else None
+            if parent == "source" and key == "cameras" and token == "[":
+                position = _scan_cameras(buf, text, match.start(), offsets)
+                source["cameras"] = (match.start(), position)
+                key = None
+                continue
+            if parent is None:
+                role = "root"
+            elif parent == "root":
+                role = {"metadata": "metadata", "sources": "sources"}.get(key, "other")
+            elif parent == "sources":
+                role = "source"
+                source = {"first": len(offsets.starts), "cameras": None}
+            else:
+                role = "other"
+            stack.append((role, match.start()))
+            key = None
+            continue
+        role, start = stack.pop()
+        end = match.end()
+        if role == "source":
+            summary_bytes = buf[start:end]
+            if source["cameras"] is not None:
+                c_start, c_end = source["cameras"]
+                summary_bytes = buf[start:c_start] + b"[]" + buf[c_end:end]
+            summary = loads(summary_bytes)
+            summary.pop("cameras", None)
+            summaries.append({"summary": summary, "first": source["first"],
+                              "count": len(offsets.starts) - source["first"]})
+        elif role == "metadata":
+            metadata = loads(buf[start:end])
+    return metadata, summaries, offsets
+
+
+def _scan_ndjson(buf, output_path):
+    """Index an NDJSON output: cameras are lines, grouped by source."""
+    sidecar = {"metadata": None, "sources": []}
+    if os.path.exists(sidecar_path(output_path)):
+        with open(sidecar_path(output_path), 'r') as f:
+            sidecar = json.load(f)
+    offsets = _Offsets()
+    runs = {}
+    order = []
+    current = None
+    position = 0
+    while True:
+        # Only complete lines; a run in progress may have half a line buffered
+        end = buf.find(b"\n", position)
+        if end < 0:
+            break
+        if end > position:
+            match = _NDJSON_LINE.match(buf, position, end)
+            if match:
+                source_id = json.loads(match.group(1))
+                camera_id = _id_text(match.group(2))
+            else:
+                # Not in the writer's key order; parse the whole line
+                camera = loads(buf[position:end])
+                source_id = camera.get("source_id")
+                camera_id = camera.get("camera_id")
+                if camera_id is not None and not isinstance(camera_id, str):
+                    camera_id = json.dumps(camera_id)
+            if source_id != current:
+                if source_id in runs:
+                    raise ValueError(f"{output_path}: cameras of {source_id} are not contiguous")
+                runs[source_id] = [len(offsets.starts), 0]
+                order.append(source_id)
+                current = source_id
+            runs[source_id][1] += 1
+            offsets.add(position, end, camera_id)
+        position = end + 1
+
+    summaries = []
+    for summary in sidecar["sources"]:
+        first, count = runs.pop(summary["source_id"], (len(offsets.starts), 0))
+        summaries.append({"summary": summary, "first": first, "count": count})
+    # Cameras of sources the sidecar does not list (yet)
+    for source_id in order:
+        if source_id in runs:
+            first, count = runs[source_id]
+            summaries.append({"summary": {"source_id": source_id}, "first": first,
+                              "count": count})
+    return sidecar["metadata"], summaries, offsets
+
+
+def build_offsets(output_path, path=None):
+    """Build the .camoff sidecar for an aggregated output file (any format)."""
+    path = path or offsets_path(output_path)
+    fmt = detect_format(output_path)
+    stamp = _stamp(output_path)
+    with open(output_path, 'rb') as f:
+        if stamp["size"] == 0:
+            raise ValueError(f"{output_path} is empty")
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+            if fmt == "ndjson":
+                metadata, summaries, offsets = _scan_ndjson(buf, output_path)
+            else:
+                metadata, summaries, offsets = _scan_document(buf)
+    header = dict(stamp, output=os.path.basename(output_path), format=fmt, metadata=metadata,
+                  sources=summaries, cameras=len(offsets.starts))
+    write_container(path, header, offsets.buffers(), magic=OFFSETS_MAGIC)
+    return path, len(offsets.starts)
+
+
+class CameraReader:
+    """Read sources and cameras out of an aggregated output on demand.
+
+    >>> with CameraReader("traffic_cameras_aggregated.json") as reader:
+    ...     for camera in reader.iter_cameras("caltrans_d4"):
+    ...         ...
+    ...     reader.camera("nyc_dot", "123")
+    """
+
+    def __init__(self, output_path, index=None, rebuild=True):
+        self.path = output_path
+        self.index_path = index or offsets_path(output_path)
+        self._index = self._open_index(rebuild)
+        header = self._index.header
+        self.format = header["format"]
+        self.metadata = header["metadata"]
+        self._sources = {entry["summary"]["source_id"]: entry for entry in header["sources"]}
+        self._starts = self._index.buffer(0, "Q", numpy=False)
+        self._ends = self._index.buffer(1, "Q", numpy=False)
+        self._id_offsets = self._index.buffer(2, "Q", numpy=False)
+        self._id_data = self._index.buffer(3, "B")
+        self._ids = {}
+        self._file = open(output_path, 'rb')
+        self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def _open_index(self, rebuild):
+        current = _stamp(self.path)
+        if os.path.exists(self.index_path):
+            index = BufferFile(self.index_path, magic=OFFSETS_MAGIC)
+            if all(index.header.get(key) == value for key, value in current.items()):
+                return index
+            index.close()
+            if not rebuild:
+                raise ValueError(f"{self.index_path} is out of date with {self.path}; rebuild it")
+        elif not rebuild:
+            raise FileNotFoundError(self.index_path)
+        build_offsets(self.path, self.index_path)
+        return BufferFile(self.index_path, magic=OFFSETS_MAGIC)
+
+    def __len__(self):
+        return self._index.header["cameras"]
+
+    def __contains__(self, source_id):
+        return source_id in self._sources
+
+    def source_ids(self):
+        return list(self._sources)
+
+    def summary(self, source_id):
+        """A source's entry without its cameras (KeyError if unknown)."""
+        return self._sources[source_id]["summary"]
+
+    def summaries(self):
+        return [entry["summary"] for entry in self._sources.values()]
+
+    def camera_count(self, source_id):
+        return self._sources[source_id]["count"]
+
+    def _load(self, position):
+        camera = loads(self._mmap[self._starts[position]:self._ends[position]])
+        if self.format == "ndjson":
+            camera.pop("source_id", None)
+        return camera
+
+    def iter_cameras(self, source_id):
+        """Parse and yield one source's cameras in file order."""
+        entry = self._sources[source_id]
+        for position in range(entry["first"], entry["first"] + entry["count"]):
+            yield self._load(position)
+
+    def source(self, source_id):
+        """One source entry with its cameras, as in the full document."""
+        return dict(self.summary(source_id), cameras=list(self.iter_cameras(source_id)))
+
+    def camera_bytes(self, source_id, camera_id):
+        """Raw JSON bytes of one camera, or None if it is not in the source."""
+        position = self._position(source_id, camera_id)
+        if position is None:
+            return None
+        return self._mmap[self._starts[position]:self._ends[position]]
+
+    def camera(self, source_id, camera_id):
+        """One camera dict, or None if it is not in the source."""
+        position = self._position(source_id, camera_id)
+        return None if position is None else self._load(position)
+
+    def _position(self, source_id, camera_id):
+        ids = self._ids.get(source_id)
+        if ids is None:
+            entry = self._sources[source_id]
+            offsets = self._id_offsets
+            data = self._id_data
+            ids = {}
+            for position in range(entry["first"], entry["first"] + entry["count"]):
+                text = bytes(data[offsets[position]:offsets[position + 1]]).decode("utf-8")
+                ids.setdefault(text, position)
+            self._ids[source_id] = ids
+        if camera_id is not None and not isinstance(camera_id, str):
+            camera_id = json.dumps(camera_id)
+        return ids.get(camera_id)
+
+    def close(self):
+        self._ids.clear()
+        self._starts = self._ends = self._id_offsets = self._id_data = None
+        self._index.close()
+        self._mmap.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def main():
+    commands = {"build": 2, "sources": 2, "source": 3, "camera": 4}
+    if len(sys.argv) < 3 or len(sys.argv) != commands.get(sys.argv[1], 0) + 1:
+        print(__doc__)
+        sys.exit(1)
+    command, output_path = sys.argv[1], sys.argv[2]
+    if command == "build":
+        path, cameras = build_offsets(output_path)
+        print(f"Indexed {cameras:,} cameras in {path}")
+        return
+    with CameraReader(output_path) as reader:
+        if command == "sources":
+            for source_id in reader.source_ids():
+                summary = reader.summary(source_id)
+                print(f"  {source_id:<32} {summary.get('state', ''):<8} "
+                      f"{reader.camera_count(source_id):>7,} cameras")
+        elif command == "source":
+            json.dump(reader.source(sys.argv[3]), sys.stdout, indent=2)
+            print()
+        else:
+            camera = reader.camera(sys.argv[3], sys.argv[4])
+            if camera is None:
+                print(f"No camera {sys.argv[4]} in {sys.argv[3]}")
+                sys.exit(1)
+            json.dump(camera, sys.stdout, indent=2)
+            print()
+
+
+if __name__ == "__main__":
+    main()
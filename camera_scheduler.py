@@ -0,0 +1,295 @@
+#!/usr/bin/env python3
+"""
+Long-running scheduler for the camera sources.
+
+Instead of refreshing every source on one cron schedule, each entry in
+SOURCES gets its own refresh interval (a "refresh_interval" key on the
+source, else the default for its processor) with random jitter so the
+sources drift apart. Failing sources back off exponentially, and after
+BREAKER_THRESHOLD consecutive failures a circuit breaker stops fetching
+them for a cooldown period; one trial fetch then decides whether the
+breaker closes again or the cooldown doubles. A dead host therefore
+stops taking worker slots.
+
+Each successful fetch is written to <output_dir>/<source_id>.json as soon
+as it arrives, <output_dir>/status.json records per-source health, and
+the combined aggregate is rewritten at most every AGGREGATE_INTERVAL
+seconds when something changed. With --metrics, per-source stage timings
+are kept in <output_dir>/camera_metrics.prom (OpenMetrics) and its JSON
+report, rewritten together with status.json.
+
+Usage:
+    python camera_scheduler.py [--output-dir DIR] [--workers N] [--duration SECONDS]
+"""
+
+import argparse
+import heapq
+import json
+import os
+import random
+import signal
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import datetime, timezone
+
+import http_transport
+import metrics
+from camera_table import to_json
+from feed_cache import CACHE_DIR, FeedCache
+from fetch_all_cameras import (MAX_WORKERS, OUTPUT_FILE, REQUIRES_AUTH, SOURCES, HostThrottle,
+                               log, process_source)
+
+# Configuration
+OUTPUT_DIR = "camera_sources"
+REFRESH_INTERVALS = {  # Seconds between refreshes, by processor
+    "nyc_dot": 120,  # Online/offline flips often
+    "511_system": 900,
+    "caltrans": 600,
+    "arcgis": 6 * 3600,  # Near-static inventory layers
+}
+DEFAULT_REFRESH_INTERVAL = 900
+REFRESH_JITTER = 0.1  # +/- fraction of the interval
+BACKOFF_BASE = 30
+BACKOFF_MAX = 3600
+BREAKER_THRESHOLD = 5  # Consecutive failures before the breaker opens
+BREAKER_COOLDOWN = 1800
+BREAKER_COOLDOWN_MAX = 6 * 3600
+AGGREGATE_INTERVAL = 60
+
+
+def _now_iso():
+    return datetime.now(timezone.utc).isoformat()
+
+
+def _write_json_atomic(path, payload, indent=None):
+    tmp = f"{path}.tmp.{os.getpid()}"
+    with open(tmp, 'w') as f:
+        json.dump(payload, f, indent=indent, default=to_json)
+    os.replace(tmp, path)
+
+
+class SourceState:
+    """Schedule and health bookkeeping for one source."""
+
+    def __init__(self, source):
+        self.source = source
+        self.interval = source.get("refresh_interval",
+                                   REFRESH_INTERVALS.get(source["processor"],
+                                                         DEFAULT_REFRESH_INTERVAL))
+        self.failures = 0
+        self.breaker = "closed"  # closed -> open -> half_open -> closed/open
+        self.cooldown = BREAKER_COOLDOWN
+        self.next_due = 0.0
+        self.last_success = None
+        self.last_failure = None
+        self.camera_count = 0
+
+    def jittered(self, seconds):
+        return seconds * (1 + random.uniform(-REFRESH_JITTER, REFRESH_JITTER))
+
+    def record_success(self, now, camera_count):
+        self.failures = 0
+        self.breaker = "closed"
+        self.cooldown = BREAKER_COOLDOWN
+        self.last_success = _now_iso()
+        self.camera_count = camera_count
+        self.next_due = now + self.jittered(self.interval)
+
+    def record_failure(self, now):
+        self.failures += 1
+        self.last_failure = _now_iso()
+        if self.breaker == "half_open":
+            # Trial fetch failed: stay open for longer
+            self.cooldown = min(self.cooldown * 2, BREAKER_COOLDOWN_MAX)
+            self.breaker = "open"
+            self.next_due = now + self.jittered(self.cooldown)
+        elif self.failures >= BREAKER_THRESHOLD:
+            self.breaker = "open"
+            self.next_due = now + self.jittered(self.cooldown)
+        else:
+            backoff = min(BACKOFF_BASE * 2 ** (self.failures - 1), BACKOFF_MAX)
+            self.next_due = now + self.jittered(min(backoff, self.interval))
+
+    def starting(self):
+        if self.breaker == "open":
+            self.breaker = "half_open"
+
+    def status(self):
+        return {
+            "source_id": self.source["id"],
+            "interval": self.interval,
+            "breaker": self.breaker,
+            "consecutive_failures": self.failures,
+            "last_success": self.last_success,
+            "last_failure": self.last_failure,
+            "camera_count": self.camera_count,
+            "next_due_in": max(0, round(self.next_due - time.monotonic())),
+        }
+
+
+class Scheduler:
+    """Runs process_source for each source on its own schedule."""
+
+    def __init__(self, sources=SOURCES, output_dir=OUTPUT_DIR, workers=MAX_WORKERS,
+                 cache=None, throttle=None, aggregate_path=OUTPUT_FILE, run_metrics=None):
+        self.states = {source["id"]: SourceState(source) for source in sources}
+        self.output_dir = output_dir
+        self.workers = max(1, workers)
+        self.cache = cache
+        self.throttle = throttle or HostThrottle()
+        self.aggregate_path = aggregate_path
+        self.run_metrics = run_metrics
+        self._stop = threading.Event()
+        self._dirty = False
+        self._last_aggregate = 0.0
+        os.makedirs(output_dir, exist_ok=True)
+
+    def stop(self, *_):
+        self._stop.set()
+
+    def _fetch(self, state):
+        source = state.source
+        with self.throttle.slot(source["url"]):
+            return process_source(source, f"[{source['id']}]", self.cache,
+                                  throttle=self.throttle)
+
+    def _handle(self, state, result):
+        now = time.monotonic()
+        if result:
+            state.record_success(now, result["camera_count"])
+            _write_json_atomic(os.path.join(self.output_dir, f"{state.source['id']}.json"),
+                               result)
+            self._dirty = True
+        else:
+            state.record_failure(now)
+            if state.breaker == "open":
+                log(f"[{state.source['id']}]  circuit open after {state.failures} failures, "
+                    f"retrying in {round(state.next_due - now)}s")
+
+    def _write_status(self):
+        _write_json_atomic(os.path.join(self.output_dir, "status.json"), {
+            "updated_at": _now_iso(),
+            "sources": [state.status() for state in self.states.values()],
+        }, indent=2)
+        if self.run_metrics:
+            self.run_metrics.write(os.path.join(self.output_dir, metrics.METRICS_FILE))
+
+    def write_aggregate(self):
+        """Rebuild the combined aggregate from the per-source files."""
+        results = []
+        for source_id in self.states:
+            try:
+                with open(os.path.join(self.output_dir, f"{source_id}.json"), 'r') as f:
+                    results.append(json.load(f))
+            except FileNotFoundError:
+                continue
+        fetched = {r["source_id"] for r in results}
+        failed = [s.source["name"] for sid, s in self.states.items() if sid not in fetched]
+        output = {
+            "metadata": {
+                "generated_at": _now_iso(),
+                "total_cameras": sum(r["camera_count"] for r in results),
+                "sources_processed": len(results),
+                "sources_failed": len(failed),
+                "failed_sources": failed,
+                "sources_requiring_auth": [s["name"] for s in REQUIRES_AUTH],
+                "notes": "Written by camera_scheduler; per-source last_fetched times differ.",
+            },
+            "sources": results,
+        }
+        _write_json_atomic(self.aggregate_path, output, indent=2)
+        self._dirty = False
+        self._last_aggregate = time.monotonic()
+
+    def run(self, duration=None):
+        """Schedule fetches until stop() is called or ``duration`` elapses."""
+        deadline = None if duration is None else time.monotonic() + duration
+        queue = []
+        for seq, state in enumerate(self.states.values()):
+            # Spread the first round over a few seconds
+            state.next_due = time.monotonic() + random.uniform(0, 2)
+            heapq.heappush(queue, (state.next_due, seq, state))
+        in_flight = {}
+
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            while not self._stop.is_set():
+                now = time.monotonic()
+                if deadline is not None and now >= deadline:
+                    break
+                while queue and queue[0][0] <= now and len(in_flight) < self.workers:
+                    _, seq, state = heapq.heappop(queue)
+                    state.starting()
+                    in_flight[pool.submit(self._fetch, state)] = (seq, state)
+
+                timeout = 1.0
+                if queue and len(in_flight) < self.workers:
+                    timeout = min(timeout, max(0.0, queue[0][0] - now))
+                if in_flight:
+                    done, _ = wait(list(in_flight), timeout=timeout,
+                                   return_when=FIRST_COMPLETED)
+                else:
+                    done = set()
+                    self._stop.wait(timeout)
+                for future in done:
+                    seq, state = in_flight.pop(future)
+                    try:
+                        result = future.result()
+                    except Exception as e:
+                        log(f"[{state.source['id']}]  FAILED ({str(e)[:50]})")
+                        result = None
+                    self._handle(state, result)
+                    heapq.heappush(queue, (state.next_due, seq, state))
+                if done:
+                    self._write_status()
+                if self._dirty and time.monotonic() - self._last_aggregate >= AGGREGATE_INTERVAL:
+                    self.write_aggregate()
+
+            self._stop.set()
+        self.finish()
+
+    def finish(self):
+        """Flush pending aggregate and status updates."""
+        if self._dirty:
+            self.write_aggregate()
+        self._write_status()
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Refresh camera sources on per-source schedules.")
+    parser.add_argument("--output-dir", default=OUTPUT_DIR,
+                        help=f"per-source results and status.json (default: {OUTPUT_DIR})")
+    parser.add_argument("--output", default=OUTPUT_FILE,
+                        help=f"combined aggregate rewritten as sources update (default: {OUTPUT_FILE})")
+    parser.add_argument("--workers", type=int, default=MAX_WORKERS,
+                        help=f"maximum concurrent fetches (default: {MAX_WORKERS})")
+    parser.add_argument("--cache-dir", default=CACHE_DIR,
+                        help=f"conditional-GET cache directory (default: {CACHE_DIR})")
+    parser.add_argument("--metrics", action="store_true",
+                        help=f"keep per-source stage timings in <output-dir>/{metrics.METRICS_FILE}")
+    parser.add_argument("--duration", type=float, default=None,
+                        help="stop after this many seconds (default: run until interrupted)")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    run_metrics = None
+    if args.metrics:
+        run_metrics = metrics.enable()
+        http_transport.configure(pool_classes=metrics.TIMED_POOL_CLASSES)
+    scheduler = Scheduler(output_dir=args.output_dir, workers=args.workers,
+                          cache=FeedCache(args.cache_dir), aggregate_path=args.output,
+                          run_metrics=run_metrics)
+    signal.signal(signal.SIGTERM, scheduler.stop)
+    print(f"Scheduling {len(scheduler.states)} sources ({args.workers} workers). Ctrl-C to stop.")
+    try:
+        scheduler.run(args.duration)
+    except KeyboardInterrupt:
+        scheduler.stop()
+        scheduler.finish()
+    print(f"Stopped. Per-source results in {args.output_dir}/")
+
+
+if __name__ == "__main__":
+    main()
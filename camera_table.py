@@ -0,0 +1,365 @@
+#!/usr/bin/env python3
+"""
+Compact in-memory camera storage.
+
+A normalized camera used to be a 10-key dict plus a nested raw_metadata
+dict, roughly 1 KB of Python objects per camera before counting the
+strings. The processors now fill a CameraTable instead, one per source,
+which stores the cameras column by column:
+
+    camera_id, name, image_url, stream_url   lists of the original values
+    latitude, longitude                      array('d'), NaN for None
+    direction, road, status                  interned: a code per row into
+                                             a small table of distinct values
+    raw_metadata                             interned key tuple per row plus a
+                                             value tuple, None when every
+                                             value is None
+
+Rows are reached through Camera, a two-slot view that behaves like the
+old dict (camera["name"], camera.get(...), dict(camera), **camera,
+camera["status"] = ...). JSON output is unchanged: pass to_json as the
+``default=`` hook, or use camera_dicts() to get plain dicts.
+
+Usage:
+    python camera_table.py traffic_cameras_aggregated.json   # memory report
+"""
+
+import json
+import sys
+import tracemalloc
+from array import array
+from collections.abc import Mapping
+
+CAMERA_FIELDS = ("camera_id", "name", "latitude", "longitude", "image_url", "stream_url",
+                 "direction", "road", "status", "raw_metadata")
+# Column layout of CameraTable.extend_columns / extend_rows
+CAMERA_COLUMNS = CAMERA_FIELDS[:-1] + ("meta_keys", "meta_values")
+
+_NAN = float("nan")
+_LIST_COLUMNS = ("camera_id", "name", "image_url", "stream_url")
+_COORD_COLUMNS = ("latitude", "longitude")
+_INTERNED_COLUMNS = ("direction", "road", "status")
+
+
+class _Interned:
+    """Dictionary-encoded column: one uint32 code per row."""
+
+    __slots__ = ("codes", "values", "index")
+
+    def __init__(self):
+        self.codes = array("I")
+        self.values = []
+        self.index = {}
+
+    def code(self, value):
+        code = self.index.get(value)
+        if code is None:
+            if isinstance(value, str):
+                value = sys.intern(value)
+            code = self.index[value] = len(self.values)
+            self.values.append(value)
+        return code
+
+    def extend(self, values, count):
+        if isinstance(values, Constant):
+            self.codes.extend(array("I", [self.code(values.value)]) * count)
+        elif values and values.count(values[0]) == len(values):
+            self.codes.extend(array("I", [self.code(values[0])]) * len(values))
+        else:
+            index = self.index
+            for value in dict.fromkeys(values):
+                if value not in index:
+                    self.code(value)
+            self.codes.extend(map(index.__getitem__, values))
+
+    def __getitem__(self, row):
+        return self.values[self.codes[row]]
+
+    def __setitem__(self, row, value):
+        self.codes[row] = self.code(value)
+
+
+class Constant:
+    """A column holding the same value on every row (CameraTable.extend_columns)."""
+
+    __slots__ = ("value",)
+
+    def __init__(self, value):
+        self.value = value
+
+
+def split_metadata(raw_metadata):
+    """(keys, values) row slots for a raw_metadata dict (or None)."""
+    if raw_metadata is None:
+        return None, None
+    return tuple(raw_metadata), tuple(raw_metadata.values())
+
+
+def row_of(camera):
+    """Row tuple laid out like CAMERA_COLUMNS for a camera dict."""
+    get = camera.get
+    return (get("camera_id"), get("name"), get("latitude"), get("longitude"),
+            get("image_url"), get("stream_url"), get("direction"), get("road"),
+            get("status")) + split_metadata(get("raw_metadata"))
+
+
+class CameraTable:
+    """Struct-of-arrays list of cameras; iterates as Camera views."""
+
+    __slots__ = ("camera_id", "name", "image_url", "stream_url", "latitude", "longitude",
+                 "coord_extra", "direction", "road", "status", "meta_keys", "meta_values")
+
+    def __init__(self, cameras=()):
+        self.camera_id = []
+        self.name = []
+        self.image_url = []
+        self.stream_url = []
+        self.latitude = array("d")
+        self.longitude = array("d")
+        self.coord_extra = {}  # (row, column) -> coordinate that is not a float
+        self.direction = _Interned()
+        self.road = _Interned()
+        self.status = _Interned()
+        self.meta_keys = _Interned()  # Key tuple (None: raw_metadata is None)
+        self.meta_values = []  # Value tuple, or None when every value is None
+        if cameras:
+            self.extend_rows([row_of(camera) for camera in cameras])
+
+    @classmethod
+    def from_columns(cls, columns, count=None):
+        table = cls()
+        table.extend_columns(columns, count)
+        return table
+
+    def extend_rows(self, rows):
+        """Append row tuples laid out like CAMERA_COLUMNS."""
+        if rows:
+            self.extend_columns(list(zip(*rows)))
+
+    def extend_columns(self, columns, count=None):
+        """Append cameras given column by column.
+
+        ``columns`` follows CAMERA_COLUMNS: the nine scalar fields, then
+        the raw_metadata key tuples and value tuples. Any column may be a
+        Constant instead of a list. The compiled extractors append each
+        field to its own list and hand the lists over here, which fills
+        the arrays and interned columns in one C-level pass each.
+        """
+        if count is None:
+            count = next(len(c) for c in columns if not isinstance(c, Constant))
+        if not count:
+            return
+        start = len(self.camera_id)
+        for name, values in zip(_LIST_COLUMNS, (columns[0], columns[1], columns[4], columns[5])):
+            column = getattr(self, name)
+            if isinstance(values, Constant):
+                column.extend([values.value] * count)
+            else:
+                column.extend(values)
+        self._extend_coords(self.latitude, columns[2], count, start, 0)
+        self._extend_coords(self.longitude, columns[3], count, start, 1)
+        self.direction.extend(columns[6], count)
+        self.road.extend(columns[7], count)
+        self.status.extend(columns[8], count)
+        self.meta_keys.extend(columns[9], count)
+        values = columns[10]
+        if isinstance(values, Constant):
+            values = [values.value] * count
+        # All-None value tuples are dropped; the interned keys rebuild them
+        self.meta_values.extend([v if v and v.count(None) != len(v) else None for v in values])
+
+    def _extend_coords(self, coords, values, count, start, column):
+        if isinstance(values, Constant):
+            values = [values.value] * count
+        floats = [v for v in values if v.__class__ is float]
+        if len(floats) == len(values):
+            coords.extend(floats)
+            return
+        for row, value in enumerate(values, start):
+            if value.__class__ is float:
+                coords.append(value)
+            else:
+                coords.append(_NAN)
+                if value is not None:
+                    self.coord_extra[row, column] = value
+
+    def append(self, camera):
+        """Append a camera given as a dict in the output schema."""
+        self.extend_rows([row_of(camera)])
+
+    def __len__(self):
+        return len(self.camera_id)
+
+    def __iter__(self):
+        for row in range(len(self.camera_id)):
+            yield Camera(self, row)
+
+    def __getitem__(self, row):
+        if isinstance(row, slice):
+            return [Camera(self, r) for r in range(*row.indices(len(self)))]
+        if row < 0:
+            row += len(self)
+        if not 0 <= row < len(self):
+            raise IndexError("camera row out of range")
+        return Camera(self, row)
+
+    def __eq__(self, other):
+        if isinstance(other, (CameraTable, list, tuple)):
+            return len(self) == len(other) and all(a == b for a, b in zip(self, other))
+        return NotImplemented
+
+    def _coord(self, row, column):
+        value = (self.latitude if column == 0 else self.longitude)[row]
+        if value != value:  # NaN: None or a non-float original
+            return self.coord_extra.get((row, column))
+        return value
+
+    def _metadata(self, row):
+        keys = self.meta_keys[row]
+        if keys is None:
+            return None
+        values = self.meta_values[row]
+        return dict(zip(keys, values)) if values else dict.fromkeys(keys)
+
+    def value(self, row, field):
+        """One field of one camera."""
+        if field in _LIST_COLUMNS or field in _INTERNED_COLUMNS:
+            return getattr(self, field)[row]
+        if field == "latitude":
+            return self._coord(row, 0)
+        if field == "longitude":
+            return self._coord(row, 1)
+        if field == "raw_metadata":
+            return self._metadata(row)
+        raise KeyError(field)
+
+    def set_value(self, row, field, value):
+        if field in _LIST_COLUMNS or field in _INTERNED_COLUMNS:
+            getattr(self, field)[row] = value
+        elif field in _COORD_COLUMNS:
+            column = _COORD_COLUMNS.index(field)
+            coords = self.latitude if column == 0 else self.longitude
+            self.coord_extra.pop((row, column), None)
+            if value.__class__ is float:
+                coords[row] = value
+            else:
+                coords[row] = _NAN
+                if value is not None:
+                    self.coord_extra[row, column] = value
+        elif field == "raw_metadata":
+            keys, values = split_metadata(value)
+            self.meta_keys[row] = keys
+            self.meta_values[row] = values if values and values.count(None) != len(values) else None
+        else:
+            raise KeyError(f"{field} is not a camera field")
+
+    def row(self, row):
+        """One camera as a plain dict in the output schema."""
+        return {
+            "camera_id": self.camera_id[row],
+            "name": self.name[row],
+            "latitude": self._coord(row, 0),
+            "longitude": self._coord(row, 1),
+            "image_url": self.image_url[row],
+            "stream_url": self.stream_url[row],
+            "direction": self.direction[row],
+            "road": self.road[row],
+            "status": self.status[row],
+            "raw_metadata": self._metadata(row),
+        }
+
+    def to_dicts(self):
+        return [self.row(r) for r in range(len(self.camera_id))]
+
+
+class Camera(Mapping):
+    """Dict-like view of one CameraTable row."""
+
+    __slots__ = ("_table", "_row")
+
+    def __init__(self, table, row):
+        self._table = table
+        self._row = row
+
+    def __getitem__(self, field):
+        return self._table.value(self._row, field)
+
+    def __setitem__(self, field, value):
+        self._table.set_value(self._row, field, value)
+
+    def __iter__(self):
+        return iter(CAMERA_FIELDS)
+
+    def __len__(self):
+        return len(CAMERA_FIELDS)
+
+    def __repr__(self):
+        return f"Camera({self.to_dict()!r})"
+
+    def to_dict(self):
+        return self._table.row(self._row)
+
+
+def to_json(obj):
+    """``default=`` hook so json.dump writes tables and rows as plain JSON."""
+    if isinstance(obj, CameraTable):
+        return obj.to_dicts()
+    if isinstance(obj, Camera):
+        return obj.to_dict()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def camera_dicts(cameras):
+    """Iterate cameras as plain dicts, whether stored in a table or a list."""
+    if isinstance(cameras, CameraTable):
+        return (cameras.row(r) for r in range(len(cameras)))
+    return iter(cameras)
+
+
+def measure_memory(sources):
+    """Bytes per camera held as dicts versus CameraTables (tracemalloc)."""
+    payload = json.dumps([source["cameras"] for source in sources], default=to_json)
+    count = sum(len(source["cameras"]) for source in sources)
+
+    def allocated(build):
+        tracemalloc.start()
+        before = tracemalloc.get_traced_memory()[0]
+        kept = build()
+        after = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        del kept
+        return after - before
+
+    # Decoding inside the measurement counts the strings too, as in a real run
+    as_dicts = allocated(lambda: json.loads(payload))
+    as_tables = allocated(lambda: [CameraTable(cameras) for cameras in json.loads(payload)])
+    return {
+        "cameras": count,
+        "dict_bytes": as_dicts,
+        "table_bytes": as_tables,
+        "dict_bytes_per_camera": as_dicts / max(count, 1),
+        "table_bytes_per_camera": as_tables / max(count, 1),
+    }
+
+
+def print_memory_report(report):
+    print(f"Memory for {report['cameras']:,} cameras:")
+    print(f"  dicts:  {report['dict_bytes'] / 1024 / 1024:8.1f} MB "
+          f"({report['dict_bytes_per_camera']:,.0f} bytes/camera)")
+    print(f"  tables: {report['table_bytes'] / 1024 / 1024:8.1f} MB "
+          f"({report['table_bytes_per_camera']:,.0f} bytes/camera)")
+    if report["table_bytes"]:
+        print(f"  {report['dict_bytes'] / report['table_bytes']:.1f}x smaller")
+
+
+def main():
+    if len(sys.argv) < 2:
+        print(__doc__)
+        sys.exit(1)
+    from output_writers import read_output
+    _, sources = read_output(sys.argv[1])
+    print_memory_report(measure_memory(sources))
+
+
+if __name__ == "__main__":
+    main()
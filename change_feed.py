@@ -0,0 +1,216 @@
+#!/usr/bin/env python3
+"""
+Incremental change feed between successive fetch runs.
+
+Every camera is keyed on (source_id, camera_id) and fingerprinted with an
+8-byte BLAKE2b hash of its canonical JSON. The previous run's keys,
+hashes and records are kept in a state file; a new run is compared key
+by key and only records whose hash differs are inspected field by field,
+so the diff is O(n) with no per-field work for unchanged cameras.
+
+Each run with changes writes <changes_dir>/<run_id>.ndjson, one patch
+operation per line:
+
+    {"op": "add",    "key": ..., "source_id": ..., "camera_id": ..., "record": {...}}
+    {"op": "remove", "key": ..., "source_id": ..., "camera_id": ...}
+    {"op": "update", "key": ..., "source_id": ..., "camera_id": ...,
+     "fields": {"status": ["online", "offline"], ...}}
+
+and <changes_dir>/latest.json points at it with the counts. Run ids have
+microsecond resolution and a -2, -3, ... suffix if a change file with the
+same id already exists, so back-to-back runs never overwrite each other.
+Sources that failed in a run are carried over unchanged instead of being
+reported as removed.
+
+Usage:
+    python change_feed.py traffic_cameras_aggregated.json [changes_dir]
+"""
+
+import gzip
+import json
+import os
+import sys
+from datetime import datetime, timezone
+from hashlib import blake2b
+
+from output_writers import read_output, temp_path
+
+# Configuration
+CHANGES_DIR = "changes"
+STATE_FILE = "snapshot_state.json.gz"
+
+
+def record_hash(camera):
+    """Stable 8-byte content hash of a camera record (hex)."""
+    payload = json.dumps(camera, sort_keys=True, separators=(",", ":"), default=str)
+    return blake2b(payload.encode("utf-8"), digest_size=8).hexdigest()
+
+
+def iter_keyed(sources):
+    """Yield (key, source_id, camera) for every camera.
+
+    Repeated camera_ids within a source get a #n suffix so every record
+    keeps a distinct, order-stable key.
+    """
+    for source in sources:
+        source_id = source["source_id"]
+        seen = {}
+        for camera in source["cameras"]:
+            key = f"{source_id}/{camera.get('camera_id')}"
+            count = seen.get(key, 0) + 1
+            seen[key] = count
+            if count > 1:
+                key = f"{key}#{count}"
+            yield key, source_id, camera
+
+
+def field_deltas(old, new):
+    """{field: [old, new]} for fields that differ between two records."""
+    deltas = {}
+    for name in old.keys() | new.keys():
+        before = old.get(name)
+        after = new.get(name)
+        if before != after:
+            deltas[name] = [before, after]
+    return deltas
+
+
+def diff(previous, sources):
+    """Compare new aggregated sources against the previous state.
+
+    ``previous`` maps key -> [source_id, hash, record]. Returns
+    ``(operations, state)`` where ``state`` is the new mapping to persist.
+    """
+    fetched = {source["source_id"] for source in sources}
+    state = {}
+    operations = []
+    for key, source_id, camera in iter_keyed(sources):
+        digest = record_hash(camera)
+        state[key] = [source_id, digest, camera]
+        old = previous.get(key)
+        camera_id = camera.get("camera_id")
+        if old is None:
+            operations.append({"op": "add", "key": key, "source_id": source_id,
+                               "camera_id": camera_id, "record": camera})
+        elif old[1] != digest:
+            operations.append({"op": "update", "key": key, "source_id": source_id,
+                               "camera_id": camera_id,
+                               "fields": field_deltas(old[2], camera)})
+
+    for key, old in previous.items():
+        if key in state:
+            continue
+        if old[0] in fetched:
+            operations.append({"op": "remove", "key": key, "source_id": old[0],
+                               "camera_id": old[2].get("camera_id")})
+        else:
+            # Source failed this run; keep its cameras until it reports again
+            state[key] = old
+    return operations, state
+
+
+class ChangeFeed:
+    """Persists the last snapshot's hashes and writes per-run patch files."""
+
+    def __init__(self, directory=CHANGES_DIR):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self.state_path = os.path.join(directory, STATE_FILE)
+
+    def load_state(self):
+        try:
+            with gzip.open(self.state_path, 'rt') as f:
+                return json.load(f)["records"]
+        except FileNotFoundError:
+            return {}
+
+    def save_state(self, state, run_id):
+        tmp = f"{self.state_path}.tmp.{os.getpid()}"
+        with gzip.open(tmp, 'wt', compresslevel=5) as f:
+            json.dump({"run_id": run_id, "records": state}, f, separators=(",", ":"))
+        os.replace(tmp, self.state_path)
+
+    def _unique_run_id(self, run_id):
+        """``run_id``, suffixed -2, -3, ... while its change file exists."""
+        unique = run_id
+        n = 1
+        while os.path.exists(os.path.join(self.directory, f"{unique}.ndjson")):
+            n += 1
+            unique = f"{run_id}-{n}"
+        return unique
+
+    def update(self, sources, run_id=None):
+        """Diff ``sources`` against the stored snapshot and record the changes.
+
+        Returns a summary dict with the counts and the change file (None
+        when nothing changed or on the very first run, which only seeds
+        the state).
+        """
+        run_id = self._unique_run_id(
+            run_id or datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S.%fZ"))
+        previous = self.load_state()
+        first_run = not previous
+        operations, state = diff(previous, sources)
+
+        counts = {"added": 0, "removed": 0, "updated": 0}
+        for op in operations:
+            counts[{"add": "added", "remove": "removed", "update": "updated"}[op["op"]]] += 1
+
+        change_file = None
+        if operations and not first_run:
+            change_file = os.path.join(self.directory, f"{run_id}.ndjson")
+            tmp = temp_path(change_file)
+            with open(tmp, 'w') as f:
+                for op in operations:
+                    f.write(json.dumps(op, separators=(",", ":")) + "\n")
+            os.replace(tmp, change_file)
+        summary = {"run_id": run_id, "first_run": first_run,
+                   "change_file": change_file and os.path.basename(change_file),
+                   "cameras": len(state), **counts}
+        latest = os.path.join(self.directory, "latest.json")
+        tmp = temp_path(latest)
+        with open(tmp, 'w') as f:
+            json.dump(summary, f, indent=2)
+        os.replace(tmp, latest)
+        self.save_state(state, run_id)
+        return summary
+
+
+def apply_changes(records, change_file):
+    """Apply a change file to a {key: record} dict in place."""
+    with open(change_file, 'r') as f:
+        for line in f:
+            op = json.loads(line)
+            if op["op"] == "add":
+                records[op["key"]] = op["record"]
+            elif op["op"] == "remove":
+                records.pop(op["key"], None)
+            else:
+                record = records.setdefault(op["key"], {})
+                for name, (_, after) in op["fields"].items():
+                    record[name] = after
+    return records
+
+
+def print_summary(summary):
+    if summary["first_run"]:
+        print(f"CHANGES: baseline of {summary['cameras']:,} cameras recorded")
+    else:
+        print(f"CHANGES: +{summary['added']} added, -{summary['removed']} removed, "
+              f"~{summary['updated']} updated")
+
+
+def main():
+    if len(sys.argv) < 2:
+        print(__doc__)
+        sys.exit(1)
+    _, sources = read_output(sys.argv[1])
+    feed = ChangeFeed(sys.argv[2] if len(sys.argv) > 2 else CHANGES_DIR)
+    summary = feed.update(sources)
+    print_summary(summary)
+    if summary["change_file"]:
+        print(f"Output: {os.path.join(feed.directory, summary['change_file'])}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,356 @@
+#!/usr/bin/env python3
+"""
+Columnar binary export of the normalized camera table.
+
+Writes the aggregate as one .camcol file that consumers memory-map
+instead of parsing nested JSON:
+
+    8 bytes   magic b"CAMCOL1\\0"
+    8 bytes   header length (little-endian uint64)
+    header    JSON: row count, per-source summaries, column descriptors
+    buffers   one or more 8-byte aligned buffers per column
+
+Column kinds:
+
+    float64   latitude / longitude; missing values are NaN
+    dict      int32 codes into a small dictionary kept in the header
+              (source_id, state, status, direction, road); -1 is null
+    string    uint64 offsets (rows + 1) into a UTF-8 data buffer, plus a
+              uint8 validity buffer (camera_id, name, image_url,
+              stream_url, raw_metadata as JSON text)
+
+CameraColumns maps the file read-only and hands out zero-copy views over
+the buffers (NumPy arrays when NumPy is installed, memoryviews otherwise).
+
+Usage:
+    python columnar_export.py traffic_cameras_aggregated.json [out.camcol]
+"""
+
+import json
+import math
+import mmap
+import os
+import struct
+import sys
+from array import array
+
+from output_writers import read_output
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+MAGIC = b"CAMCOL1\0"
+ALIGN = 8
+
+FLOAT_COLUMNS = ("latitude", "longitude")
+DICT_COLUMNS = ("source_id", "state", "status", "direction", "road")
+STRING_COLUMNS = ("camera_id", "name", "image_url", "stream_url", "raw_metadata")
+CAMERA_FIELDS = ("camera_id", "name", "latitude", "longitude", "image_url",
+                 "stream_url", "direction", "road", "status", "raw_metadata")
+
+if sys.byteorder != "little":
+    raise ImportError("columnar_export assumes a little-endian host")
+
+
+def columnar_path(output_path):
+    """Default .camcol path next to an aggregated output file."""
+    return os.path.splitext(output_path)[0] + ".camcol"
+
+
+def _to_float(value):
+    if value is None or value == "":
+        return math.nan
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return math.nan
+
+
+def _to_text(name, value):
+    if value is None:
+        return None
+    if name == "raw_metadata":
+        return json.dumps(value, separators=(",", ":"))
+    return str(value)
+
+
+class _StringBuilder:
+    def __init__(self):
+        self.offsets = array("Q", [0])
+        self.valid = bytearray()
+        self.data = bytearray()
+
+    def append(self, text):
+        if text is None:
+            self.valid.append(0)
+        else:
+            self.valid.append(1)
+            self.data += text.encode("utf-8")
+        self.offsets.append(len(self.data))
+
+
+class _DictBuilder:
+    def __init__(self):
+        self.codes = array("i")
+        self.values = []
+        self._index = {}
+
+    def append(self, value):
+        if value is None:
+            self.codes.append(-1)
+            return
+        code = self._index.get(value)
+        if code is None:
+            code = self._index[value] = len(self.values)
+            self.values.append(value)
+        self.codes.append(code)
+
+
+def build_columns(sources):
+    """Turn aggregated sources into column builders and source summaries."""
+    floats = {name: array("d") for name in FLOAT_COLUMNS}
+    dicts = {name: _DictBuilder() for name in DICT_COLUMNS}
+    strings = {name: _StringBuilder() for name in STRING_COLUMNS}
+    summaries = []
+    rows = 0
+    for source in sources:
+        summaries.append({k: v for k, v in source.items() if k != "cameras"})
+        for camera in source["cameras"]:
+            floats["latitude"].append(_to_float(camera.get("latitude")))
+            floats["longitude"].append(_to_float(camera.get("longitude")))
+            dicts["source_id"].append(source["source_id"])
+            dicts["state"].append(source.get("state"))
+            for name in ("status", "direction", "road"):
+                value = camera.get(name)
+                dicts[name].append(None if value is None else str(value))
+            for name in STRING_COLUMNS:
+                strings[name].append(_to_text(name, camera.get(name)))
+            rows += 1
+    return rows, summaries, floats, dicts, strings
+
+
+def write_columnar(sources, path):
+    """Write aggregated sources (with cameras) to a .camcol file."""
+    rows, summaries, floats, dicts, strings = build_columns(sources)
+
+    buffers = []
+    columns = {}
+
+    def add(buffer):
+        buffers.append(bytes(buffer))
+        return len(buffers) - 1
+
+    for name, values in floats.items():
+        columns[name] = {"kind": "float64", "values": add(values)}
+    for name, builder in dicts.items():
+        columns[name] = {"kind": "dict", "codes": add(builder.codes),
+                         "dictionary": builder.values}
+    for name, builder in strings.items():
+        columns[name] = {"kind": "string", "offsets": add(builder.offsets),
+                         "valid": add(builder.valid), "data": add(builder.data)}
+
+    header = {"rows": rows, "sources": summaries, "columns": columns}
+    write_container(path, header, buffers)
+    return rows
+
+
+def write_container(path, header, buffers, magic=MAGIC):
+    """Write a JSON header followed by 8-byte aligned binary buffers.
+
+    ``header["buffers"]`` is filled in with ``[offset, length]`` for each
+    buffer so readers can slice them straight out of a mapping.
+    """
+    header = dict(header, buffers=[])
+    while True:
+        header_bytes = json.dumps(header, separators=(",", ":")).encode("utf-8")
+        start = _align(len(magic) + 8 + len(header_bytes))
+        layout = []
+        offset = start
+        for buffer in buffers:
+            layout.append([offset, len(buffer)])
+            offset = _align(offset + len(buffer))
+        if layout == header["buffers"]:
+            break
+        header["buffers"] = layout
+
+    tmp = f"{path}.tmp.{os.getpid()}"
+    with open(tmp, 'wb') as f:
+        f.write(magic)
+        f.write(struct.pack("<Q", len(header_bytes)))
+        f.write(header_bytes)
+        for (offset, _), buffer in zip(layout, buffers):
+            f.write(b"\0" * (offset - f.tell()))
+            f.write(buffer)
+    os.replace(tmp, path)
+
+
+def _align(n):
+    return (n + ALIGN - 1) // ALIGN * ALIGN
+
+
+class StringColumn:
+    """Lazy view over an offset-indexed UTF-8 column."""
+
+    def __init__(self, offsets, valid, data, name):
+        self._offsets = offsets
+        self._valid = valid
+        self._data = data
+        self._json = name == "raw_metadata"
+
+    def __len__(self):
+        return len(self._valid)
+
+    def raw(self, i):
+        """Bytes for row ``i`` without decoding (None if null)."""
+        if not self._valid[i]:
+            return None
+        return self._data[self._offsets[i]:self._offsets[i + 1]]
+
+    def __getitem__(self, i):
+        raw = self.raw(i)
+        if raw is None:
+            return None
+        text = bytes(raw).decode("utf-8")
+        return json.loads(text) if self._json else text
+
+
+class DictColumn:
+    """Dictionary-encoded column: int32 codes plus the value list."""
+
+    def __init__(self, codes, dictionary):
+        self.codes = codes
+        self.dictionary = dictionary
+
+    def __len__(self):
+        return len(self.codes)
+
+    def __getitem__(self, i):
+        code = self.codes[i]
+        return None if code < 0 else self.dictionary[code]
+
+    def code_of(self, value):
+        """Code for ``value`` (for vectorized filters), or None if absent."""
+        try:
+            return self.dictionary.index(value)
+        except ValueError:
+            return None
+
+
+class BufferFile:
+    """Read-only mapping of a file written by write_container()."""
+
+    _DTYPES = {"d": "<f8", "i": "<i4", "q": "<i8", "Q": "<u8"}
+
+    def __init__(self, path, magic=MAGIC):
+        self.path = path
+        self._file = open(path, 'rb')
+        self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        buf = memoryview(self._mmap)
+        if bytes(buf[:len(magic)]) != magic:
+            raise ValueError(f"{path} is not a {magic[:6].decode().lower()} file")
+        (header_len,) = struct.unpack_from("<Q", buf, len(magic))
+        start = len(magic) + 8
+        self.header = json.loads(bytes(buf[start:start + header_len]))
+        self._buf = buf
+
+    def buffer(self, index, fmt, numpy=True):
+        """Zero-copy typed view of buffer ``index`` ("B" for raw bytes).
+
+        Returns a NumPy array when NumPy is installed and ``numpy`` is
+        true, otherwise a memoryview (faster for scalar element access).
+        """
+        offset, length = self.header["buffers"][index]
+        view = self._buf[offset:offset + length]
+        if fmt == "B":
+            return view
+        if numpy and np is not None:
+            return np.frombuffer(view, dtype=self._DTYPES[fmt])
+        return view.cast(fmt)
+
+    def close(self):
+        # The mapping can only be closed once no views remain; otherwise
+        # it is left for garbage collection
+        try:
+            self._buf.release()
+            self._mmap.close()
+        except BufferError:
+            pass
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class CameraColumns(BufferFile):
+    """Memory-mapped reader for .camcol files."""
+
+    def __init__(self, path):
+        super().__init__(path)
+        self.rows = self.header["rows"]
+        self.sources = self.header["sources"]
+        self._columns = {}
+
+    def column(self, name):
+        """Zero-copy column access; float64 columns are arrays of doubles."""
+        column = self._columns.get(name)
+        if column is not None:
+            return column
+        spec = self.header["columns"][name]
+        if spec["kind"] == "float64":
+            column = self.buffer(spec["values"], "d")
+        elif spec["kind"] == "dict":
+            column = DictColumn(self.buffer(spec["codes"], "i"), spec["dictionary"])
+        else:
+            column = StringColumn(self.buffer(spec["offsets"], "Q"),
+                                  self.buffer(spec["valid"], "B"),
+                                  self.buffer(spec["data"], "B"), name)
+        self._columns[name] = column
+        return column
+
+    def __getitem__(self, name):
+        return self.column(name)
+
+    def __len__(self):
+        return self.rows
+
+    def row(self, i):
+        """Rebuild row ``i`` as a camera dict in the aggregated JSON schema."""
+        camera = {}
+        for name in CAMERA_FIELDS:
+            value = self.column(name)[i]
+            if name in FLOAT_COLUMNS:
+                value = None if math.isnan(value) else float(value)
+            camera[name] = value
+        return camera
+
+    def iter_rows(self):
+        for i in range(self.rows):
+            yield self.row(i)
+
+    def close(self):
+        self._columns.clear()
+        super().close()
+
+
+def export_columnar(output_path, path=None):
+    """Export an aggregated output file (any format) to .camcol."""
+    path = path or columnar_path(output_path)
+    _, sources = read_output(output_path)
+    return path, write_columnar(sources, path)
+
+
+def main():
+    if len(sys.argv) < 2:
+        print(__doc__)
+        sys.exit(1)
+    path, rows = export_columnar(sys.argv[1], sys.argv[2] if len(sys.argv) > 2 else None)
+    print(f"Wrote {rows:,} cameras to {path} ({os.path.getsize(path):,} bytes)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,238 @@
+#!/usr/bin/env python3
+"""
+Cross-source camera deduplication.
+
+Several sources overlap (ny_nycdot / ny_511ny, ne_newengland511 /
+ct_cttravel), so the same physical camera can appear more than once in
+the aggregate. This stage buckets every camera into a lat/lon grid whose
+cells are DEDUP_DISTANCE_M tall, compares each camera only with cameras
+from other sources in the neighbouring cells, and links pairs that are
+within the distance and have similar name/road tokens. Linked pairs are
+merged closest first with union-find into one canonical camera that points
+back to each source record, so the pass stays near-linear as sources are
+added. A cluster never takes two cameras from the same source: the NB and
+SB cameras at one interchange stay distinct even when another source has a
+single camera between them.
+
+Usage:
+    python dedup_cameras.py traffic_cameras_aggregated.json [out.json]
+"""
+
+import json
+import math
+import os
+import re
+import sys
+
+from camera_index import KM_PER_DEG, haversine_km
+from output_writers import read_output
+
+# Configuration
+DEDUP_DISTANCE_M = 60  # Cameras further apart than this are never merged
+NAME_SIMILARITY = 0.3  # Minimum token Jaccard similarity of name + road
+
+_TOKEN = re.compile(r"[a-z0-9]+")
+_ABBREVIATIONS = {
+    "north": "n", "south": "s", "east": "e", "west": "w",
+    "nb": "n", "sb": "s", "eb": "e", "wb": "w",
+    "northbound": "n", "southbound": "s", "eastbound": "e", "westbound": "w",
+    "interstate": "i", "highway": "hwy", "route": "rt", "street": "st",
+    "avenue": "ave", "road": "rd", "boulevard": "blvd", "expressway": "expy",
+    "at": "@", "and": "&",
+}
+_STOPWORDS = {"@", "&", "the", "of", "cam", "camera"}
+
+
+def dedup_path(output_path):
+    """Default path for the canonical camera list."""
+    return os.path.splitext(output_path)[0] + ".dedup.json"
+
+
+def tokens(camera):
+    """Normalized name + road tokens used for similarity."""
+    text = f"{camera.get('name') or ''} {camera.get('road') or ''}".lower()
+    words = (_ABBREVIATIONS.get(t, t) for t in _TOKEN.findall(text))
+    return frozenset(w for w in words if w not in _STOPWORDS)
+
+
+def similar(a, b, min_similarity=NAME_SIMILARITY):
+    """Token Jaccard check; a record without any name/road text matches on distance."""
+    if not a or not b:
+        return True
+    return len(a & b) / len(a | b) >= min_similarity
+
+
+class _UnionFind:
+    def __init__(self, labels):
+        self.parent = list(range(len(labels)))
+        self.labels = labels
+        self.merged = {}  # root -> labels of its set, once it has more than one
+
+    def find(self, i):
+        parent = self.parent
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    def union(self, i, j):
+        """Join the sets of i and j unless they share a label.
+
+        Returns False when the union is refused.
+        """
+        ri = self.find(i)
+        rj = self.find(j)
+        if ri == rj:
+            return True
+        li = self.merged.get(ri) or {self.labels[ri]}
+        lj = self.merged.get(rj) or {self.labels[rj]}
+        if not li.isdisjoint(lj):
+            return False
+        # Lower index wins so the earliest source stays canonical
+        if rj < ri:
+            ri, rj = rj, ri
+        self.parent[rj] = ri
+        self.merged.pop(rj, None)
+        self.merged[ri] = li | lj
+        return True
+
+
+def _coords(camera):
+    try:
+        lat = float(camera.get("latitude"))
+        lon = float(camera.get("longitude"))
+    except (TypeError, ValueError):
+        return None
+    if not (-90.0 <= lat <= 90.0 and -180.0 <= lon <= 180.0) or (lat == 0 and lon == 0):
+        return None
+    return lat, lon
+
+
+def dedup(sources, distance_m=DEDUP_DISTANCE_M, min_similarity=NAME_SIMILARITY):
+    """Cluster duplicate cameras across sources.
+
+    Returns ``(canonical, report)``. Each canonical camera is the record
+    from the earliest source in its cluster plus ``canonical_id`` and a
+    ``sources`` list of {source_id, camera_id} links. The report has the
+    overall counts and ``pairs``: linked record counts per source pair.
+    """
+    records = []
+    for source in sources:
+        for camera in source["cameras"]:
+            records.append((source["source_id"], camera))
+
+    cell_deg = distance_m / 1000.0 / KM_PER_DEG
+    distance_km = distance_m / 1000.0
+    points = [None] * len(records)
+    grid = {}
+    for i, (_, camera) in enumerate(records):
+        coords = _coords(camera)
+        if coords is None:
+            continue
+        key = (int((coords[0] + 90.0) // cell_deg), int((coords[1] + 180.0) // cell_deg))
+        points[i] = (coords[0], coords[1], key)
+        grid.setdefault(key, []).append(i)
+
+    token_cache = {}
+    links = []
+
+    def tokens_of(i):
+        t = token_cache.get(i)
+        if t is None:
+            t = token_cache[i] = tokens(records[i][1])
+        return t
+
+    for i, point in enumerate(points):
+        if point is None:
+            continue
+        lat, lon, (r, c) = point
+        # A cell is cell_deg wide in longitude, which covers less ground
+        # away from the equator
+        reach = int(math.ceil(1.0 / max(math.cos(math.radians(abs(lat) + cell_deg)), 1e-6)))
+        source_i = records[i][0]
+        for rr in (r - 1, r, r + 1):
+            for cc in range(c - reach, c + reach + 1):
+                for j in grid.get((rr, cc), ()):
+                    if j <= i or records[j][0] == source_i:
+                        continue
+                    other = points[j]
+                    d = haversine_km(lat, lon, other[0], other[1])
+                    if d > distance_km:
+                        continue
+                    if not similar(tokens_of(i), tokens_of(j), min_similarity):
+                        continue
+                    links.append((d, i, j))
+
+    # Closest pairs first, so a camera joins its nearest match when two
+    # cameras from one source are both in reach
+    links.sort()
+    uf = _UnionFind([source_id for source_id, _ in records])
+    pairs = {}
+    for _, i, j in links:
+        if uf.union(i, j):
+            pair = "|".join(sorted((records[i][0], records[j][0])))
+            pairs[pair] = pairs.get(pair, 0) + 1
+
+    clusters = {}
+    for i in range(len(records)):
+        clusters.setdefault(uf.find(i), []).append(i)
+
+    canonical = []
+    removed_by_source = {}
+    for root in sorted(clusters):
+        members = clusters[root]
+        source_id, camera = records[root]
+        record = dict(camera)
+        record["canonical_id"] = f"{source_id}:{camera.get('camera_id')}"
+        record["source_id"] = source_id
+        record["sources"] = [{"source_id": records[m][0],
+                              "camera_id": records[m][1].get("camera_id")} for m in members]
+        canonical.append(record)
+        for m in members[1:]:
+            removed_by_source[records[m][0]] = removed_by_source.get(records[m][0], 0) + 1
+
+    report = {
+        "input_cameras": len(records),
+        "unique_cameras": len(canonical),
+        "duplicates_removed": len(records) - len(canonical),
+        "distance_m": distance_m,
+        "min_similarity": min_similarity,
+        "pairs": dict(sorted(pairs.items())),
+        "removed_by_source": dict(sorted(removed_by_source.items())),
+    }
+    return canonical, report
+
+
+def dedup_output(output_path, path=None, distance_m=DEDUP_DISTANCE_M,
+                 min_similarity=NAME_SIMILARITY):
+    """Dedup an aggregated output file and write the canonical list."""
+    path = path or dedup_path(output_path)
+    _, sources = read_output(output_path)
+    canonical, report = dedup(sources, distance_m, min_similarity)
+    with open(path, 'w') as f:
+        json.dump({"metadata": report, "cameras": canonical}, f, indent=2)
+    return path, report
+
+
+def print_report(report, limit=10):
+    """Print the dedup totals and the source pairs with the most links."""
+    print(f"UNIQUE: {report['unique_cameras']:,} cameras "
+          f"({report['duplicates_removed']:,} cross-source duplicates removed)")
+    top = sorted(report["pairs"].items(), key=lambda item: -item[1])
+    for pair, count in top[:limit]:
+        print(f"  {pair.replace('|', ' <-> ')}: {count}")
+    if len(top) > limit:
+        print(f"  ... {len(top) - limit} more source pairs")
+
+
+def main():
+    if len(sys.argv) < 2:
+        print(__doc__)
+        sys.exit(1)
+    path, report = dedup_output(sys.argv[1], sys.argv[2] if len(sys.argv) > 2 else None)
+    print_report(report)
+    print(f"Output: {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+Persistent conditional-GET cache for camera feeds.
+
+Each source gets two files under the cache directory, keyed by source id:
+
+    <source_id>.meta.json     ETag / Last-Modified validators, url, timestamps
+    <source_id>.cameras.json  the normalized camera list from the last 200
+
+The small meta file is read before every fetch to build If-None-Match /
+If-Modified-Since headers. On a 304 the normalized cameras are reused as-is,
+so neither the raw feed nor the process_* functions run again.
+"""
+
+import json
+import os
+import time
+
+from camera_table import CameraTable, to_json
+
+# Configuration
+CACHE_DIR = ".feed_cache"
+CACHE_MAX_AGE = 7 * 24 * 3600  # Drop entries not revalidated for a week
+CACHE_MAX_BYTES = 256 * 1024 * 1024  # Least recently used entries go first
+
+
+def _write_atomic(path, payload):
+    tmp = f"{path}.tmp.{os.getpid()}"
+    with open(tmp, 'w') as f:
+        json.dump(payload, f, separators=(",", ":"), default=to_json)
+    os.replace(tmp, path)
+
+
+class FeedCache:
+    """On-disk validator + normalized-result cache keyed by source id."""
+
+    def __init__(self, directory=CACHE_DIR, max_age=CACHE_MAX_AGE, max_bytes=CACHE_MAX_BYTES):
+        self.directory = directory
+        self.max_age = max_age
+        self.max_bytes = max_bytes
+        os.makedirs(directory, exist_ok=True)
+
+    def _meta_path(self, source_id):
+        return os.path.join(self.directory, f"{source_id}.meta.json")
+
+    def _cameras_path(self, source_id):
+        return os.path.join(self.directory, f"{source_id}.cameras.json")
+
+    def load(self, source):
+        """Return the cache entry for a source, or None if missing or stale."""
+        try:
+            with open(self._meta_path(source["id"]), 'r') as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if entry.get("url") != source["url"]:
+            return None
+        if time.time() - entry.get("validated_at", 0) > self.max_age:
+            return None
+        if not os.path.exists(self._cameras_path(source["id"])):
+            return None
+        return entry
+
+    @staticmethod
+    def conditional_headers(entry):
+        """Request headers that let the server answer 304 Not Modified."""
+        headers = {}
+        if entry:
+            if entry.get("etag"):
+                headers["If-None-Match"] = entry["etag"]
+            if entry.get("last_modified"):
+                headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+
+    def load_cameras(self, source):
+        """Return the normalized cameras stored with the entry."""
+        with open(self._cameras_path(source["id"]), 'r') as f:
+            return CameraTable(json.load(f))
+
+    def store(self, source, response_headers, cameras):
+        """Save validators and normalized cameras after a 200 response."""
+        etag = response_headers.get("ETag")
+        last_modified = response_headers.get("Last-Modified")
+        if not etag and not last_modified:
+            # Nothing to revalidate with; caching would never pay off
+            self.discard(source["id"])
+            return
+        now = time.time()
+        _write_atomic(self._cameras_path(source["id"]), cameras)
+        _write_atomic(self._meta_path(source["id"]), {
+            "source_id": source["id"],
+            "url": source["url"],
+            "etag": etag,
+            "last_modified": last_modified,
+            "stored_at": now,
+            "validated_at": now,
+            "camera_count": len(cameras),
+        })
+
+    def touch(self, source, entry):
+        """Record a successful revalidation (304) for age and LRU eviction."""
+        entry["validated_at"] = time.time()
+        _write_atomic(self._meta_path(source["id"]), entry)
+        os.utime(self._cameras_path(source["id"]))
+
+    def discard(self, source_id):
+        for path in (self._meta_path(source_id), self._cameras_path(source_id)):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    def evict(self):
+        """Apply the age and size limits. Returns the number of entries removed."""
+        entries = []
+        for name in os.listdir(self.directory):
+            if not name.endswith(".meta.json"):
+                continue
+            source_id = name[:-len(".meta.json")]
+            size = 0
+            last_used = 0
+            for path in (self._meta_path(source_id), self._cameras_path(source_id)):
+                try:
+                    st = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                size += st.st_size
+                last_used = max(last_used, st.st_mtime)
+            entries.append((last_used, size, source_id))
+
+        removed = 0
+        now = time.time()
+        total = sum(size for _, size, _ in entries)
+        for last_used, size, source_id in sorted(entries):
+            if now - last_used > self.max_age or total > self.max_bytes:
+                self.discard(source_id)
+                total -= size
+                removed += 1
+        return removed
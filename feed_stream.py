@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+"""
+Incremental JSON parsing for large camera feeds.
+
+iter_items() walks a feed's body chunk by chunk and yields the elements
+of one array (the top-level array, or the array under a top-level key
+such as "item2", "data" or "features") as they are completed. Only the
+current element and an unconsumed chunk tail are held in memory, so peak
+usage tracks one camera record instead of the whole feed.
+
+Uses ijson (C backend when available) if installed and falls back to an
+incremental stdlib decoder otherwise. loads() uses orjson when installed
+for the non-streaming paths.
+"""
+
+import codecs
+import json
+
+try:
+    import ijson
+except ImportError:
+    ijson = None
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+CHUNK_SIZE = 64 * 1024
+_WHITESPACE = " \t\n\r"
+_DELIMITERS = _WHITESPACE + ",]}"
+
+
+def loads(payload):
+    """Parse a whole JSON document from str or bytes."""
+    if orjson is not None:
+        return orjson.loads(payload)
+    return json.loads(payload)
+
+
+class _ChunkFile:
+    """File-like adapter so ijson can read from an iterator of byte chunks."""
+
+    def __init__(self, chunks):
+        self._chunks = iter(chunks)
+        self._pending = b""
+
+    def read(self, size=-1):
+        while size < 0 or len(self._pending) < size:
+            chunk = next(self._chunks, None)
+            if chunk is None:
+                break
+            self._pending += chunk
+        if size < 0:
+            data, self._pending = self._pending, b""
+        else:
+            data, self._pending = self._pending[:size], self._pending[size:]
+        return data
+
+
+class _IncrementalDecoder:
+    """Stdlib fallback: raw_decode() values out of a sliding text buffer."""
+
+    def __init__(self, chunks):
+        self._chunks = iter(chunks)
+        self._utf8 = codecs.getincrementaldecoder("utf-8-sig")(errors="replace")
+        self._decoder = json.JSONDecoder()
+        self._buf = ""
+        self._pos = 0
+        self._eof = False
+
+    def _fill(self):
+        if self._eof:
+            return False
+        chunk = next(self._chunks, None)
+        if chunk is None:
+            self._eof = True
+            text = self._utf8.decode(b"", final=True)
+        else:
+            text = self._utf8.decode(chunk)
+        # Drop what has already been consumed so the buffer stays small
+        self._buf = self._buf[self._pos:] + text
+        self._pos = 0
+        return True
+
+    def peek(self):
+        """Return the next non-whitespace character without consuming it."""
+        while True:
+            buf = self._buf
+            pos = self._pos
+            while pos < len(buf) and buf[pos] in _WHITESPACE:
+                pos += 1
+            self._pos = pos
+            if pos < len(buf):
+                return buf[pos]
+            if not self._fill():
+                raise ValueError("unexpected end of feed")
+
+    def expect(self, chars):
+        ch = self.peek()
+        if ch not in chars:
+            raise ValueError(f"expected one of {chars!r} in feed, got {ch!r}")
+        self._pos += 1
+        return ch
+
+    def value(self):
+        """Decode the next complete JSON value."""
+        self.peek()
+        while True:
+            try:
+                obj, end = self._decoder.raw_decode(self._buf, self._pos)
+            except json.JSONDecodeError:
+                if not self._fill():
+                    raise
+                continue
+            # A number cut by a chunk boundary ("3." + "5e1") decodes as a
+            # shorter number; only trust it once a delimiter follows
+            if not isinstance(obj, (dict, list, str)) and not self._eof:
+                if end == len(self._buf) or self._buf[end] not in _DELIMITERS:
+                    self._fill()
+                    continue
+            self._pos = end
+            return obj
+
+    def array_items(self):
+        self.expect("[")
+        if self.peek() == "]":
+            self._pos += 1
+            return
+        while True:
+            yield self.value()
+            if self.expect(",]") == "]":
+                return
+
+    def items(self, key):
+        if key is None:
+            yield from self.array_items()
+            return
+        self.expect("{")
+        if self.peek() == "}":
+            return
+        while True:
+            name = self.value()
+            self.expect(":")
+            if name == key:
+                if self.peek() == "[":
+                    yield from self.array_items()
+                # Nothing after the target array is needed
+                return
+            self.value()
+            if self.expect(",}") == "}":
+                return
+
+
+def iter_items(chunks, key=None):
+    """Yield elements of the top-level array, or of the array under ``key``.
+
+    ``chunks`` is any iterator of bytes, e.g. ``response.iter_content()``.
+    A missing key yields nothing, mirroring ``data.get(key, [])``.
+    """
+    if ijson is not None:
+        prefix = f"{key}.item" if key else "item"
+        yield from ijson.items(_ChunkFile(chunks), prefix, use_float=True)
+    else:
+        yield from _IncrementalDecoder(chunks).items(key)
@@ -8,12 +8,33 @@ Working sources: 27
 Total cameras: ~23,000+
 """
 
-import json
-import requests
+import argparse
+import os
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import contextmanager
 from datetime import datetime, timezone
 import sys
 
+import http_transport
+import metrics
+from arcgis_layers import NOT_MODIFIED, PAGE_WORKERS, fetch_layer, is_layer_query
+from camera_index import build_index
+from camera_reader import build_offsets
+from change_feed import CHANGES_DIR, ChangeFeed, print_summary as print_change_summary
+from columnar_export import export_columnar
+from dedup_cameras import dedup_output, print_report as print_dedup_report
+from feed_cache import CACHE_DIR, FeedCache
+from feed_stream import CHUNK_SIZE, iter_items, loads
+from field_mappings import PLUGIN_SOURCES, PROCESSORS, STREAM_PROCESSORS, load_feeds
+from history_store import HISTORY_DIR, HistoryStore, print_summary as print_history_summary
+from http_transport import host_of
+from output_writers import (OUTPUT_FORMATS, default_output_path, open_writer, read_output,
+                            source_summary)
+from parse_pool import PARSE_WORKERS, ParsePool, normalize_file
+from validate_coordinates import print_report as print_coordinate_report, total_issues, validate_result
+
 # Disable SSL warnings for some older government sites
 import urllib3
 urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
@@ -21,7 +42,9 @@ urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
 # Configuration
 OUTPUT_FILE = "traffic_cameras_aggregated.json"
 TIMEOUT = 30
-DELAY_BETWEEN_REQUESTS = 0.5  # Be nice to servers
+DELAY_BETWEEN_REQUESTS = 0.5  # Be nice to servers (applied per host)
+MAX_WORKERS = 8  # Global limit on concurrent fetches
+PER_HOST_CONCURRENCY = 1  # Concurrent fetches allowed against one host
 
 # ============================================================================
 # VERIFIED WORKING SOURCES
@@ -124,200 +147,487 @@ REQUIRES_AUTH = [
 # PROCESSORS
 # ============================================================================
 
-def fetch_url(url, timeout=TIMEOUT):
-    """Fetch URL with error handling."""
-    headers = {
-        'User-Agent': 'Mozilla/5.0 (compatible; TrafficCameraAggregator/1.0)',
-        'Accept': 'application/json, text/plain, */*'
-    }
+def fetch_response(url, headers=None, timeout=TIMEOUT, stream=False):
+    """Fetch URL over the shared per-host session pool; None on error."""
     try:
-        response = requests.get(url, headers=headers, timeout=timeout, verify=False)
+        response = http_transport.get_pool().get(url, headers=headers, timeout=timeout,
+                                                 stream=stream)
         response.raise_for_status()
-        return response.text
+        return response
     except Exception as e:
+        metrics.error(e)
         return None
 
-def process_nyc_dot(data, source):
-    """Process NYC DOT format."""
-    cameras = []
-    for cam in data:
-        cameras.append({
-            "camera_id": cam.get("id", ""),
-            "name": cam.get("name", ""),
-            "latitude": cam.get("latitude"),
-            "longitude": cam.get("longitude"),
-            "image_url": cam.get("imageUrl", ""),
-            "stream_url": None,
-            "direction": None,
-            "road": None,
-            "status": "online" if cam.get("isOnline") == "true" else "offline",
-            "raw_metadata": {"area": cam.get("area", "")}
-        })
-    return cameras
-
-def process_511_system(data, source):
-    """Process 511 system format (item1=icon, item2=cameras array)."""
-    cameras = []
-    cam_list = data.get("item2", [])
-    base_url = source["url"].rsplit("/map/", 1)[0]
-    for cam in cam_list:
-        loc = cam.get("location", [])
-        expando = cam.get("expando", {})
-        video_url = (expando.get("videoUrl") or expando.get("VideoUrl")
-                     or cam.get("videoUrl") or cam.get("VideoUrl"))
-        cameras.append({
-            "camera_id": str(cam.get("itemId", "")),
-            "name": cam.get("title", ""),
-            "latitude": loc[0] if len(loc) > 0 else None,
-            "longitude": loc[1] if len(loc) > 1 else None,
-            "image_url": f"{base_url}/map/Cameras/{cam.get('itemId', '')}",
-            "stream_url": video_url,
-            "direction": None,
-            "road": None,
-            "status": "online",
-            "raw_metadata": {"videoEnabled": expando.get("videoEnabled", False)} if expando else {}
-        })
-    return cameras
-
-def process_caltrans(data, source):
-    """Process Caltrans format."""
-    cameras = []
-    for item in data.get("data", []):
-        cam = item.get("cctv", {})
-        loc = cam.get("location", {})
-        img = cam.get("imageData", {})
-        static = img.get("static", {})
-        cameras.append({
-            "camera_id": cam.get("index", ""),
-            "name": loc.get("locationName", ""),
-            "latitude": float(loc.get("latitude", 0)) if loc.get("latitude") else None,
-            "longitude": float(loc.get("longitude", 0)) if loc.get("longitude") else None,
-            "image_url": static.get("currentImageURL", ""),
-            "stream_url": img.get("streamingVideoURL"),
-            "direction": loc.get("direction"),
-            "road": loc.get("route"),
-            "status": "online" if cam.get("inService") == "true" else "offline",
-            "raw_metadata": {
-                "district": loc.get("district"),
-                "county": loc.get("county"),
-                "nearbyPlace": loc.get("nearbyPlace"),
-                "elevation": loc.get("elevation"),
-                "postmile": loc.get("postmile"),
-                "milepost": loc.get("milepost")
-            }
-        })
-    return cameras
-
-def process_arcgis(data, source):
-    """Process ArcGIS REST API format."""
-    cameras = []
-    for feature in data.get("features", []):
-        attrs = feature.get("attributes", {})
-        geom = feature.get("geometry", {})
-        cameras.append({
-            "camera_id": str(attrs.get("OBJECTID", attrs.get("feedID", ""))),
-            "name": attrs.get("location", attrs.get("name", "")),
-            "latitude": attrs.get("lat", geom.get("y")),
-            "longitude": attrs.get("long", geom.get("x")),
-            "image_url": attrs.get("url", ""),
-            "stream_url": None,
-            "direction": None,
-            "road": None,
-            "status": "online",
-            "raw_metadata": {
-                "county": attrs.get("county"),
-                "feedID": attrs.get("feedID")
-            }
-        })
-    return cameras
-
-PROCESSORS = {
-    "nyc_dot": process_nyc_dot,
-    "511_system": process_511_system,
-    "caltrans": process_caltrans,
-    "arcgis": process_arcgis,
-}
-
-def process_source(source):
-    """Process a single source."""
-    print(f"  Fetching {source['name']}...", end=" ", flush=True)
-
-    text = fetch_url(source["url"])
-    if not text:
-        print("FAILED (fetch error)")
+def fetch_url(url, timeout=TIMEOUT):
+    """Fetch URL with error handling."""
+    response = fetch_response(url, timeout=timeout)
+    return response.text if response is not None else None
+
+# Normalization is compiled from the declarative specs in field_mappings.py.
+# The per-format names stay importable for existing callers.
+process_nyc_dot = PROCESSORS["nyc_dot"]
+process_511_system = PROCESSORS["511_system"]
+process_511_items = STREAM_PROCESSORS["511_system"][1]
+process_caltrans = PROCESSORS["caltrans"]
+process_caltrans_items = STREAM_PROCESSORS["caltrans"][1]
+process_arcgis = PROCESSORS["arcgis"]
+process_arcgis_items = STREAM_PROCESSORS["arcgis"][1]
+
+_log_lock = threading.Lock()
+
+def log(message):
+    """Print one whole line; safe to call from worker threads."""
+    with _log_lock:
+        print(message, flush=True)
+
+def parse_cameras(response, source, stream=True):
+    """Parse and normalize a 200 response body.
+
+    The streaming path feeds array elements to the item-level processor
+    as they are decoded, never holding the raw body or full object tree.
+    """
+    if stream and source["processor"] in STREAM_PROCESSORS:
+        key, processor = STREAM_PROCESSORS[source["processor"]]
+        chunks = metrics.timed_chunks(response.iter_content(CHUNK_SIZE))
+        # Decoding happens inside the normalize loop; timed_iter moves it to
+        # parse, and timed_chunks the waits on the body from parse to download
+        items = metrics.timed_iter(iter_items(chunks, key), "parse", "normalize")
+        with metrics.timed("normalize"):
+            return processor(items, source)
+    processor = PROCESSORS.get(source["processor"])
+    with metrics.timed("parse"):
+        data = loads(response.content)
+    with metrics.timed("normalize"):
+        return processor(data, source)
+
+def source_result(source, cameras, fetched_at=None):
+    """The per-source entry of the aggregated output."""
+    return {
+        "source_id": source["id"],
+        "source_name": source["name"],
+        "source_url": source["url"],
+        "state": source["state"],
+        "jurisdiction_type": source["type"],
+        "last_fetched": fetched_at or datetime.now(timezone.utc).isoformat(),
+        "api_type": "REST/JSON",
+        "camera_count": len(cameras),
+        "cameras": cameras
+    }
+
+@metrics.tracked
+def process_source(source, label="", cache=None, stream=True, parse_pool=None, throttle=None):
+    """Process a single source.
+
+    With a FeedCache, the request is made conditional on the stored
+    validators and a 304 reuses the cached normalized cameras. With a
+    ParsePool, the body is downloaded whole and parsed in a worker process.
+    ArcGIS layer queries are paged (see process_layer); ``throttle`` is the
+    HostThrottle whose slot the caller holds, used to pace the pages.
+    """
+    name = source["name"]
+    stream = stream and parse_pool is None
+
+    if is_layer_query(source):
+        result = process_layer(source, label, cache, throttle)
+        if result is not False:
+            return result
+
+    entry = cache.load(source) if cache else None
+    with metrics.timed("request"):
+        response = fetch_response(source["url"], headers=FeedCache.conditional_headers(entry),
+                                  stream=stream)
+    if response is None:
+        log(f"{label}  Fetching {name}... FAILED (fetch error)")
         return None
 
     try:
-        processor = PROCESSORS.get(source["processor"])
-        data = json.loads(text)
-        cameras = processor(data, source)
+        not_modified = response.status_code == 304 and entry is not None
+        if not_modified:
+            with metrics.timed("parse"):
+                cameras = cache.load_cameras(source)
+            cache.touch(source, entry)
+        elif parse_pool is not None:
+            # Parse and normalize both happen in the worker, which times them
+            cameras = parse_pool.normalize(source, response.content)
+        else:
+            cameras = parse_cameras(response, source, stream)
 
+        metrics.response_done(response)
         if not cameras:
-            print("FAILED (no cameras found)")
+            metrics.error("NoCameras")
+            log(f"{label}  Fetching {name}... FAILED (no cameras found)")
             return None
 
-        result = {
-            "source_id": source["id"],
-            "source_name": source["name"],
-            "source_url": source["url"],
-            "state": source["state"],
-            "jurisdiction_type": source["type"],
-            "last_fetched": datetime.now(timezone.utc).isoformat(),
-            "api_type": "REST/JSON",
-            "camera_count": len(cameras),
-            "cameras": cameras
-        }
-        print(f"OK ({len(cameras)} cameras)")
+        if cache and not not_modified:
+            cache.store(source, response.headers, cameras)
+
+        result = source_result(source, cameras)
+        cached = ", not modified" if not_modified else ""
+        log(f"{label}  Fetching {name}... OK ({len(cameras)} cameras{cached})")
         return result
     except Exception as e:
-        print(f"FAILED ({str(e)[:50]})")
+        metrics.error(e)
+        log(f"{label}  Fetching {name}... FAILED ({str(e)[:50]})")
+        return None
+    finally:
+        response.close()
+
+def process_layer(source, label="", cache=None, throttle=None):
+    """Page through an ArcGIS layer query; False when the layer can't be paged.
+
+    With a FeedCache, the layer description is requested conditionally:
+    a 304 reuses the cached cameras before any query runs, a 200 supplies
+    the validators the paged cameras are stored under. Every request is
+    paced by ``throttle`` and at most its per-host limit of pages run at
+    once, all under the one slot the caller holds.
+    """
+    name = source["name"]
+
+    paced = [False]  # slot() already paced the first request
+
+    def fetch(url, headers=None, stream=False):
+        if throttle is not None and paced[0]:
+            throttle.pace(url)
+        paced[0] = True
+        return fetch_response(url, headers=headers, stream=stream)
+
+    entry = cache.load(source) if cache else None
+    workers = min(PAGE_WORKERS, throttle.per_host if throttle else PER_HOST_CONCURRENCY)
+    try:
+        fetched = fetch_layer(source, fetch, workers, FeedCache.conditional_headers(entry))
+        if fetched is None:
+            return False
+        if fetched is NOT_MODIFIED:
+            with metrics.timed("parse"):
+                cameras = cache.load_cameras(source)
+            if cameras:
+                cache.touch(source, entry)
+                log(f"{label}  Fetching {name}... OK ({len(cameras)} cameras, not modified)")
+                return source_result(source, cameras)
+            # Cached cameras vanished; page through without validators
+            fetched = fetch_layer(source, fetch, workers)
+            if fetched is None:
+                return False
+        cameras, pages, validators = fetched
+    except Exception as e:
+        metrics.error(e)
+        log(f"{label}  Fetching {name}... FAILED ({str(e)[:50]})")
+        return None
+    if not cameras:
+        metrics.error("NoCameras")
+        log(f"{label}  Fetching {name}... FAILED (no cameras found)")
         return None
+    if cache:
+        cache.store(source, validators, cameras)
+    log(f"{label}  Fetching {name}... OK ({len(cameras)} cameras, {pages} pages)")
+    return source_result(source, cameras)
+
+# ============================================================================
+# CONCURRENT FETCHING
+# ============================================================================
+
+class HostThrottle:
+    """Per-host politeness: caps in-flight requests and spaces out their starts.
+
+    Different hosts are never delayed by each other, so the 511 sites and
+    NYC DOT run in parallel while the Caltrans districts (all on
+    cwwp2.dot.ca.gov) are still fetched one after another.
+    """
+
+    def __init__(self, delay=DELAY_BETWEEN_REQUESTS, per_host=PER_HOST_CONCURRENCY):
+        self.delay = delay
+        self.per_host = per_host
+        self._lock = threading.Lock()
+        self._semaphores = {}
+        self._next_start = {}
+
+    @contextmanager
+    def slot(self, url):
+        host = host_of(url)
+        with self._lock:
+            semaphore = self._semaphores.get(host)
+            if semaphore is None:
+                semaphore = threading.BoundedSemaphore(self.per_host)
+                self._semaphores[host] = semaphore
+        with semaphore:
+            self.pace(url)
+            yield
+
+    def pace(self, url):
+        """Wait until the host's next request may start.
+
+        slot() calls this once; a source that makes several requests
+        under its slot (a paged layer) calls it before each one.
+        """
+        host = host_of(url)
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._next_start.get(host, now))
+            self._next_start[host] = start + self.delay
+        if start > now:
+            time.sleep(start - now)
+
+def interleave_by_host(sources):
+    """Order sources round-robin across hosts.
+
+    Workers blocked on a busy host hold a pool slot, so submitting the
+    12 Caltrans districts back to back would starve everything queued
+    behind them.
+    """
+    queues = {}
+    for index, source in enumerate(sources):
+        queues.setdefault(host_of(source["url"]), []).append((index, source))
+    ordered = []
+    while queues:
+        for host in list(queues):
+            ordered.append(queues[host].pop(0))
+            if not queues[host]:
+                del queues[host]
+    return ordered
+
+def fetch_all(sources, max_workers=MAX_WORKERS, throttle=None, cache=None, stream=True,
+              on_result=None, parse_pool=None):
+    """Run process_source over all sources concurrently.
+
+    Returns one entry per source, in the same order as ``sources``
+    (None for failures), so the output matches a sequential run.
+    ``on_result(index, result)`` is called from this thread as each source
+    finishes (result None when it failed); its return value is what gets
+    kept in the returned list.
+    """
+    if throttle is None:
+        throttle = HostThrottle()
+    results = [None] * len(sources)
+    total = len(sources)
+    done = [0]
+    done_lock = threading.Lock()
+
+    def run(source):
+        with throttle.slot(source["url"]):
+            with done_lock:
+                done[0] += 1
+                label = f"[{done[0]}/{total}]"
+            return process_source(source, label, cache, stream, parse_pool, throttle)
+
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as pool:
+        futures = {pool.submit(run, source): index
+                   for index, source in interleave_by_host(sources)}
+        for future in as_completed(futures):
+            index = futures[future]
+            result = future.result()
+            if on_result is not None:
+                result = on_result(index, result)
+            results[index] = result
+    return results
+
+def payload_files(payload_dir, sources):
+    """Match saved payloads to sources: <source_id>.json or <source_id>.<anything>.json.
+
+    Returns (source, path) pairs sorted by file name, so a directory of
+    historical snapshots replays in a stable order.
+    """
+    by_id = {source["id"]: source for source in sources}
+    matched = []
+    for filename in sorted(os.listdir(payload_dir)):
+        if not filename.endswith(".json"):
+            continue
+        parts = filename[:-len(".json")].split(".")
+        source = next((by_id[".".join(parts[:n])] for n in range(len(parts), 0, -1)
+                       if ".".join(parts[:n]) in by_id), None)
+        if source is None:
+            log(f"  Skipping {filename}: no source with that id")
+            continue
+        matched.append((source, os.path.join(payload_dir, filename)))
+    return matched
+
+def replay_payloads(payload_dir, sources, parse_pool=None, on_result=None):
+    """Normalize saved payloads instead of fetching.
+
+    Returns ``(sources, results)`` with one entry per payload file, in
+    file-name order whatever order the workers finish in. Without a
+    ParsePool the payloads are parsed in this process.
+    """
+    matched = payload_files(payload_dir, sources)
+    if parse_pool is not None:
+        pending = [parse_pool.submit_file(source, path) for source, path in matched]
+    else:
+        pending = [None] * len(matched)
+    results = []
+    for index, ((source, path), future) in enumerate(zip(matched, pending)):
+        label = f"[{index + 1}/{len(matched)}]"
+        try:
+            cameras = future.result() if future else normalize_file(path, source)
+        except Exception as e:
+            log(f"{label}  Replaying {os.path.basename(path)}... FAILED ({str(e)[:50]})")
+            results.append(on_result(index, None) if on_result is not None else None)
+            continue
+        mtime = datetime.fromtimestamp(os.path.getmtime(path), timezone.utc).isoformat()
+        result = source_result(source, cameras, fetched_at=mtime)
+        log(f"{label}  Replaying {os.path.basename(path)}... OK ({len(cameras)} cameras)")
+        if on_result is not None:
+            result = on_result(index, result)
+        results.append(result)
+    return [source for source, _ in matched], results
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Fetch camera data from all verified sources.")
+    parser.add_argument("--workers", type=int, default=MAX_WORKERS,
+                        help=f"maximum concurrent fetches across all hosts (default: {MAX_WORKERS}; 1 = sequential)")
+    parser.add_argument("--per-host", type=int, default=PER_HOST_CONCURRENCY,
+                        help=f"maximum concurrent fetches against one host (default: {PER_HOST_CONCURRENCY})")
+    parser.add_argument("--delay", type=float, default=DELAY_BETWEEN_REQUESTS,
+                        help=f"seconds between requests to the same host (default: {DELAY_BETWEEN_REQUESTS})")
+    parser.add_argument("--pool-maxsize", type=int, default=http_transport.POOL_MAXSIZE,
+                        help=f"kept-alive connections per host (default: {http_transport.POOL_MAXSIZE})")
+    parser.add_argument("--retries", type=int, default=http_transport.RETRY_TOTAL,
+                        help=f"retries for connection resets and 5xx (default: {http_transport.RETRY_TOTAL})")
+    parser.add_argument("--cache-dir", default=CACHE_DIR,
+                        help=f"conditional-GET cache directory (default: {CACHE_DIR})")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="always download and re-parse every feed")
+    parser.add_argument("--no-stream", action="store_true",
+                        help="buffer each feed and parse it in one go instead of incrementally")
+    parser.add_argument("--format", choices=OUTPUT_FORMATS, default="json",
+                        help="json (indented, default), compact (streamed, no indentation) "
+                             "or ndjson (one camera per line plus a .meta.json sidecar)")
+    parser.add_argument("--output", default=OUTPUT_FILE,
+                        help=f"output path (default: {OUTPUT_FILE}, .ndjson for --format ndjson)")
+    parser.add_argument("--columnar", action="store_true",
+                        help="also export a memory-mappable .camcol file next to the output")
+    parser.add_argument("--index", action="store_true",
+                        help="also build the .camidx spatial index (implies --columnar)")
+    parser.add_argument("--offsets", action="store_true",
+                        help="also build the .camoff offset index for camera_reader.py")
+    parser.add_argument("--dedup", action="store_true",
+                        help="also write canonical cameras merged across overlapping sources")
+    parser.add_argument("--changes", action="store_true",
+                        help="diff this run against the last one and write a change file")
+    parser.add_argument("--changes-dir", default=CHANGES_DIR,
+                        help=f"change feed directory (default: {CHANGES_DIR})")
+    parser.add_argument("--coords", choices=("flag", "fix"),
+                        help="validate coordinates per source (needs numpy): flag only "
+                             "counts problems, fix also repairs them")
+    parser.add_argument("--history", nargs="?", const=HISTORY_DIR, metavar="DIR",
+                        help=f"append this run to the history store (default: {HISTORY_DIR})")
+    parser.add_argument("--parse-workers", type=int, default=0,
+                        help="parse and normalize in this many worker processes "
+                             f"(default: 0 = in the fetch threads; {PARSE_WORKERS} cores here)")
+    parser.add_argument("--payload-dir",
+                        help="normalize saved payloads (<source_id>[.*].json) instead of fetching")
+    parser.add_argument("--metrics", nargs="?", const=metrics.METRICS_FILE, metavar="FILE",
+                        help="record per-source stage timings; writes OpenMetrics to FILE "
+                             f"and a JSON report beside it (default: {metrics.METRICS_FILE})")
+    parser.add_argument("--feeds", action="append", default=[], metavar="FILE",
+                        help="JSON file of extra field mappings and sources to fetch (repeatable)")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    output_path = default_output_path(args.output, args.format)
+    if args.metrics and os.path.abspath(output_path) in (
+            os.path.abspath(args.metrics), os.path.abspath(metrics.report_path(args.metrics))):
+        sys.exit(f"--metrics {args.metrics} would overwrite the output {output_path}")
+    run_metrics = metrics.enable() if args.metrics else None
+    pool = http_transport.configure(pool_maxsize=max(args.pool_maxsize, args.per_host),
+                                    retries=args.retries,
+                                    pool_classes=metrics.TIMED_POOL_CLASSES if run_metrics else None)
+
+    sources = SOURCES + PLUGIN_SOURCES
+    for path in args.feeds:
+        sources = sources + load_feeds(path)
 
-def main():
     print("=" * 60)
     print("Traffic Camera Data Aggregator")
     print("=" * 60)
-    print(f"Processing {len(SOURCES)} verified sources...")
+    print(f"Processing {len(sources)} verified sources ({args.workers} workers)...")
     print()
 
     results = []
     failed = []
     total_cameras = 0
 
-    for i, source in enumerate(SOURCES, 1):
-        print(f"[{i}/{len(SOURCES)}]", end=" ")
-        result = process_source(source)
+    throttle = HostThrottle(delay=args.delay, per_host=args.per_host)
+    cache = None if args.no_cache else FeedCache(args.cache_dir)
+    writer = open_writer(args.format, output_path)
+    parse_pool = ParsePool(args.parse_workers) if args.parse_workers > 0 else None
+    coordinate_report = {}
+
+    def write_source(index, result):
+        if args.coords and result:
+            coordinate_report[result["source_id"]] = validate_result(result,
+                                                                     fix=args.coords == "fix")
+        return writer.write_source(index, result)
+
+    try:
+        if args.payload_dir:
+            sources, fetched = replay_payloads(args.payload_dir, sources, parse_pool,
+                                               on_result=write_source)
+        else:
+            fetched = fetch_all(sources, max_workers=args.workers, throttle=throttle,
+                                cache=cache, stream=not args.no_stream,
+                                on_result=write_source, parse_pool=parse_pool)
+    finally:
+        if parse_pool is not None:
+            parse_pool.close()
+    if cache:
+        cache.evict()
+    for source, result in zip(sources, fetched):
         if result:
             results.append(result)
             total_cameras += result["camera_count"]
         else:
             failed.append(source["name"])
-        time.sleep(DELAY_BETWEEN_REQUESTS)
 
     # Create output
-    output = {
-        "metadata": {
-            "generated_at": datetime.now(timezone.utc).isoformat(),
-            "total_cameras": total_cameras,
-            "sources_processed": len(results),
-            "sources_failed": len(failed),
-            "failed_sources": failed,
-            "sources_requiring_auth": [s["name"] for s in REQUIRES_AUTH],
-            "notes": "Some state DOTs require API keys or registration. See REQUIRES_AUTH in script for details."
-        },
-        "sources": results
+    metadata = {
+        "generated_at": datetime.now(timezone.utc).isoformat(),
+        "total_cameras": total_cameras,
+        "sources_processed": len(results),
+        "sources_failed": len(failed),
+        "failed_sources": failed,
+        "sources_requiring_auth": [s["name"] for s in REQUIRES_AUTH],
+        "notes": "Some state DOTs require API keys or registration. See REQUIRES_AUTH in script for details."
     }
+    if args.coords:
+        metadata["coordinate_issues"] = total_issues(coordinate_report)
 
-    # Write output
-    with open(OUTPUT_FILE, 'w') as f:
-        json.dump(output, f, indent=2)
+    # Write output (streaming formats have already written their cameras)
+    writer.close(metadata, [source_summary(r) for r in results])
+    if args.columnar or args.index:
+        columnar_file, _ = export_columnar(output_path)
+    if args.index:
+        index_file, _ = build_index(output_path)
+    if args.offsets:
+        offsets_file, _ = build_offsets(output_path)
+    if args.dedup:
+        dedup_file, dedup_report = dedup_output(output_path)
+    if args.changes:
+        changes = ChangeFeed(args.changes_dir).update(read_output(output_path)[1])
+    if args.history:
+        history = HistoryStore(args.history).record(read_output(output_path)[1])
 
     print()
     print("=" * 60)
     print(f"COMPLETE: {total_cameras:,} cameras from {len(results)} sources")
     print(f"FAILED: {len(failed)} sources")
     print(f"REQUIRES AUTH: {len(REQUIRES_AUTH)} sources (not fetched)")
-    print(f"Output: {OUTPUT_FILE}")
+    if args.dedup:
+        print_dedup_report(dedup_report)
+    if args.changes:
+        print_change_summary(changes)
+    if args.history:
+        print_history_summary(history)
+    if args.coords:
+        print_coordinate_report(coordinate_report, fixed=args.coords == "fix")
+    print(f"Output: {output_path}")
+    if args.columnar or args.index:
+        print(f"Columnar: {columnar_file}")
+    if args.index:
+        print(f"Spatial index: {index_file}")
+    if args.offsets:
+        print(f"Offset index: {offsets_file}")
+    if args.dedup:
+        print(f"Deduplicated: {dedup_file}")
     print("=" * 60)
 
     if failed:
@@ -325,5 +635,11 @@ def main():
         for name in failed:
             print(f"  - {name}")
 
+    http_transport.print_reuse_stats(pool)
+    if run_metrics:
+        metrics.print_summary(run_metrics)
+        metrics_file, report_file = run_metrics.write(args.metrics)
+        print(f"\nMetrics: {metrics_file} (report: {report_file})")
+
 if __name__ == "__main__":
     main()
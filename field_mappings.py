@@ -0,0 +1,428 @@
+#!/usr/bin/env python3
+"""
+Declarative field mappings for the camera feed formats.
+
+Every feed format is described by one spec instead of a hand-written
+process_* function:
+
+    "caltrans": {
+        "items": "data",                 # top-level array holding the cameras
+        "fields": {                      # output field -> how to get it
+            "camera_id": {"path": "cctv.index", "default": ""},
+            "latitude": {"path": "cctv.location.latitude", "type": "float"},
+            "stream_url": "cctv.imageData.streamingVideoURL",
+            "status": {"path": "cctv.inService", "equals": "true",
+                       "then": "online", "else": "offline"},
+            "raw_metadata": {"fields": {...}},
+            ...
+        },
+    }
+
+A field is a dotted path string (numeric segments index into lists), None
+for a constant None, or a dict with:
+
+    path      path, or list of paths where the first one present wins
+    coalesce  list of paths where the first truthy value wins
+    value     constant
+    default   used when the path is missing (default None)
+    equals    compare with this, then yield "then" / "else"
+    format    template over {value} and source context such as {base_url}
+    type      str, int or float (int/float turn empty values into None)
+    fields    nested dict of fields; with "when", {} unless that path is truthy
+
+Specs are compiled once into a Python function that walks each item with
+local variables and appends every field to its own column list, which
+becomes a CameraTable at the end; there is no per-field interpretation at
+run time and constant fields cost nothing per camera. PROCESSORS and STREAM_PROCESSORS
+are the registries both entry points use.
+
+New feeds need no Python: a JSON file (fetch_all_cameras.py --feeds) or an
+installed package exposing a "camera_aggregator.feeds" entry point can
+provide {"mappings": {name: spec}, "sources": [source, ...]}.
+"""
+
+import json
+import string
+import sys
+
+from camera_table import CAMERA_FIELDS, CameraTable, Constant, split_metadata
+
+try:
+    from importlib.metadata import entry_points
+except ImportError:
+    entry_points = None
+
+# Configuration
+PLUGIN_GROUP = "camera_aggregator.feeds"
+FIELD_TYPES = ("str", "int", "float")
+
+# Values derived from the source entry that templates can reference
+CONTEXT = {
+    "base_url": lambda source: source["url"].rsplit("/map/", 1)[0],
+}
+
+MAPPINGS = {
+    "nyc_dot": {
+        "items": None,  # The feed is the camera array itself
+        "fields": {
+            "camera_id": {"path": "id", "default": ""},
+            "name": {"path": "name", "default": ""},
+            "latitude": "latitude",
+            "longitude": "longitude",
+            "image_url": {"path": "imageUrl", "default": ""},
+            "stream_url": None,
+            "direction": None,
+            "road": None,
+            "status": {"path": "isOnline", "equals": "true", "then": "online", "else": "offline"},
+            "raw_metadata": {"fields": {"area": {"path": "area", "default": ""}}},
+        },
+    },
+    "511_system": {
+        "items": "item2",  # item1 is the map icon
+        "fields": {
+            "camera_id": {"path": "itemId", "default": "", "type": "str"},
+            "name": {"path": "title", "default": ""},
+            "latitude": "location.0",
+            "longitude": "location.1",
+            "image_url": {"path": "itemId", "default": "",
+                          "format": "{base_url}/map/Cameras/{value}"},
+            "stream_url": {"coalesce": ["expando.videoUrl", "expando.VideoUrl",
+                                        "videoUrl", "VideoUrl"]},
+            "direction": None,
+            "road": None,
+            "status": {"value": "online"},
+            "raw_metadata": {"when": "expando", "fields": {
+                "videoEnabled": {"path": "expando.videoEnabled", "default": False},
+            }},
+        },
+    },
+    "caltrans": {
+        "items": "data",
+        "fields": {
+            "camera_id": {"path": "cctv.index", "default": ""},
+            "name": {"path": "cctv.location.locationName", "default": ""},
+            "latitude": {"path": "cctv.location.latitude", "type": "float"},
+            "longitude": {"path": "cctv.location.longitude", "type": "float"},
+            "image_url": {"path": "cctv.imageData.static.currentImageURL", "default": ""},
+            "stream_url": "cctv.imageData.streamingVideoURL",
+            "direction": "cctv.location.direction",
+            "road": "cctv.location.route",
+            "status": {"path": "cctv.inService", "equals": "true",
+                       "then": "online", "else": "offline"},
+            "raw_metadata": {"fields": {
+                "district": "cctv.location.district",
+                "county": "cctv.location.county",
+                "nearbyPlace": "cctv.location.nearbyPlace",
+                "elevation": "cctv.location.elevation",
+                "postmile": "cctv.location.postmile",
+                "milepost": "cctv.location.milepost",
+            }},
+        },
+    },
+    "arcgis": {
+        "items": "features",
+        "fields": {
+            "camera_id": {"path": ["attributes.OBJECTID", "attributes.feedID"], "default": "",
+                          "type": "str"},
+            "name": {"path": ["attributes.location", "attributes.name"], "default": ""},
+            "latitude": {"path": ["attributes.lat", "geometry.y"]},
+            "longitude": {"path": ["attributes.long", "geometry.x"]},
+            "image_url": {"path": "attributes.url", "default": ""},
+            "stream_url": None,
+            "direction": None,
+            "road": None,
+            "status": {"value": "online"},
+            "raw_metadata": {"fields": {
+                "county": "attributes.county",
+                "feedID": "attributes.feedID",
+            }},
+        },
+    },
+}
+
+# Registries shared by fetch_all_cameras.py and aggregate_cameras.py
+PROCESSORS = {}  # name -> process(data, source): whole decoded feed -> cameras
+STREAM_PROCESSORS = {}  # name -> (items key, extract(items, source))
+PLUGIN_SOURCES = []  # Sources contributed by entry-point plugins
+
+_EMPTY = {}
+
+
+def _split_path(path):
+    if not isinstance(path, str) or not path:
+        raise ValueError(f"bad path {path!r}")
+    return tuple(int(part) if part.isdigit() else part for part in path.split("."))
+
+
+class _Compiler:
+    """Turns one mapping spec into the source of an extract(items, source) function."""
+
+    def __init__(self, name):
+        self.name = name
+        self.constants = {}
+        self.parents = {}  # path prefix -> (variable, container kind)
+        self.prelude = []  # per-item statements
+        self.context = {}  # template name -> local variable
+        self.temps = 0
+
+    def error(self, message):
+        return ValueError(f"mapping {self.name!r}: {message}")
+
+    def const(self, value):
+        if value is None or isinstance(value, (bool, int, float, str)):
+            return repr(value)
+        name = f"K{len(self.constants)}"
+        self.constants[name] = value
+        return name
+
+    def parent(self, prefix, kind):
+        """Local variable holding the container at ``prefix`` (item for ())."""
+        if not prefix:
+            return "item"
+        known = self.parents.get(prefix)
+        if known is not None:
+            if known[1] != kind:
+                raise self.error(f"{'.'.join(map(str, prefix))} used as both list and object")
+            return known[0]
+        outer = self.leaf(prefix, None)
+        var = f"o{len(self.parents)}"
+        self.parents[prefix] = (var, kind)
+        self.prelude.append(f"{var} = {outer} or {'_EMPTY' if kind == 'dict' else '()'}")
+        return var
+
+    def leaf(self, parts, default_expr):
+        """Expression for the value at ``parts``, or ``default_expr`` when missing."""
+        last = parts[-1]
+        if isinstance(last, int):
+            container = self.parent(parts[:-1], "list")
+            return f"({container}[{last}] if len({container}) > {last} else {default_expr or 'None'})"
+        container = self.parent(parts[:-1], "dict")
+        if default_expr is None or default_expr == "None":
+            return f"{container}.get({last!r})"
+        return f"{container}.get({last!r}, {default_expr})"
+
+    def temp(self, expr):
+        var = f"t{self.temps}"
+        self.temps += 1
+        self.prelude.append(f"{var} = {expr}")
+        return var
+
+    def template(self, template, value_expr):
+        pieces = []
+        for literal, field, spec, conversion in string.Formatter().parse(template):
+            pieces.append(literal.replace("{", "{{").replace("}", "}}"))
+            if field is None:
+                continue
+            # The spec and conversion are pasted into generated code; nested
+            # {fields} in a spec would be evaluated there
+            if spec and ("{" in spec or "}" in spec):
+                raise self.error(f"nested fields in format spec {spec!r} are not supported")
+            if conversion and conversion not in "sra":
+                raise self.error(f"unknown conversion !{conversion} in format {template!r}")
+            if field == "value":
+                var = self.temp(value_expr)
+            else:
+                var = self.context.get(field)
+                if var is None:
+                    var = self.context[field] = f"c{len(self.context)}"
+            pieces.append("{" + var + (f"!{conversion}" if conversion else "")
+                          + (f":{spec}" if spec else "") + "}")
+        return "f" + repr("".join(pieces))
+
+    def field(self, spec):
+        """Expression for one output field."""
+        if spec is None:
+            return "None"
+        if isinstance(spec, str):
+            spec = {"path": spec}
+        if not isinstance(spec, dict):
+            raise self.error(f"field spec must be a path, None or an object, not {spec!r}")
+        if "fields" in spec:
+            items = ", ".join(f"{key!r}: {self.field(sub)}" for key, sub in spec["fields"].items())
+            expr = "{" + items + "}"
+            if "when" in spec:
+                when = _split_path(spec["when"])
+                known = self.parents.get(when)  # Same truthiness, one lookup fewer
+                test = known[0] if known else self.leaf(when, None)
+                expr = f"({expr} if {test} else {{}})"
+            return expr
+        if "value" in spec:
+            return self.const(spec["value"])
+
+        default = self.const(spec.get("default"))
+        if "coalesce" in spec:
+            paths = [_split_path(p) for p in spec["coalesce"]]
+            exprs = [self.leaf(p, None) for p in paths[:-1]] + [self.leaf(paths[-1], default)]
+            expr = "(" + " or ".join(exprs) + ")"
+        elif "path" in spec:
+            paths = spec["path"] if isinstance(spec["path"], list) else [spec["path"]]
+            expr = default
+            for path in reversed(paths):  # First present path wins
+                expr = self.leaf(_split_path(path), expr)
+        else:
+            raise self.error(f"field needs path, coalesce, value or fields: {spec!r}")
+
+        if "equals" in spec:
+            expr = (f"({self.const(spec.get('then', True))} if {expr} == {self.const(spec['equals'])}"
+                    f" else {self.const(spec.get('else', False))})")
+        if "format" in spec:
+            expr = self.template(spec["format"], expr)
+        kind = spec.get("type")
+        if kind is not None:
+            if kind not in FIELD_TYPES:
+                raise self.error(f"unknown type {kind!r} (expected one of {', '.join(FIELD_TYPES)})")
+            if kind == "str":
+                expr = f"str({expr})"
+            else:
+                var = self.temp(expr)
+                expr = f"({kind}({var}) if {var} else None)"
+        return expr
+
+    @staticmethod
+    def constant(spec):
+        return spec is None or (isinstance(spec, dict) and "value" in spec)
+
+    def metadata(self, spec):
+        """(keys column, values column) for CameraTable.extend_columns.
+
+        Each is (expression, constant?) like in compile().
+        """
+        if isinstance(spec, dict) and "fields" in spec:
+            keys = self.const(tuple(spec["fields"]))
+            values = "".join(f"{self.field(sub)}, " for sub in spec["fields"].values())
+            values = f"({values})" if values else "()"
+            if "when" not in spec:
+                return (keys, True), (values, not spec["fields"])
+            when = _split_path(spec["when"])
+            known = self.parents.get(when)  # Same truthiness, one lookup fewer
+            test = known[0] if known else self.temp(self.leaf(when, None))
+            return (f"({keys} if {test} else ())", False), (f"({values} if {test} else None)", False)
+        meta = self.temp(f"_split_metadata({self.field(spec)})")  # A whole dict from the feed
+        return (f"{meta}[0]", False), (f"{meta}[1]", False)
+
+    def compile(self, fields):
+        unknown = set(fields) - set(CAMERA_FIELDS)
+        if unknown:
+            raise self.error(f"unknown output fields {sorted(unknown)} "
+                             f"(expected {', '.join(CAMERA_FIELDS)})")
+        columns = [(self.field(fields.get(key)), self.constant(fields.get(key)))
+                   for key in CAMERA_FIELDS[:-1]]
+        columns += self.metadata(fields.get("raw_metadata", {"fields": {}}))
+
+        lines = ["def extract(items, source):"]
+        for field, var in self.context.items():
+            lines.append(f"    {var} = _context({field!r}, source)")
+        appends = []
+        result = []
+        for i, (expr, constant) in enumerate(columns):
+            if constant:
+                result.append(f"_Constant({expr})")
+            else:
+                lines.append(f"    col{i} = []")
+                lines.append(f"    add{i} = col{i}.append")
+                appends.append(f"add{i}({expr})")
+                result.append(f"col{i}")
+        if not appends:
+            lines.append("    count = 0")
+            appends.append("count += 1")
+        lines.append("    for item in items:")
+        lines += [f"        {statement}" for statement in self.prelude + appends]
+        count = "count" if "count += 1" in appends else "None"
+        lines.append(f"    return CameraTable.from_columns([{', '.join(result)}], {count})")
+        return "\n".join(lines) + "\n"
+
+
+def _context(name, source):
+    derive = CONTEXT.get(name)
+    return derive(source) if derive is not None else source[name]
+
+
+def compile_mapping(name, spec):
+    """Compile a spec into (items_key, extract(items, source), process(data, source))."""
+    if not isinstance(spec, dict) or not isinstance(spec.get("fields"), dict):
+        raise ValueError(f"mapping {name!r}: needs a \"fields\" object")
+    compiler = _Compiler(name)
+    code = compiler.compile(spec["fields"])
+    namespace = {"_EMPTY": _EMPTY, "_context": _context, "CameraTable": CameraTable,
+                 "_Constant": Constant, "_split_metadata": split_metadata,
+                 **compiler.constants}
+    exec(compile(code, f"<mapping {name}>", "exec"), namespace)
+    extract = namespace["extract"]
+    extract.__name__ = f"extract_{name}"
+    extract.__doc__ = f"Normalize an iterable of {name} items (compiled mapping)."
+    extract.source_code = code
+
+    key = spec.get("items")
+
+    if key is None:
+        def process(data, source):
+            return extract(data, source)
+    else:
+        def process(data, source):
+            return extract(data.get(key, []), source)
+    process.__name__ = f"process_{name}"
+    process.__doc__ = f"Normalize a decoded {name} feed (compiled mapping)."
+    return key, extract, process
+
+
+def register_mapping(name, spec):
+    """Compile ``spec`` and make it available as processor ``name``."""
+    key, extract, process = compile_mapping(name, spec)
+    MAPPINGS[name] = spec
+    PROCESSORS[name] = process
+    STREAM_PROCESSORS[name] = (key, extract)
+
+
+def register_feeds(bundle, origin="feeds"):
+    """Register a {"mappings": ..., "sources": [...]} bundle; returns its sources."""
+    for name, spec in bundle.get("mappings", {}).items():
+        register_mapping(name, spec)
+    sources = list(bundle.get("sources", []))
+    for source in sources:
+        missing = {"id", "name", "state", "type", "url", "processor"} - source.keys()
+        if missing:
+            raise ValueError(f"{origin}: source {source.get('id')!r} is missing {sorted(missing)}")
+        if source["processor"] not in PROCESSORS:
+            raise ValueError(f"{origin}: source {source['id']!r} uses unknown processor "
+                             f"{source['processor']!r}")
+    return sources
+
+
+def load_feeds(path):
+    """Register the mappings in a JSON feeds file and return its sources."""
+    with open(path, 'r') as f:
+        return register_feeds(json.load(f), path)
+
+
+def load_plugins(group=PLUGIN_GROUP):
+    """Register feeds from installed entry-point plugins.
+
+    Each entry point resolves to a feeds bundle dict or a function
+    returning one. Broken plugins are reported and skipped.
+    """
+    if entry_points is None:
+        return
+    try:
+        found = entry_points(group=group)
+    except TypeError:  # Python < 3.10
+        found = entry_points().get(group, [])
+    for entry in found:
+        try:
+            bundle = entry.load()
+            if callable(bundle):
+                bundle = bundle()
+            PLUGIN_SOURCES.extend(register_feeds(bundle, f"plugin {entry.name}"))
+        except Exception as e:
+            print(f"Skipping feed plugin {entry.name}: {e}", file=sys.stderr)
+
+
+for _name, _spec in list(MAPPINGS.items()):
+    register_mapping(_name, _spec)
+load_plugins()
+
+
+if __name__ == "__main__":
+    # Show the generated code, e.g. python field_mappings.py caltrans
+    for _name in sys.argv[1:] or MAPPINGS:
+        print(f"# {_name}")
+        print(STREAM_PROCESSORS[_name][1].source_code)
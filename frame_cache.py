@@ -0,0 +1,374 @@
+#!/usr/bin/env python3
+"""
+Snapshot frame fetcher with a content-addressed on-disk cache.
+
+Pulls the current frame from every camera's image_url into a store keyed
+by the SHA-256 of the image bytes:
+
+    <cache_dir>/objects/ab/abcdef....   one file per distinct frame
+    <cache_dir>/index.json              url -> sha256, validators, expiry
+
+Identical frames (the "camera offline" placeholder a DOT serves for every
+dead camera, or a frame that did not change between refreshes) are stored
+once no matter how many URLs point at them. Cache-Control max-age /
+no-cache / no-store and Expires decide how long a frame is served without
+asking the server again; after that it is revalidated with If-None-Match /
+If-Modified-Since. The store is kept under FRAME_MAX_BYTES by dropping the
+least recently used frames.
+
+Consumers read frames through FrameCache.frame_path() / read_frame()
+instead of hitting the DOT servers themselves.
+
+Usage:
+    python frame_cache.py traffic_cameras_aggregated.json [--cache-dir DIR] [--workers N]
+    python frame_cache.py --get IMAGE_URL [--cache-dir DIR]
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from email.utils import parsedate_to_datetime
+
+from fetch_all_cameras import OUTPUT_FILE, HostThrottle, interleave_by_host, log
+from http_transport import HostSessionPool
+from output_writers import read_output
+
+# Configuration
+FRAME_DIR = ".frame_cache"
+FRAME_MAX_BYTES = 2 * 1024 * 1024 * 1024  # Least recently used frames go first
+FRAME_MAX_AGE = 24 * 3600  # Forget URLs not requested for a day
+FRAME_DEFAULT_TTL = 60  # Seconds a frame is fresh when the server says nothing
+FRAME_MAX_SIZE = 8 * 1024 * 1024  # Skip anything larger (not a still frame)
+FRAME_WORKERS = 32
+FRAME_PER_HOST = 4  # Concurrent downloads against one host
+FRAME_HOST_DELAY = 0.05  # Seconds between download starts on one host
+FRAME_TIMEOUT = (5, 15)  # (connect, read) seconds
+FRAME_CHUNK = 64 * 1024
+
+_MAX_AGE = re.compile(r"(?:^|,)\s*(?:s-)?max-age\s*=\s*\"?(\d+)", re.IGNORECASE)
+
+
+def _write_json_atomic(path, payload):
+    tmp = f"{path}.tmp.{os.getpid()}"
+    with open(tmp, 'w') as f:
+        json.dump(payload, f, separators=(",", ":"))
+    os.replace(tmp, path)
+
+
+def freshness(headers, now=None):
+    """Seconds a response may be reused without revalidation, or None for no-store."""
+    now = time.time() if now is None else now
+    cache_control = headers.get("Cache-Control", "").lower()
+    if "no-store" in cache_control:
+        return None
+    if "no-cache" in cache_control:
+        return 0
+    match = _MAX_AGE.search(cache_control)
+    if match:
+        return int(match.group(1))
+    expires = headers.get("Expires")
+    if expires:
+        try:
+            return max(0, parsedate_to_datetime(expires).timestamp() - now)
+        except (TypeError, ValueError):
+            return 0  # Invalid Expires means already expired
+    last_modified = headers.get("Last-Modified")
+    if last_modified:
+        # Heuristic freshness: a tenth of the time since the last change
+        try:
+            age = now - parsedate_to_datetime(last_modified).timestamp()
+            return max(0, min(age / 10, FRAME_DEFAULT_TTL))
+        except (TypeError, ValueError):
+            pass
+    return FRAME_DEFAULT_TTL
+
+
+class FrameCache:
+    """Content-addressed frame store with a url -> sha256 index."""
+
+    def __init__(self, directory=FRAME_DIR, max_bytes=FRAME_MAX_BYTES, max_age=FRAME_MAX_AGE):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.objects_dir = os.path.join(directory, "objects")
+        self.index_path = os.path.join(directory, "index.json")
+        os.makedirs(self.objects_dir, exist_ok=True)
+        self._lock = threading.Lock()
+        try:
+            with open(self.index_path, 'r') as f:
+                self.index = json.load(f)
+        except (OSError, ValueError):
+            self.index = {}
+
+    def object_path(self, digest):
+        return os.path.join(self.objects_dir, digest[:2], digest)
+
+    def lookup(self, url):
+        """Index entry for a URL, or None if its frame is not on disk."""
+        with self._lock:
+            entry = self.index.get(url)
+        if entry is None or not os.path.exists(self.object_path(entry["sha256"])):
+            return None
+        return entry
+
+    def is_fresh(self, url, now=None):
+        """True if the cached frame for ``url`` can be served without a request."""
+        entry = self.lookup(url)
+        return entry is not None and (time.time() if now is None else now) < entry.get("expires_at", 0)
+
+    def frame_path(self, url):
+        """Path of the cached frame for ``url`` (None if not cached)."""
+        entry = self.lookup(url)
+        if entry is None:
+            return None
+        with self._lock:
+            entry["accessed_at"] = time.time()
+        return self.object_path(entry["sha256"])
+
+    def read_frame(self, url):
+        """Cached frame bytes for ``url`` (None if not cached)."""
+        path = self.frame_path(url)
+        if path is None:
+            return None
+        with open(path, 'rb') as f:
+            return f.read()
+
+    def _store_body(self, response):
+        """Stream a response body into the object store. Returns (sha256, size)."""
+        digest = hashlib.sha256()
+        size = 0
+        tmp = os.path.join(self.objects_dir, f"incoming.{os.getpid()}.{threading.get_ident()}")
+        try:
+            with open(tmp, 'wb') as f:
+                for chunk in response.iter_content(FRAME_CHUNK):
+                    size += len(chunk)
+                    if size > FRAME_MAX_SIZE:
+                        raise ValueError(f"frame larger than {FRAME_MAX_SIZE} bytes")
+                    digest.update(chunk)
+                    f.write(chunk)
+            sha = digest.hexdigest()
+            path = self.object_path(sha)
+            if os.path.exists(path):
+                os.remove(tmp)  # Same bytes already stored (placeholder, unchanged frame)
+            else:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                os.replace(tmp, path)
+            return sha, size
+        except BaseException:
+            try:
+                os.remove(tmp)
+            except FileNotFoundError:
+                pass
+            raise
+
+    def fetch(self, pool, url, timeout=FRAME_TIMEOUT):
+        """Make sure the current frame for ``url`` is cached.
+
+        Returns one of "fresh" (served from cache, no request), "revalidated"
+        (304), "fetched" (new body stored), "uncacheable" (no-store) or
+        "error".
+        """
+        now = time.time()
+        entry = self.lookup(url)
+        if entry is not None and now < entry.get("expires_at", 0):
+            with self._lock:
+                entry["accessed_at"] = now
+            return "fresh"
+
+        headers = {"Accept": "image/*, */*"}
+        if entry is not None:
+            if entry.get("etag"):
+                headers["If-None-Match"] = entry["etag"]
+            if entry.get("last_modified"):
+                headers["If-Modified-Since"] = entry["last_modified"]
+        try:
+            response = pool.get(url, timeout=timeout, stream=True, headers=headers)
+        except Exception:
+            return "error"
+        try:
+            ttl = freshness(response.headers, now)
+            if response.status_code == 304 and entry is not None:
+                with self._lock:
+                    entry["expires_at"] = now + (ttl or 0)
+                    entry["validated_at"] = entry["accessed_at"] = now
+                    entry["etag"] = response.headers.get("ETag", entry.get("etag"))
+                return "revalidated"
+            if response.status_code != 200:
+                return "error"
+            if ttl is None:
+                with self._lock:
+                    self.index.pop(url, None)
+                return "uncacheable"
+            sha, size = self._store_body(response)
+        except Exception:
+            return "error"
+        finally:
+            response.close()
+
+        with self._lock:
+            self.index[url] = {
+                "sha256": sha,
+                "size": size,
+                "content_type": response.headers.get("Content-Type"),
+                "etag": response.headers.get("ETag"),
+                "last_modified": response.headers.get("Last-Modified"),
+                "fetched_at": now,
+                "validated_at": now,
+                "accessed_at": now,
+                "expires_at": now + ttl,
+            }
+        return "fetched"
+
+    def save(self):
+        with self._lock:
+            snapshot = dict(self.index)
+        _write_json_atomic(self.index_path, snapshot)
+
+    def stats(self):
+        """URL, distinct-frame and byte counts for the index."""
+        with self._lock:
+            entries = list(self.index.values())
+        refs = {}
+        sizes = {}
+        for entry in entries:
+            refs[entry["sha256"]] = refs.get(entry["sha256"], 0) + 1
+            sizes[entry["sha256"]] = entry["size"]
+        shared = {sha: n for sha, n in refs.items() if n > 1}
+        return {
+            "urls": len(entries),
+            "frames": len(refs),
+            "bytes": sum(sizes.values()),
+            "bytes_saved": sum(sizes[sha] * (n - 1) for sha, n in shared.items()),
+            "shared_frames": len(shared),
+            "largest_share": max(shared.values(), default=0),
+        }
+
+    def evict(self):
+        """Apply the age and size limits. Returns the number of frames removed.
+
+        Frames are ranked by the most recent access of any URL that points
+        at them, so a placeholder shared by live URLs is never dropped.
+        """
+        now = time.time()
+        with self._lock:
+            for url in [u for u, e in self.index.items()
+                        if now - e.get("accessed_at", 0) > self.max_age]:
+                del self.index[url]
+            last_used = {}
+            sizes = {}
+            for entry in self.index.values():
+                sha = entry["sha256"]
+                last_used[sha] = max(last_used.get(sha, 0), entry.get("accessed_at", 0))
+                sizes[sha] = entry["size"]
+
+            total = sum(sizes.values())
+            dropped = set()
+            for sha in sorted(last_used, key=last_used.get):
+                if total <= self.max_bytes:
+                    break
+                dropped.add(sha)
+                total -= sizes[sha]
+            if dropped:
+                self.index = {u: e for u, e in self.index.items() if e["sha256"] not in dropped}
+            referenced = {e["sha256"] for e in self.index.values()}
+
+        removed = 0
+        for prefix in os.listdir(self.objects_dir):
+            bucket = os.path.join(self.objects_dir, prefix)
+            if not os.path.isdir(bucket):
+                continue
+            for name in os.listdir(bucket):
+                if name not in referenced:
+                    try:
+                        os.remove(os.path.join(bucket, name))
+                        removed += 1
+                    except FileNotFoundError:
+                        pass
+        return removed
+
+
+def fetch_frames(sources, cache, workers=FRAME_WORKERS, per_host=FRAME_PER_HOST,
+                 delay=FRAME_HOST_DELAY, timeout=FRAME_TIMEOUT):
+    """Refresh the cached frame of every camera's image_url.
+
+    Each distinct URL is requested at most once per run. Returns counts
+    per fetch outcome.
+    """
+    urls = []
+    seen = set()
+    for source in sources:
+        for camera in source["cameras"]:
+            url = camera.get("image_url")
+            if url and url not in seen:
+                seen.add(url)
+                urls.append({"url": url})
+
+    pool = HostSessionPool(pool_maxsize=per_host, retries=1)
+    throttle = HostThrottle(delay=delay, per_host=per_host)
+    outcomes = {"fresh": 0, "revalidated": 0, "fetched": 0, "uncacheable": 0, "error": 0}
+
+    def run(job):
+        if cache.is_fresh(job["url"]):
+            return cache.fetch(pool, job["url"], timeout)  # No request, so no throttle slot
+        with throttle.slot(job["url"]):
+            return cache.fetch(pool, job["url"], timeout)
+
+    try:
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+            futures = [executor.submit(run, job) for _, job in interleave_by_host(urls)]
+            for done, future in enumerate(as_completed(futures), 1):
+                outcomes[future.result()] += 1
+                if done % 1000 == 0:
+                    log(f"  frames {done:,}/{len(urls):,}")
+    finally:
+        pool.close()
+    return outcomes
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fetch camera frames into a content-addressed cache.")
+    parser.add_argument("output", nargs="?", default=OUTPUT_FILE,
+                        help=f"aggregated camera list to fetch frames for (default: {OUTPUT_FILE})")
+    parser.add_argument("--cache-dir", default=FRAME_DIR,
+                        help=f"frame store directory (default: {FRAME_DIR})")
+    parser.add_argument("--max-bytes", type=int, default=FRAME_MAX_BYTES,
+                        help=f"frame store size limit (default: {FRAME_MAX_BYTES})")
+    parser.add_argument("--workers", type=int, default=FRAME_WORKERS,
+                        help=f"concurrent downloads across all hosts (default: {FRAME_WORKERS})")
+    parser.add_argument("--per-host", type=int, default=FRAME_PER_HOST,
+                        help=f"concurrent downloads per host (default: {FRAME_PER_HOST})")
+    parser.add_argument("--get", metavar="IMAGE_URL",
+                        help="print the cached frame path for one image_url and exit")
+    args = parser.parse_args()
+
+    cache = FrameCache(args.cache_dir, max_bytes=args.max_bytes)
+    if args.get:
+        # Read-only: saving here could drop entries a concurrent fetch run
+        # just wrote to index.json (and its next evict() their objects)
+        entry = cache.lookup(args.get)
+        print(cache.object_path(entry["sha256"]) if entry else "not cached")
+        return
+
+    _, sources = read_output(args.output)
+    start = time.perf_counter()
+    outcomes = fetch_frames(sources, cache, workers=args.workers, per_host=args.per_host)
+    evicted = cache.evict()
+    cache.save()
+    stats = cache.stats()
+
+    print(f"Frames in {time.perf_counter() - start:.1f}s: {outcomes['fetched']:,} downloaded, "
+          f"{outcomes['revalidated']:,} not modified, {outcomes['fresh']:,} still fresh, "
+          f"{outcomes['error']:,} failed")
+    print(f"Store: {stats['frames']:,} distinct frames for {stats['urls']:,} URLs, "
+          f"{stats['bytes'] / 1024 / 1024:.1f} MB "
+          f"({stats['bytes_saved'] / 1024 / 1024:.1f} MB saved by dedup, "
+          f"{stats['shared_frames']} shared frames, {evicted} evicted)")
+
+
+if __name__ == "__main__":
+    main()
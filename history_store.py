@@ -0,0 +1,404 @@
+#!/usr/bin/env python3
+"""
+Append-only history of the camera inventory and status.
+
+Each source has its own directory under the history dir:
+
+    <source_id>/base.json.gz        the source's cameras at base_time
+    <source_id>/deltas.ndjson.gz    one gzip member appended per run that
+                                    changed something, one operation per line:
+
+    {"t": 1760000000.0, "op": "add",    "id": "<camera key>", "record": {...}}
+    {"t": ...,          "op": "remove", "id": ...}
+    {"t": ...,          "op": "update", "id": ..., "set": {"status": "offline"}}
+
+Runs are diffed against head.json.gz (the latest state, keyed on
+(source_id, camera_id) exactly like change_feed.py), so a run that
+changes nothing writes nothing and storage grows with the rate of
+change, not the number of runs. index.json holds per-source bookkeeping.
+
+Queries read one base plus the deltas up to the time asked about, and only
+for the sources involved:
+
+    state_at(source_id, t)       the source's cameras as of t
+    uptime(key, start, end)      share of observed time a camera was online
+    added_between(start, end)    cameras that appeared in a period
+
+Compaction rewrites a source's appended members as one well-compressed
+member, and with a retention period folds older deltas into the base.
+It runs automatically every COMPACT_MEMBERS changed runs.
+
+Usage:
+    python history_store.py record traffic_cameras_aggregated.json
+    python history_store.py state SOURCE_ID [TIME]
+    python history_store.py uptime SOURCE_ID/CAMERA_ID [--since 30d]
+    python history_store.py added [--since 7d] [--source SOURCE_ID]
+    python history_store.py compact
+
+TIME is an ISO timestamp, epoch seconds or an age like 7d / 12h.
+"""
+
+import argparse
+import gzip
+import json
+import os
+import time
+from datetime import datetime, timezone
+
+from change_feed import diff
+from output_writers import read_output
+
+# Configuration
+HISTORY_DIR = "history"
+HEAD_FILE = "head.json.gz"
+INDEX_FILE = "index.json"
+COMPACT_MEMBERS = 64  # Appended runs before a source's delta log is recompressed
+RETENTION_DAYS = None  # Fold deltas older than this into the base; None keeps all
+ONLINE_STATUS = "online"
+
+
+def parse_time(value, now=None):
+    """Epoch seconds from an ISO timestamp, epoch number or age (7d, 12h, 30m)."""
+    now = time.time() if now is None else now
+    if isinstance(value, (int, float)):
+        return float(value)
+    units = {"d": 86400, "h": 3600, "m": 60}
+    if value[-1:] in units and value[:-1].replace(".", "", 1).isdigit():
+        return now - float(value[:-1]) * units[value[-1]]
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.timestamp()
+
+
+def iso(t):
+    return datetime.fromtimestamp(t, timezone.utc).isoformat()
+
+
+def _apply(records, op):
+    if op["op"] == "add":
+        records[op["id"]] = op["record"]
+    elif op["op"] == "remove":
+        records.pop(op["id"], None)
+    else:
+        records.setdefault(op["id"], {}).update(op["set"])
+
+
+def _write_gzip_json(path, payload):
+    tmp = f"{path}.tmp.{os.getpid()}"
+    with gzip.open(tmp, 'wt', compresslevel=6) as f:
+        # dumps uses the C encoder; dump() into a file object does not
+        f.write(json.dumps(payload, separators=(",", ":")))
+    os.replace(tmp, path)
+
+
+class HistoryStore:
+    """Per-source base snapshots plus compressed per-run delta logs."""
+
+    def __init__(self, directory=HISTORY_DIR, compact_members=COMPACT_MEMBERS,
+                 retention_days=RETENTION_DAYS):
+        self.directory = directory
+        self.compact_members = compact_members
+        self.retention_days = retention_days
+        os.makedirs(directory, exist_ok=True)
+
+    # ------------------------------------------------------------------ files
+
+    def _base_path(self, source_id):
+        return os.path.join(self.directory, source_id, "base.json.gz")
+
+    def _log_path(self, source_id):
+        return os.path.join(self.directory, source_id, "deltas.ndjson.gz")
+
+    def load_index(self):
+        try:
+            with open(os.path.join(self.directory, INDEX_FILE), 'r') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {"created": None, "last_run": None, "runs": 0, "sources": {}}
+
+    def _save_index(self, index):
+        path = os.path.join(self.directory, INDEX_FILE)
+        tmp = f"{path}.tmp.{os.getpid()}"
+        with open(tmp, 'w') as f:
+            json.dump(index, f, indent=2)
+        os.replace(tmp, path)
+
+    def _load_head(self):
+        try:
+            with gzip.open(os.path.join(self.directory, HEAD_FILE), 'rt') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+
+    def _read_base(self, source_id):
+        with gzip.open(self._base_path(source_id), 'rt') as f:
+            base = json.load(f)
+        return base["time"], base["records"]
+
+    def _write_base(self, source_id, base_time, records):
+        os.makedirs(os.path.join(self.directory, source_id), exist_ok=True)
+        _write_gzip_json(self._base_path(source_id), {"time": base_time, "records": records})
+
+    def iter_deltas(self, source_id, needle=None):
+        """Yield a source's operations in time order.
+
+        With ``needle``, lines not containing it are skipped before being
+        decoded. A member cut short by a crash mid-append ends the log.
+        """
+        try:
+            f = gzip.open(self._log_path(source_id), 'rt')
+        except FileNotFoundError:
+            return
+        with f:
+            try:
+                for line in f:
+                    if needle is None or needle in line:
+                        yield json.loads(line)
+            except (EOFError, gzip.BadGzipFile):
+                return
+
+    def _append(self, source_id, at, operations):
+        prefix = len(source_id) + 1
+        lines = []
+        for op in operations:
+            entry = {"t": at, "op": op["op"], "id": op["key"][prefix:]}
+            if op["op"] == "add":
+                entry["record"] = op["record"]
+            elif op["op"] == "update":
+                entry["set"] = {name: after for name, (_, after) in op["fields"].items()}
+            lines.append(json.dumps(entry, separators=(",", ":")))
+        # Each run is its own gzip member; readers see one continuous stream
+        with open(self._log_path(source_id), 'ab') as raw:
+            with gzip.GzipFile(fileobj=raw, mode='wb', compresslevel=6) as f:
+                f.write(("\n".join(lines) + "\n").encode("utf-8"))
+
+    # ---------------------------------------------------------------- writing
+
+    def record(self, sources, at=None):
+        """Store one run's aggregated sources. Returns a summary dict."""
+        at = time.time() if at is None else at
+        index = self.load_index()
+        if index["last_run"] is not None and at < index["last_run"]:
+            raise ValueError(f"run at {iso(at)} is older than the last one ({iso(index['last_run'])})")
+        operations, state = diff(self._load_head(), sources)
+
+        by_source = {}
+        for op in operations:
+            by_source.setdefault(op["source_id"], []).append(op)
+        summary = {"time": iso(at), "new_sources": 0, "changed_sources": 0,
+                   "operations": 0, "compacted": []}
+        for source_id in sorted({source["source_id"] for source in sources}):
+            info = index["sources"].get(source_id)
+            if info is None:
+                # First sighting: its cameras become the base, not a run of adds
+                prefix = len(source_id) + 1
+                self._write_base(source_id, at, {key[prefix:]: record
+                                                 for key, (sid, _, record) in state.items()
+                                                 if sid == source_id})
+                info = index["sources"][source_id] = {
+                    "created": at, "base_time": at, "members": 0, "operations": 0}
+                summary["new_sources"] += 1
+            elif by_source.get(source_id):
+                ops = by_source[source_id]
+                self._append(source_id, at, ops)
+                info["members"] += 1
+                info["operations"] += len(ops)
+                summary["changed_sources"] += 1
+                summary["operations"] += len(ops)
+            info["last_seen"] = at
+
+        _write_gzip_json(os.path.join(self.directory, HEAD_FILE), state)
+        index["created"] = index["created"] or at
+        index["last_run"] = at
+        index["runs"] += 1
+        self._save_index(index)
+
+        for source_id, info in index["sources"].items():
+            if info["members"] >= self.compact_members:
+                self.compact(source_id)
+                summary["compacted"].append(source_id)
+        return summary
+
+    def compact(self, source_id=None, before=None):
+        """Recompress delta logs, folding operations older than ``before`` into the base.
+
+        ``before`` defaults to now minus the retention period (no folding
+        when retention is None). Returns the number of operations folded.
+        """
+        if before is None and self.retention_days is not None:
+            before = time.time() - self.retention_days * 86400
+        index = self.load_index()
+        folded = 0
+        for sid in [source_id] if source_id else list(index["sources"]):
+            info = index["sources"][sid]
+            base_time, records = self._read_base(sid)
+            kept = []
+            for op in self.iter_deltas(sid):
+                if before is not None and op["t"] < before:
+                    _apply(records, op)
+                    folded += 1
+                else:
+                    kept.append(op)
+            if before is not None and before > base_time:
+                base_time = before
+                self._write_base(sid, base_time, records)
+            path = self._log_path(sid)
+            tmp = f"{path}.tmp.{os.getpid()}"
+            with gzip.open(tmp, 'wt', compresslevel=9) as f:
+                for op in kept:
+                    f.write(json.dumps(op, separators=(",", ":")) + "\n")
+            os.replace(tmp, path)
+            info.update(base_time=base_time, members=1 if kept else 0, operations=len(kept))
+        self._save_index(index)
+        return folded
+
+    # ---------------------------------------------------------------- queries
+
+    def _source_info(self, source_id):
+        info = self.load_index()["sources"].get(source_id)
+        if info is None:
+            raise KeyError(f"no history for source {source_id}")
+        return info
+
+    def state_at(self, source_id, at):
+        """{camera key: record} for a source as of ``at``."""
+        self._source_info(source_id)
+        base_time, records = self._read_base(source_id)
+        if at < base_time:
+            raise ValueError(f"{source_id} history starts at {iso(base_time)}")
+        for op in self.iter_deltas(source_id):
+            if op["t"] > at:
+                break
+            _apply(records, op)
+        return records
+
+    def uptime(self, key, start, end=None):
+        """Online share of the time a camera was present in [start, end].
+
+        ``key`` is "<source_id>/<camera_id>" as in change_feed.py. Time
+        after the source's last successful run is not counted.
+        """
+        source_id, camera_key = key.split("/", 1)
+        info = self._source_info(source_id)
+        end = min(time.time() if end is None else end, info["last_seen"])
+        base_time, records = self._read_base(source_id)
+        record = records.get(camera_key)
+        present = record is not None
+        online = present and record.get("status") == ONLINE_STATUS
+        cursor = max(start, base_time)
+        observed_seconds = online_seconds = 0.0
+        transitions = 0
+
+        needle = '"id":%s' % json.dumps(camera_key)
+        for op in self.iter_deltas(source_id, needle):
+            if op["id"] != camera_key:
+                continue
+            if op["t"] > end:
+                break
+            if op["t"] > cursor:
+                span = op["t"] - cursor
+                observed_seconds += span if present else 0.0
+                online_seconds += span if online else 0.0
+                cursor = op["t"]
+            was_online = online
+            if op["op"] == "remove":
+                present = online = False
+            else:
+                if op["op"] == "add":
+                    record = op["record"]
+                else:
+                    record = dict(record or {}, **op["set"])
+                present = True
+                online = record.get("status") == ONLINE_STATUS
+            transitions += was_online != online
+        if end > cursor:
+            observed_seconds += end - cursor if present else 0.0
+            online_seconds += end - cursor if online else 0.0
+        return {
+            "key": key,
+            "start": iso(max(start, base_time)),
+            "end": iso(end),
+            "observed_seconds": round(observed_seconds, 3),
+            "online_seconds": round(online_seconds, 3),
+            "uptime": online_seconds / observed_seconds if observed_seconds else None,
+            "transitions": transitions,
+        }
+
+    def added_between(self, start, end=None, source_id=None):
+        """Cameras added in [start, end], oldest first.
+
+        Sources that first appeared after the store was created count all
+        their initial cameras as added at that time.
+        """
+        end = time.time() if end is None else end
+        index = self.load_index()
+        source_ids = [source_id] if source_id else sorted(index["sources"])
+        added = []
+        for sid in source_ids:
+            info = index["sources"][sid]
+            if (info["created"] > index["created"] and start <= info["created"] <= end
+                    and info["base_time"] == info["created"]):
+                _, records = self._read_base(sid)
+                added += [(info["created"], f"{sid}/{key}", record)
+                          for key, record in records.items()]
+            for op in self.iter_deltas(sid, '"op":"add"'):
+                if op["t"] > end:
+                    break
+                if op["t"] >= start and op["op"] == "add":
+                    added.append((op["t"], f"{sid}/{op['id']}", op["record"]))
+        added.sort(key=lambda item: item[0])
+        return [{"time": iso(t), "key": key, "record": record} for t, key, record in added]
+
+
+def print_summary(summary):
+    print(f"HISTORY: {summary['operations']} operations from {summary['changed_sources']} "
+          f"changed sources, {summary['new_sources']} new sources"
+          + (f", compacted {len(summary['compacted'])}" if summary["compacted"] else ""))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Camera history store and time-travel queries.")
+    parser.add_argument("--dir", default=HISTORY_DIR,
+                        help=f"history directory (default: {HISTORY_DIR})")
+    commands = parser.add_subparsers(dest="command", required=True)
+    record = commands.add_parser("record", help="store an aggregated output file as one run")
+    record.add_argument("output")
+    state = commands.add_parser("state", help="a source's cameras at a point in time")
+    state.add_argument("source_id")
+    state.add_argument("time", nargs="?", default="0d")
+    uptime = commands.add_parser("uptime", help="online share of one camera")
+    uptime.add_argument("key", help="SOURCE_ID/CAMERA_ID")
+    uptime.add_argument("--since", default="30d")
+    added = commands.add_parser("added", help="cameras added in a period")
+    added.add_argument("--since", default="7d")
+    added.add_argument("--source")
+    compact = commands.add_parser("compact", help="recompress delta logs")
+    compact.add_argument("--before", help="also fold deltas older than this into the bases")
+    args = parser.parse_args()
+
+    store = HistoryStore(args.dir)
+    if args.command == "record":
+        metadata, sources = read_output(args.output)
+        at = parse_time(metadata["generated_at"]) if metadata.get("generated_at") else None
+        print_summary(store.record(sources, at))
+    elif args.command == "state":
+        records = store.state_at(args.source_id, parse_time(args.time))
+        print(json.dumps({"source_id": args.source_id, "camera_count": len(records),
+                          "cameras": records}, indent=2))
+    elif args.command == "uptime":
+        print(json.dumps(store.uptime(args.key, parse_time(args.since)), indent=2))
+    elif args.command == "added":
+        for item in store.added_between(parse_time(args.since), source_id=args.source):
+            print(f"{item['time']}  {item['key']}  {item['record'].get('name', '')}")
+    else:
+        before = parse_time(args.before) if args.before else None
+        print(f"Folded {store.compact(before=before)} operations into the bases")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+"""
+Shared HTTP transport for the camera fetchers.
+
+Keeps one pooled requests.Session per host so repeated requests (the 12
+Caltrans districts all live on cwwp2.dot.ca.gov) reuse kept-alive
+connections instead of paying a new TCP+TLS handshake each time.
+Responses are requested compressed and transient failures (connection
+resets, 5xx) are retried with exponential backoff.
+"""
+
+import threading
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util import Retry, make_headers
+
+# Configuration
+POOL_CONNECTIONS = 4  # Distinct connection pools kept per session
+POOL_MAXSIZE = 4  # Kept-alive connections per host
+RETRY_TOTAL = 3
+RETRY_BACKOFF = 0.5  # Sleeps 0.5s, 1s, 2s between attempts
+RETRY_STATUSES = (500, 502, 503, 504)
+
+# make_headers() only advertises br/zstd when a decoder is installed
+ACCEPT_ENCODING = make_headers(accept_encoding=True)["accept-encoding"]
+
+DEFAULT_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (compatible; TrafficCameraAggregator/1.0)',
+    'Accept': 'application/json, text/plain, */*',
+    'Accept-Encoding': ACCEPT_ENCODING,
+    'Connection': 'keep-alive',
+}
+
+
+def host_of(url):
+    """Return the lower-cased host[:port] a URL points at."""
+    return urlsplit(url).netloc.lower()
+
+
+class HostSessionPool:
+    """One keep-alive session per host, with retries and reuse accounting."""
+
+    def __init__(self, pool_connections=POOL_CONNECTIONS, pool_maxsize=POOL_MAXSIZE,
+                 retries=RETRY_TOTAL, backoff=RETRY_BACKOFF, headers=None, pool_classes=None):
+        self.pool_connections = pool_connections
+        self.pool_maxsize = pool_maxsize
+        self.retries = retries
+        self.backoff = backoff
+        self.headers = dict(DEFAULT_HEADERS, **(headers or {}))
+        self.pool_classes = pool_classes  # scheme -> connection pool class, e.g. timed ones
+        self._lock = threading.Lock()
+        self._sessions = {}
+        self._requests = {}
+
+    def _new_session(self):
+        retry = Retry(
+            total=self.retries,
+            connect=self.retries,
+            read=self.retries,
+            status=self.retries,
+            status_forcelist=RETRY_STATUSES,
+            allowed_methods=frozenset({"GET", "HEAD"}),
+            backoff_factor=self.backoff,
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(pool_connections=self.pool_connections,
+                              pool_maxsize=self.pool_maxsize,
+                              max_retries=retry,
+                              pool_block=False)
+        if self.pool_classes:
+            adapter.poolmanager.pool_classes_by_scheme = dict(self.pool_classes)
+        session = requests.Session()
+        session.headers.update(self.headers)
+        # Some older government sites have broken certificate chains
+        session.verify = False
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        return session
+
+    def session_for(self, url):
+        """Return the shared session for the URL's host, creating it once."""
+        host = host_of(url)
+        with self._lock:
+            session = self._sessions.get(host)
+            if session is None:
+                session = self._new_session()
+                self._sessions[host] = session
+            self._requests[host] = self._requests.get(host, 0) + 1
+        return session
+
+    def get(self, url, **kwargs):
+        return self.session_for(url).get(url, **kwargs)
+
+    def head(self, url, **kwargs):
+        return self.session_for(url).head(url, **kwargs)
+
+    def stats(self):
+        """Per-host request, connection and reuse counts.
+
+        ``attempts`` includes retries; ``reused`` is how many of those
+        attempts went over an already-open connection.
+        """
+        with self._lock:
+            sessions = dict(self._sessions)
+            requests_by_host = dict(self._requests)
+        stats = {}
+        for host, session in sessions.items():
+            attempts = 0
+            connections = 0
+            for adapter in set(session.adapters.values()):
+                pools = adapter.poolmanager.pools
+                for key in pools.keys():
+                    pool = pools.get(key)
+                    if pool is None:
+                        continue
+                    attempts += pool.num_requests
+                    connections += pool.num_connections
+            stats[host] = {
+                "requests": requests_by_host.get(host, 0),
+                "attempts": attempts,
+                "connections": connections,
+                "reused": max(0, attempts - connections),
+            }
+        return stats
+
+    def close(self):
+        with self._lock:
+            sessions = list(self._sessions.values())
+            self._sessions.clear()
+        for session in sessions:
+            session.close()
+
+
+_default_pool = None
+_default_lock = threading.Lock()
+
+
+def get_pool():
+    """Return the process-wide session pool."""
+    global _default_pool
+    with _default_lock:
+        if _default_pool is None:
+            _default_pool = HostSessionPool()
+        return _default_pool
+
+
+def configure(**kwargs):
+    """Replace the process-wide pool with one built from ``kwargs``."""
+    global _default_pool
+    with _default_lock:
+        old = _default_pool
+        _default_pool = HostSessionPool(**kwargs)
+    if old is not None:
+        old.close()
+    return _default_pool
+
+
+def print_reuse_stats(pool=None):
+    """Print a per-host connection reuse table."""
+    stats = (pool or get_pool()).stats()
+    if not stats:
+        return
+    print("\nConnection reuse by host:")
+    for host in sorted(stats):
+        s = stats[host]
+        print(f"  {host}: {s['requests']} requests, {s['connections']} connections, "
+              f"{s['reused']} reused")
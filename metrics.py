@@ -0,0 +1,516 @@
+#!/usr/bin/env python3
+"""
+Per-source, per-stage timing for process_source.
+
+Disabled by default. Once enable() has been called, every process_source
+call records where its time went:
+
+    dns        getaddrinfo for new connections
+    connect    TCP connect
+    tls        TLS handshake
+    ttfb       request sent -> response headers (excluding the above)
+    download   reading the body (for non-streamed fetches, everything
+               between the headers and the end of fetch_response)
+    parse      json decoding, or reading the cached cameras on a 304;
+               with a ParsePool it includes handing the payload to the
+               worker
+    normalize  the compiled field mapping; a streamed feed is normalized
+               while it is decoded, so this is the time spent between
+               decoded items
+
+plus wire bytes, HTTP status, camera count and the class of the error
+that failed the source. dns/connect/tls/ttfb come from the connection
+classes in TIMED_POOL_CLASSES, which http_transport mounts when asked;
+reused keep-alive connections simply record no connect time.
+
+Results go to an OpenMetrics text file (for the node_exporter textfile
+collector or any scraper) and a JSON run report beside it
+(camera_metrics.prom -> camera_metrics.report.json). Only the latest sample
+per source is kept, plus per-source fetch/failure counters, so a
+long-running scheduler does not grow without bound.
+
+When disabled, the hooks cost one global or thread-local lookup each.
+
+Usage:
+    python metrics.py camera_metrics.report.json [previous_run.report.json]
+"""
+
+import functools
+import json
+import os
+import socket
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.exceptions import ConnectTimeoutError
+
+# Configuration
+METRICS_FILE = "camera_metrics.prom"
+STAGES = ("dns", "connect", "tls", "ttfb", "download", "parse", "normalize")
+REGRESSION_RATIO = 1.5  # Flagged by the report comparison
+TOP_SLOWEST = 5
+
+_run = None
+_local = threading.local()
+_merge_lock = threading.Lock()
+
+
+class SourceRecord:
+    """Timings and outcome of one process_source call."""
+
+    __slots__ = ("source_id", "host", "started_at", "seconds", "stages", "status",
+                 "error", "bytes", "cameras", "ok")
+
+    def __init__(self, source):
+        self.source_id = source["id"]
+        self.host = source["url"].split("/")[2] if "://" in source["url"] else ""
+        self.started_at = time.time()
+        self.seconds = 0.0
+        self.stages = {}
+        self.status = None
+        self.error = None
+        self.bytes = 0
+        self.cameras = 0
+        self.ok = False
+
+    def add(self, stage, seconds):
+        self.stages[stage] = self.stages.get(stage, 0.0) + seconds
+
+    def merge(self, other):
+        """Fold in a record of the same source kept by another thread."""
+        with _merge_lock:
+            for stage, seconds in other.stages.items():
+                self.add(stage, seconds)
+            self.bytes += other.bytes
+            self.status = other.status if other.status is not None else self.status
+            self.error = self.error or other.error
+
+    def setup(self):
+        """Seconds spent opening connections so far."""
+        stages = self.stages
+        return stages.get("dns", 0.0) + stages.get("connect", 0.0) + stages.get("tls", 0.0)
+
+    def as_dict(self):
+        stages = {stage: self.stages.get(stage, 0.0) for stage in STAGES}
+        if self.status is not None:
+            # Whatever fetch_response spent past the headers was the body
+            stages["download"] += max(0.0, self.stages.get("request", 0.0) - self.setup()
+                                      - stages["ttfb"])
+        return {
+            "source_id": self.source_id,
+            "host": self.host,
+            "started_at": datetime.fromtimestamp(self.started_at, timezone.utc).isoformat(),
+            "ok": self.ok,
+            "status": self.status,
+            "error": self.error,
+            "seconds": round(self.seconds, 6),
+            "stages": {stage: round(value, 6) for stage, value in stages.items()},
+            "bytes": self.bytes,
+            "cameras": self.cameras,
+        }
+
+
+class RunMetrics:
+    """Latest record per source plus per-source fetch and failure counters."""
+
+    def __init__(self):
+        self.started_at = time.time()
+        self.latest = {}
+        self.fetches = {}
+        self.failures = {}  # (source_id, error) -> count
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def source(self, source):
+        record = SourceRecord(source)
+        _local.record = record
+        start = time.perf_counter()
+        try:
+            yield record
+        except Exception as e:
+            record.error = record.error or type(e).__name__
+            raise
+        finally:
+            record.seconds = time.perf_counter() - start
+            _local.record = None
+            self._finish(record)
+
+    def _finish(self, record):
+        with self._lock:
+            self.latest[record.source_id] = record
+            self.fetches[record.source_id] = self.fetches.get(record.source_id, 0) + 1
+            if not record.ok:
+                key = (record.source_id, record.error or "Unknown")
+                self.failures[key] = self.failures.get(key, 0) + 1
+
+    def records(self):
+        with self._lock:
+            return list(self.latest.values())
+
+    def report(self):
+        """JSON-able run report, slowest sources first."""
+        sources = sorted((r.as_dict() for r in self.records()),
+                         key=lambda r: r["seconds"], reverse=True)
+        totals = {stage: round(sum(r["stages"][stage] for r in sources), 6) for stage in STAGES}
+        return {
+            "generated_at": datetime.now(timezone.utc).isoformat(),
+            "run_seconds": round(time.time() - self.started_at, 3),
+            "sources_ok": sum(1 for r in sources if r["ok"]),
+            "sources_failed": sum(1 for r in sources if not r["ok"]),
+            "bytes": sum(r["bytes"] for r in sources),
+            "cameras": sum(r["cameras"] for r in sources),
+            "stage_seconds": totals,
+            "sources": sources,
+        }
+
+    def openmetrics(self):
+        """OpenMetrics text exposition of the latest samples."""
+        records = sorted(self.records(), key=lambda r: r.source_id)
+        with self._lock:
+            fetches = dict(self.fetches)
+            failures = dict(self.failures)
+        lines = []
+
+        def family(name, kind, help_text, samples):
+            lines.append(f"# TYPE {name} {kind}")
+            lines.append(f"# HELP {name} {help_text}")
+            suffix = "_total" if kind == "counter" else ""
+            for labels, value in samples:
+                label_text = ",".join(f'{k}="{_escape(v)}"' for k, v in labels)
+                lines.append(f"{name}{suffix}{{{label_text}}} {value}")
+
+        family("camera_source_up", "gauge", "Whether the last fetch of the source succeeded.",
+               [((("source", r.source_id),), int(r.ok)) for r in records])
+        family("camera_source_duration_seconds", "gauge", "Wall time of the last fetch.",
+               [((("source", r.source_id),), round(r.seconds, 6)) for r in records])
+        family("camera_source_stage_seconds", "gauge", "Time per stage of the last fetch.",
+               [((("source", r.source_id), ("stage", stage)), value)
+                for r in records for stage, value in r.as_dict()["stages"].items()])
+        family("camera_source_response_bytes", "gauge", "Bytes read off the wire.",
+               [((("source", r.source_id),), r.bytes) for r in records])
+        family("camera_source_cameras", "gauge", "Cameras normalized in the last fetch.",
+               [((("source", r.source_id),), r.cameras) for r in records])
+        family("camera_source_last_fetch_timestamp_seconds", "gauge",
+               "Start of the last fetch.",
+               [((("source", r.source_id),), round(r.started_at, 3)) for r in records])
+        family("camera_source_fetches", "counter", "Fetches attempted.",
+               [((("source", source_id),), count) for source_id, count in sorted(fetches.items())])
+        family("camera_source_failures", "counter", "Failed fetches by error class.",
+               [((("source", source_id), ("error", error)), count)
+                for (source_id, error), count in sorted(failures.items())])
+        lines.append("# EOF")
+        return "\n".join(lines) + "\n"
+
+    def write(self, path=METRICS_FILE):
+        """Write the OpenMetrics file and the JSON report next to it."""
+        _write_atomic(path, self.openmetrics())
+        _write_atomic(report_path(path), json.dumps(self.report(), indent=2))
+        return path, report_path(path)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _write_atomic(path, text):
+    tmp = f"{path}.tmp.{os.getpid()}"
+    with open(tmp, 'w') as f:
+        f.write(text)
+    os.replace(tmp, path)
+
+
+def report_path(path):
+    """JSON run report written alongside an OpenMetrics file (<name>.report.json)."""
+    return os.path.splitext(path)[0] + ".report.json"
+
+
+# ============================================================================
+# HOOKS (no-ops unless enabled)
+# ============================================================================
+
+def enable():
+    """Start collecting; returns the RunMetrics that process_source calls report to."""
+    global _run
+    _run = RunMetrics()
+    return _run
+
+
+def disable():
+    global _run
+    _run = None
+
+
+def current():
+    """The record of the process_source call running on this thread, if any."""
+    return getattr(_local, "record", None)
+
+
+def tracked(func):
+    """Decorate process_source(source, ...) so each call gets a SourceRecord."""
+    @functools.wraps(func)
+    def wrapper(source, *args, **kwargs):
+        run = _run
+        if run is None:
+            return func(source, *args, **kwargs)
+        with run.source(source) as record:
+            result = func(source, *args, **kwargs)
+            record.ok = bool(result)
+            if result:
+                record.cameras = result["camera_count"]
+            return result
+    return wrapper
+
+
+@contextmanager
+def branch(parent):
+    """Report a worker thread's share of ``parent``'s work (e.g. one page).
+
+    The thread gets its own record, merged into ``parent`` on exit, so the
+    connection timings (which compare setup() before and after) never mix
+    threads. A no-op when ``parent`` is None.
+    """
+    if parent is None:
+        yield
+        return
+    previous = current()
+    record = SourceRecord({"id": parent.source_id, "url": ""})
+    record.host = parent.host
+    _local.record = record
+    try:
+        yield
+    finally:
+        _local.record = previous
+        parent.merge(record)
+
+
+@contextmanager
+def timed(stage):
+    record = current()
+    if record is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record.add(stage, time.perf_counter() - start)
+
+
+def timed_chunks(chunks):
+    """Count time spent waiting on body chunks as download, not parse."""
+    return timed_iter(chunks, "download", "parse")
+
+
+def timed_iter(iterable, stage, outer):
+    """Move the time spent producing each element from ``outer`` to ``stage``.
+
+    For an iterator consumed inside timed(outer): the streamed items are
+    decoded (parse) inside the normalize loop, and body chunks downloaded
+    inside the decoder.
+    """
+    record = current()
+    if record is None:
+        return iterable
+    return _timed_iter(iter(iterable), stage, outer, record)
+
+
+def _timed_iter(iterator, stage, outer, record):
+    while True:
+        start = time.perf_counter()
+        try:
+            element = next(iterator)
+        except StopIteration:
+            return
+        finally:
+            elapsed = time.perf_counter() - start
+            record.add(stage, elapsed)
+            record.add(outer, -elapsed)
+        yield element
+
+
+def add(stage, seconds):
+    """Add time measured elsewhere (e.g. in a parse worker) to the current record."""
+    record = current()
+    if record is not None:
+        record.add(stage, seconds)
+
+
+def error(exc):
+    """Note why the current source failed (an exception or a short reason)."""
+    record = current()
+    if record is None:
+        return
+    record.error = exc if isinstance(exc, str) else type(exc).__name__
+    response = getattr(exc, "response", None)
+    if response is not None:
+        record.status = response.status_code
+
+
+def response_done(response):
+    """Note status and add wire bytes once a body has been consumed."""
+    record = current()
+    if record is None:
+        return
+    record.status = response.status_code
+    try:
+        record.bytes += response.raw.tell()
+    except Exception:
+        record.bytes += len(response.content or b"")
+
+
+# ============================================================================
+# TIMED CONNECTIONS
+# ============================================================================
+
+class _TimedConnection:
+    """Mixin splitting connection setup and TTFB into the current record."""
+
+    _tls = False
+    _sent_at = 0.0
+    _setup_at_send = 0.0
+
+    def _new_conn(self):
+        record = current()
+        if record is None:
+            return super()._new_conn()
+        start = time.perf_counter()
+        try:
+            addresses = socket.getaddrinfo(self._dns_host, self.port, type=socket.SOCK_STREAM)
+        except OSError:
+            addresses = None
+        resolved = time.perf_counter()
+        record.add("dns", resolved - start)
+        if not addresses:
+            # Let urllib3 raise its own NameResolutionError
+            return super()._new_conn()
+
+        dns_host = self._dns_host
+        try:
+            for n, address in enumerate(addresses):
+                self._dns_host = address[4][0]
+                try:
+                    return super()._new_conn()
+                except ConnectTimeoutError:
+                    if n == len(addresses) - 1:
+                        raise
+        finally:
+            self._dns_host = dns_host
+            record.add("connect", time.perf_counter() - resolved)
+
+    def connect(self):
+        record = current()
+        if record is None:
+            return super().connect()
+        start = time.perf_counter()
+        before = record.setup()
+        try:
+            return super().connect()
+        finally:
+            if self._tls:
+                elapsed = time.perf_counter() - start
+                record.add("tls", max(0.0, elapsed - (record.setup() - before)))
+
+    def request(self, *args, **kwargs):
+        record = current()
+        if record is not None:
+            self._sent_at = time.perf_counter()
+            self._setup_at_send = record.setup()
+        return super().request(*args, **kwargs)
+
+    def getresponse(self, *args, **kwargs):
+        response = super().getresponse(*args, **kwargs)
+        record = current()
+        if record is not None and self._sent_at:
+            # Plain-HTTP connections open inside request(); don't count that twice
+            setup = record.setup() - self._setup_at_send
+            record.add("ttfb", max(0.0, time.perf_counter() - self._sent_at - setup))
+            self._sent_at = 0.0
+        return response
+
+
+class TimedHTTPConnection(_TimedConnection, HTTPConnection):
+    pass
+
+
+class TimedHTTPSConnection(_TimedConnection, HTTPSConnection):
+    _tls = True
+
+
+class TimedHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = TimedHTTPConnection
+
+
+class TimedHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = TimedHTTPSConnection
+
+
+TIMED_POOL_CLASSES = {"http": TimedHTTPConnectionPool, "https": TimedHTTPSConnectionPool}
+
+
+# ============================================================================
+# REPORTS
+# ============================================================================
+
+def print_summary(run, top=TOP_SLOWEST):
+    """Print run totals and the slowest sources."""
+    report = run.report()
+    totals = report["stage_seconds"]
+    print("\nStage totals: " + ", ".join(f"{stage} {totals[stage]:.2f}s" for stage in STAGES))
+    print("Slowest sources:")
+    for r in report["sources"][:top]:
+        stages = r["stages"]
+        worst = max(STAGES, key=lambda stage: stages[stage])
+        outcome = "ok" if r["ok"] else f"FAILED {r['error']}"
+        print(f"  {r['source_id']}: {r['seconds']:.2f}s ({worst} {stages[worst]:.2f}s, "
+              f"{r['bytes']:,} bytes, {r['cameras']} cameras, {outcome})")
+
+
+def compare_reports(report, previous, ratio=REGRESSION_RATIO):
+    """Per-source (source_id, seconds, previous seconds, slowest-growing stage) rows."""
+    before = {r["source_id"]: r for r in previous["sources"]}
+    rows = []
+    for r in report["sources"]:
+        old = before.get(r["source_id"])
+        if old is None:
+            continue
+        growth = max(STAGES, key=lambda stage: r["stages"][stage] - old["stages"][stage])
+        regressed = old["seconds"] > 0 and r["seconds"] / old["seconds"] >= ratio
+        rows.append((r["source_id"], r["seconds"], old["seconds"], growth, regressed))
+    return rows
+
+
+def main():
+    if len(sys.argv) < 2:
+        print(__doc__)
+        sys.exit(1)
+    with open(sys.argv[1], 'r') as f:
+        report = json.load(f)
+    previous = None
+    if len(sys.argv) > 2:
+        with open(sys.argv[2], 'r') as f:
+            previous = json.load(f)
+
+    print(f"{'source':<22} {'seconds':>8} " + " ".join(f"{stage:>9}" for stage in STAGES)
+          + f" {'bytes':>11} {'cameras':>8}  error")
+    for r in report["sources"]:
+        print(f"{r['source_id']:<22} {r['seconds']:>8.3f} "
+              + " ".join(f"{r['stages'][stage]:>9.3f}" for stage in STAGES)
+              + f" {r['bytes']:>11,} {r['cameras']:>8}  {r['error'] or ''}")
+
+    if previous is not None:
+        regressions = 0
+        print(f"\nAgainst {sys.argv[2]}:")
+        for source_id, seconds, old, growth, regressed in compare_reports(report, previous):
+            regressions += regressed
+            flag = f"  REGRESSED ({growth})" if regressed else ""
+            print(f"  {source_id:<22} {old:>7.3f}s -> {seconds:>7.3f}s{flag}")
+        sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+"""
+Writers for the aggregated camera output.
+
+    json     the original pretty-printed {"metadata", "sources"} document,
+             buffered until the end of the run
+    compact  the same document without indentation, streamed source by
+             source in SOURCES order (a finished source waits for the
+             earlier ones) with "metadata" written last as a trailer
+    ndjson   one camera per line tagged with its source_id, appended as
+             each source completes; metadata and the per-source summaries
+             go to a .meta.json sidecar when the run finishes
+
+compact and ndjson keep only per-source summaries in memory, and ndjson
+files can be read by downstream consumers while the run is in progress.
+The json and compact documents and the ndjson sidecar are written under a
+temporary name and moved over the previous file, so readers never see them
+half written; write_output replaces an ndjson file the same way.
+"""
+
+import json
+import os
+
+from camera_table import camera_dicts, to_json
+
+OUTPUT_FORMATS = ("json", "compact", "ndjson")
+_COMPACT = (",", ":")
+
+
+def sidecar_path(path):
+    """Metadata sidecar next to an NDJSON output file."""
+    return os.path.splitext(path)[0] + ".meta.json"
+
+
+def temp_path(path):
+    """Hidden temporary name next to ``path``, keeping its extension."""
+    directory, name = os.path.split(path)
+    root, ext = os.path.splitext(name)
+    return os.path.join(directory, f".{root}.tmp{os.getpid()}{ext}")
+
+
+def default_output_path(path, fmt):
+    """Swap the .json extension for .ndjson when writing NDJSON."""
+    root, ext = os.path.splitext(path)
+    if fmt == "ndjson" and ext == ".json":
+        return root + ".ndjson"
+    return path
+
+
+def source_summary(result):
+    """A source result without its camera list."""
+    return {k: v for k, v in result.items() if k != "cameras"}
+
+
+class PrettyJsonWriter:
+    """Buffer everything and write the indented document on close."""
+
+    def __init__(self, path):
+        self.path = path
+        self._results = {}
+
+    def write_source(self, index, result):
+        """Keep the result (cameras included) for the final document."""
+        if result:
+            self._results[index] = result
+        return result
+
+    def close(self, metadata, sources):
+        output = {
+            "metadata": metadata,
+            "sources": [self._results[i] for i in sorted(self._results)]
+        }
+        tmp = temp_path(self.path)
+        with open(tmp, 'w') as f:
+            json.dump(output, f, indent=2, default=to_json)
+        os.replace(tmp, self.path)
+
+
+class CompactJsonWriter:
+    """Stream sources into a compact document; metadata is the trailer."""
+
+    def __init__(self, path):
+        self.path = path
+        self._tmp = temp_path(path)
+        self._f = open(self._tmp, 'w')
+        self._f.write('{"sources":[')
+        self._first = True
+        self._pending = {}
+        self._next = 0
+
+    def write_source(self, index, result):
+        """Write the result once every earlier index has been reported.
+
+        Failed sources are reported as None. Returns the summary.
+        """
+        self._pending[index] = result
+        while self._next in self._pending:
+            self._write(self._pending.pop(self._next))
+            self._next += 1
+        return source_summary(result) if result else result
+
+    def _write(self, result):
+        if not result:
+            return
+        if not self._first:
+            self._f.write(",")
+        self._first = False
+        self._f.write(json.dumps(result, separators=_COMPACT, default=to_json))
+        self._f.flush()
+
+    def close(self, metadata, sources):
+        for index in sorted(self._pending):
+            self._write(self._pending.pop(index))
+        self._f.write('],"metadata":')
+        self._f.write(json.dumps(metadata, separators=_COMPACT))
+        self._f.write("}\n")
+        self._f.close()
+        os.replace(self._tmp, self.path)
+
+
+class NdjsonWriter:
+    """One camera per line; metadata and source summaries in a sidecar."""
+
+    def __init__(self, path):
+        self.path = path
+        self._f = open(path, 'w')
+
+    def write_source(self, index, result):
+        """Append the result's cameras now and return its summary."""
+        if not result:
+            return result
+        source_id = result["source_id"]
+        dumps = json.dumps
+        self._f.writelines(
+            dumps({"source_id": source_id, **camera}, separators=_COMPACT) + "\n"
+            for camera in camera_dicts(result["cameras"])
+        )
+        self._f.flush()
+        return source_summary(result)
+
+    def close(self, metadata, sources):
+        self._f.close()
+        sidecar = sidecar_path(self.path)
+        tmp = temp_path(sidecar)
+        with open(tmp, 'w') as f:
+            json.dump({"metadata": metadata, "sources": sources}, f, indent=2)
+        os.replace(tmp, sidecar)
+
+
+WRITERS = {
+    "json": PrettyJsonWriter,
+    "compact": CompactJsonWriter,
+    "ndjson": NdjsonWriter,
+}
+
+
+def open_writer(fmt, path):
+    return WRITERS[fmt](path)
+
+
+def read_output(path):
+    """Load an aggregated output file written in any OUTPUT_FORMATS.
+
+    Returns ``(metadata, sources)`` with each source's ``cameras`` list
+    filled in, like the original indented document.
+    """
+    if path.endswith(".ndjson"):
+        with open(sidecar_path(path), 'r') as f:
+            sidecar = json.load(f)
+        sources = [dict(summary, cameras=[]) for summary in sidecar["sources"]]
+        by_id = {source["source_id"]: source for source in sources}
+        with open(path, 'r') as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                camera = json.loads(line)
+                source = by_id.get(camera.pop("source_id"))
+                if source is not None:
+                    source["cameras"].append(camera)
+        return sidecar["metadata"], sources
+    with open(path, 'r') as f:
+        output = json.load(f)
+    return output["metadata"], output["sources"]
+
+
+def detect_format(path):
+    """Which of OUTPUT_FORMATS an existing output file was written in."""
+    if path.endswith(".ndjson"):
+        return "ndjson"
+    with open(path, 'rb') as f:
+        head = f.read(len(b'{"sources"'))
+    return "compact" if head == b'{"sources"' else "json"
+
+
+def write_output(path, metadata, sources, fmt=None):
+    """Rewrite a whole output file, keeping its format unless ``fmt`` is given.
+
+    The file is replaced only once the new one is complete.
+    """
+    fmt = fmt or detect_format(path)
+    # json and compact replace their file on close; ndjson appends in place
+    target = temp_path(path) if fmt == "ndjson" else path
+    writer = open_writer(fmt, target)
+    for index, source in enumerate(sources):
+        writer.write_source(index, source)
+    writer.close(metadata, [source_summary(source) for source in sources])
+    if target != path:
+        os.replace(target, path)
+        os.replace(sidecar_path(target), sidecar_path(path))
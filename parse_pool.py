@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+Process pool for the CPU-bound half of process_source.
+
+Under the GIL, json parsing and normalization of every feed share one
+core no matter how many fetch threads run. With a ParsePool the fetch
+threads only do I/O: each payload is copied once into a shared memory
+segment and a worker process attaches to it by name, parses it and runs
+the compiled field mapping. Only the resulting CameraTable (a handful of
+lists and arrays) is pickled back. Payloads that are already files, such
+as mirrored or historical feeds replayed with --payload-dir, are not
+copied at all; the worker memory-maps the file itself.
+
+Worker processes get the mapping spec along with each task, so feeds
+registered at run time (--feeds, plugins) work without a fork.
+"""
+
+import mmap
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import metrics
+from feed_stream import loads, orjson
+from field_mappings import MAPPINGS, PROCESSORS, register_mapping
+
+# Configuration
+PARSE_WORKERS = os.cpu_count() or 1
+
+# orjson parses straight from the shared buffer; the stdlib parser needs bytes
+_PARSE_BUFFERS = orjson is not None
+
+
+def _processor(source, spec):
+    name = source["processor"]
+    if name not in PROCESSORS and spec is not None:
+        register_mapping(name, spec)
+    return PROCESSORS[name]
+
+
+def _normalize(source, spec, payload):
+    return _processor(source, spec)(loads(payload), source)
+
+
+def _normalize_timed(source, spec, payload):
+    """(cameras, parse seconds, normalize seconds)."""
+    processor = _processor(source, spec)
+    start = time.perf_counter()
+    data = loads(payload)
+    parsed = time.perf_counter()
+    cameras = processor(data, source)
+    return cameras, parsed - start, time.perf_counter() - parsed
+
+
+def normalize_shared(name, size, source, spec):
+    """Worker: parse and normalize a payload held in a shared memory segment.
+
+    Returns ``(cameras, parse_seconds, normalize_seconds)``.
+    """
+    segment = shared_memory.SharedMemory(name=name)
+    try:
+        view = segment.buf[:size]
+        try:
+            return _normalize_timed(source, spec, view if _PARSE_BUFFERS else bytes(view))
+        finally:
+            view.release()
+    finally:
+        segment.close()
+
+
+def normalize_file(path, source, spec=None):
+    """Parse and normalize a payload file through a read-only memory map."""
+    with open(path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            raise ValueError(f"{path} is empty")
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            view = memoryview(mapped)
+            try:
+                return _normalize(source, spec, view if _PARSE_BUFFERS else bytes(view))
+            finally:
+                view.release()
+
+
+class ParsePool:
+    """Parse + normalize payloads in worker processes."""
+
+    def __init__(self, workers=PARSE_WORKERS):
+        self.workers = max(1, workers)
+        self._executor = ProcessPoolExecutor(max_workers=self.workers)
+
+    def normalize(self, source, payload):
+        """Normalize raw payload bytes; blocks the calling (I/O) thread until done.
+
+        The worker's parse and normalize times go to the caller's metrics
+        record; copying and handing the payload over count as parse.
+        """
+        start = time.perf_counter()
+        segment = shared_memory.SharedMemory(create=True, size=max(1, len(payload)))
+        try:
+            segment.buf[:len(payload)] = payload
+            future = self._executor.submit(normalize_shared, segment.name, len(payload),
+                                           source, MAPPINGS.get(source["processor"]))
+            cameras, _, normalize_seconds = future.result()
+        finally:
+            segment.close()
+            segment.unlink()
+        metrics.add("normalize", normalize_seconds)
+        metrics.add("parse", time.perf_counter() - start - normalize_seconds)
+        return cameras
+
+    def submit_file(self, source, path):
+        """Queue a payload file; returns a Future of the CameraTable."""
+        return self._executor.submit(normalize_file, path, source,
+                                     MAPPINGS.get(source["processor"]))
+
+    def close(self):
+        self._executor.shutdown()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
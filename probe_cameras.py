@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+"""
+Live camera health prober.
+
+The status field copied from the feeds is unreliable (the 511 and ArcGIS
+processors hard-code "online"), so this sweeps every camera's image_url
+and stream_url over pooled keep-alive connections. Each URL gets a HEAD
+request, falling back to a one-byte range GET when the server does not
+answer HEAD. Concurrency is bounded globally (PROBE_WORKERS) and per host
+(PROBE_PER_HOST, spaced PROBE_HOST_DELAY apart), with short timeouts.
+
+For every URL the latency, HTTP status, content-length and last-modified
+are recorded in <output>.health.json. Each camera's status becomes
+"online" when its image (or, lacking one, its stream) answered 2xx, and
+last_seen is the time of its most recent successful probe. The aggregated
+output is rewritten in place with the new status and last_seen.
+
+Usage:
+    python probe_cameras.py traffic_cameras_aggregated.json [--workers N]
+"""
+
+import argparse
+import json
+import os
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timezone
+
+from fetch_all_cameras import OUTPUT_FILE, HostThrottle, interleave_by_host, log
+from http_transport import HostSessionPool
+from output_writers import read_output, write_output
+
+# Configuration
+PROBE_WORKERS = 64
+PROBE_PER_HOST = 4  # Concurrent probes against one host
+PROBE_HOST_DELAY = 0.05  # Seconds between probe starts on one host
+PROBE_TIMEOUT = (3, 5)  # (connect, read) seconds
+HEAD_UNSUPPORTED = {400, 403, 405, 501}  # Retry these with a range GET
+
+_CONTENT_RANGE_TOTAL = re.compile(r"/(\d+)\s*$")
+
+
+def health_path(output_path):
+    """Probe results sidecar next to an aggregated output file."""
+    return os.path.splitext(output_path)[0] + ".health.json"
+
+
+def _now_iso():
+    return datetime.now(timezone.utc).isoformat()
+
+
+def probe_url(pool, url, timeout=PROBE_TIMEOUT):
+    """HEAD (or 1-byte range GET) a URL and report what came back."""
+    start = time.perf_counter()
+    result = {"url": url, "method": "HEAD"}
+    try:
+        response = pool.head(url, timeout=timeout, allow_redirects=True)
+        if response.status_code in HEAD_UNSUPPORTED:
+            result["method"] = "GET"
+            response = pool.get(url, timeout=timeout, stream=True,
+                                headers={"Range": "bytes=0-0"})
+            response.close()
+        headers = response.headers
+        length = headers.get("Content-Length")
+        match = _CONTENT_RANGE_TOTAL.search(headers.get("Content-Range", ""))
+        if response.status_code == 206 and match:
+            length = match.group(1)
+        result.update({
+            "http_status": response.status_code,
+            "ok": 200 <= response.status_code < 300,
+            "content_length": int(length) if length and length.isdigit() else None,
+            "content_type": headers.get("Content-Type"),
+            "last_modified": headers.get("Last-Modified"),
+        })
+    except Exception as e:
+        result.update({"http_status": None, "ok": False, "error": type(e).__name__})
+    result["latency_ms"] = round((time.perf_counter() - start) * 1000, 1)
+    return result
+
+
+def _camera_key(source_id, camera):
+    return f"{source_id}/{camera.get('camera_id')}"
+
+
+def probe_sources(sources, previous=None, workers=PROBE_WORKERS, per_host=PROBE_PER_HOST,
+                  delay=PROBE_HOST_DELAY, timeout=PROBE_TIMEOUT):
+    """Probe every camera URL and update status / last_seen in place.
+
+    ``previous`` is the last health report's "cameras" mapping, used to
+    carry last_seen forward for cameras that are down now. Returns the
+    new per-camera health mapping.
+    """
+    previous = previous or {}
+    jobs = []
+    for source in sources:
+        for camera in source["cameras"]:
+            for field in ("image_url", "stream_url"):
+                url = camera.get(field)
+                if url:
+                    jobs.append({"url": url, "field": field,
+                                 "key": _camera_key(source["source_id"], camera)})
+
+    pool = HostSessionPool(pool_maxsize=per_host, retries=0)
+    throttle = HostThrottle(delay=delay, per_host=per_host)
+    results = {}
+    total = len(jobs)
+    done = 0
+
+    def run(job):
+        with throttle.slot(job["url"]):
+            return probe_url(pool, job["url"], timeout)
+
+    try:
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+            futures = {executor.submit(run, job): job for _, job in interleave_by_host(jobs)}
+            for future in as_completed(futures):
+                job = futures[future]
+                results.setdefault(job["key"], {})[job["field"]] = future.result()
+                done += 1
+                if done % 1000 == 0:
+                    log(f"  probed {done:,}/{total:,} URLs")
+    finally:
+        pool.close()
+
+    now = _now_iso()
+    health = {}
+    for source in sources:
+        for camera in source["cameras"]:
+            key = _camera_key(source["source_id"], camera)
+            probes = results.get(key, {})
+            primary = probes.get("image_url") or probes.get("stream_url")
+            if primary is None:
+                continue  # No URL to check; leave the feed's status alone
+            online = primary["ok"]
+            last_seen = now if online else previous.get(key, {}).get("last_seen")
+            camera["status"] = "online" if online else "offline"
+            camera["last_seen"] = last_seen
+            health[key] = {"status": camera["status"], "last_seen": last_seen,
+                           "checked_at": now, **probes}
+    return health
+
+
+def probe_output(output_path, workers=PROBE_WORKERS, per_host=PROBE_PER_HOST):
+    """Probe all cameras in an aggregated output and rewrite it."""
+    metadata, sources = read_output(output_path)
+    path = health_path(output_path)
+    try:
+        with open(path, 'r') as f:
+            previous = json.load(f)["cameras"]
+    except (OSError, ValueError, KeyError):
+        previous = {}
+
+    start = time.perf_counter()
+    health = probe_sources(sources, previous, workers=workers, per_host=per_host)
+    elapsed = time.perf_counter() - start
+
+    online = sum(1 for h in health.values() if h["status"] == "online")
+    summary = {"probed_at": _now_iso(), "seconds": round(elapsed, 1),
+               "cameras": len(health), "online": online, "offline": len(health) - online}
+    metadata["health"] = summary
+    write_output(output_path, metadata, sources)
+    with open(path, 'w') as f:
+        json.dump({"summary": summary, "cameras": health}, f, separators=(",", ":"))
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Probe camera image/stream URLs for liveness.")
+    parser.add_argument("output", nargs="?", default=OUTPUT_FILE,
+                        help=f"aggregated output to probe and update (default: {OUTPUT_FILE})")
+    parser.add_argument("--workers", type=int, default=PROBE_WORKERS,
+                        help=f"concurrent probes across all hosts (default: {PROBE_WORKERS})")
+    parser.add_argument("--per-host", type=int, default=PROBE_PER_HOST,
+                        help=f"concurrent probes per host (default: {PROBE_PER_HOST})")
+    args = parser.parse_args()
+
+    summary = probe_output(args.output, workers=args.workers, per_host=args.per_host)
+    print(f"Probed {summary['cameras']:,} cameras in {summary['seconds']}s: "
+          f"{summary['online']:,} online, {summary['offline']:,} offline")
+    print(f"Health: {health_path(args.output)}")
+
+
+if __name__ == "__main__":
+    main()
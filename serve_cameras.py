@@ -0,0 +1,373 @@
+#!/usr/bin/env python3
+"""
+Local HTTP API over the aggregated camera output.
+
+Map front-ends fetch only their viewport at their zoom instead of the
+whole aggregate. Every time a fetch run rewrites the output, the server
+rebuilds a Catalog in the background and swaps it in:
+
+    GET /metadata                  run metadata
+    GET /sources                   per-source summaries (no cameras)
+    GET /sources/<source_id>       one source entry with its cameras
+    GET /tiles/<z>/<x>/<y>.json    slippy-map tile (z 0-MAX_ZOOM):
+                                     z <= CLUSTER_MAX_ZOOM  clusters on a
+                                       CLUSTER_GRID x CLUSTER_GRID grid
+                                       (count, mean position, the camera
+                                       itself for a cluster of one)
+                                     deeper                 the cameras
+    GET /bbox?min_lat=&min_lon=&max_lat=&max_lon=[&state=&status=&road=&limit=]
+                                   cameras in a box, via the .camidx
+                                   spatial index (camera_index.py)
+
+Metadata, sources, cluster tiles and the DETAIL_ZOOM camera tiles are
+serialized and gzip-compressed once per run; deeper tiles (cut from their
+DETAIL_ZOOM parent) and bbox answers are built on first request and kept
+in a per-run LRU cache. Every response carries a strong ETag, answers
+If-None-Match with 304, and is sent gzip-encoded to clients that accept
+it.
+
+Usage:
+    python serve_cameras.py [traffic_cameras_aggregated.json] [--host HOST]
+        [--port 8080] [--reload SECONDS]
+"""
+
+import argparse
+import gzip
+import hashlib
+import json
+import math
+import os
+import threading
+import time
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlsplit
+
+from camera_index import CameraIndex, build_index
+from camera_table import camera_dicts, to_json
+from fetch_all_cameras import OUTPUT_FILE
+from output_writers import read_output, sidecar_path, source_summary
+
+# Configuration
+HOST = "127.0.0.1"
+PORT = 8080
+CLUSTER_MAX_ZOOM = 11  # Deepest zoom served as clusters
+CLUSTER_BITS = 3  # Clusters on a 2**3 = 8 x 8 grid per tile
+DETAIL_ZOOM = CLUSTER_MAX_ZOOM + 1  # Camera tiles precomputed at this zoom
+MAX_ZOOM = 18
+BBOX_LIMIT = 5000  # Default and maximum cameras per bbox response
+COMPRESS_LEVEL = 6
+CACHE_MAX_AGE = 60  # Seconds clients may reuse a response before revalidating
+DYNAMIC_CACHE_SIZE = 4096  # Deep tiles and bbox answers kept per run
+RELOAD_INTERVAL = 30  # Seconds between output modification checks
+TILE_FIELDS = ("camera_id", "name", "latitude", "longitude", "image_url", "stream_url",
+               "status")
+
+CLUSTER_GRID = 1 << CLUSTER_BITS
+MAX_LATITUDE = 85.0511287798  # Web Mercator limit
+_COMPACT = (",", ":")
+
+
+def log(msg):
+    print(f"[{time.strftime('%H:%M:%S')}] {msg}", flush=True)
+
+
+def world_xy(lat, lon):
+    """Web Mercator position as fractions of the world (0 <= x, y < 1)."""
+    lat = max(-MAX_LATITUDE, min(MAX_LATITUDE, lat))
+    x = (lon + 180.0) / 360.0
+    y = (1.0 - math.asinh(math.tan(math.radians(lat))) / math.pi) / 2.0
+    return min(x, math.nextafter(1.0, 0.0)), min(max(y, 0.0), math.nextafter(1.0, 0.0))
+
+
+def _coordinate(value, limit):
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        return None
+    return value if -limit <= value <= limit else None
+
+
+class Payload:
+    """One serialized response: gzip body, ETag and uncompressed size."""
+
+    __slots__ = ("gzip", "etag", "size")
+
+    def __init__(self, obj):
+        body = json.dumps(obj, separators=_COMPACT, default=to_json).encode("utf-8")
+        self.etag = '"%s"' % hashlib.blake2b(body, digest_size=12).hexdigest()
+        self.gzip = gzip.compress(body, COMPRESS_LEVEL, mtime=0)
+        self.size = len(body)
+
+    def body(self):
+        return gzip.decompress(self.gzip)
+
+
+class Catalog:
+    """Precomputed payloads for one version of the aggregated output."""
+
+    def __init__(self, output_path):
+        self.path = output_path
+        self.stamp = output_stamp(output_path)
+        start = time.perf_counter()
+        metadata, sources = read_output(output_path)
+
+        self.payloads = {"/metadata": Payload(metadata),
+                         "/sources": Payload([source_summary(s) for s in sources])}
+        points = []
+        for source in sources:
+            cameras = list(camera_dicts(source["cameras"]))
+            self.payloads[f"/sources/{source['source_id']}"] = Payload(
+                dict(source, cameras=cameras))
+            for camera in cameras:
+                lat = _coordinate(camera.get("latitude"), MAX_LATITUDE)
+                lon = _coordinate(camera.get("longitude"), 180.0)
+                if lat is None or lon is None:
+                    continue
+                record = {"source_id": source["source_id"]}
+                record.update((field, camera.get(field)) for field in TILE_FIELDS)
+                x, y = world_xy(lat, lon)
+                points.append((x, y, lat, lon, record))
+        self.cameras = len(points)
+        self._add_cluster_tiles(points)
+        self._add_detail_tiles(points)
+
+        index_file, _ = build_index(output_path)
+        self.index = CameraIndex(index_file)
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self.build_seconds = time.perf_counter() - start
+
+    def _add_cluster_tiles(self, points):
+        # Cells of the deepest cluster grid, merged up one zoom at a time
+        bits = CLUSTER_MAX_ZOOM + CLUSTER_BITS
+        scale = 1 << bits
+        cells = {}
+        for x, y, lat, lon, record in points:
+            key = (int(x * scale), int(y * scale))
+            cell = cells.get(key)
+            if cell is None:
+                cells[key] = [lat, lon, 1, record]
+            else:
+                cell[0] += lat
+                cell[1] += lon
+                cell[2] += 1
+        for zoom in range(CLUSTER_MAX_ZOOM, -1, -1):
+            tiles = {}
+            for (cx, cy), (sum_lat, sum_lon, count, record) in cells.items():
+                cluster = {"lat": round(sum_lat / count, 6), "lon": round(sum_lon / count, 6),
+                           "count": count}
+                if count == 1:
+                    cluster["camera"] = record
+                tiles.setdefault((cx >> CLUSTER_BITS, cy >> CLUSTER_BITS), []).append(cluster)
+            for (tx, ty), clusters in tiles.items():
+                self.payloads[f"/tiles/{zoom}/{tx}/{ty}"] = Payload(
+                    {"zoom": zoom, "x": tx, "y": ty,
+                     "count": sum(cluster["count"] for cluster in clusters),
+                     "clusters": clusters})
+            merged = {}
+            for (cx, cy), (sum_lat, sum_lon, count, record) in cells.items():
+                key = (cx >> 1, cy >> 1)
+                cell = merged.get(key)
+                if cell is None:
+                    merged[key] = [sum_lat, sum_lon, count, record]
+                else:
+                    cell[0] += sum_lat
+                    cell[1] += sum_lon
+                    cell[2] += count
+            cells = merged
+
+    def _add_detail_tiles(self, points):
+        scale = 1 << DETAIL_ZOOM
+        self.detail = {}
+        for x, y, _, _, record in points:
+            self.detail.setdefault((int(x * scale), int(y * scale)), []).append((x, y, record))
+        for (tx, ty), members in self.detail.items():
+            self.payloads[f"/tiles/{DETAIL_ZOOM}/{tx}/{ty}"] = Payload(
+                {"zoom": DETAIL_ZOOM, "x": tx, "y": ty, "count": len(members),
+                 "cameras": [record for _, _, record in members]})
+
+    def cached(self, key, build):
+        """Per-run LRU for payloads built on request."""
+        with self._lock:
+            payload = self._cache.get(key)
+            if payload is not None:
+                self._cache.move_to_end(key)
+                return payload
+        payload = build()
+        with self._lock:
+            self._cache[key] = payload
+            if len(self._cache) > DYNAMIC_CACHE_SIZE:
+                self._cache.popitem(last=False)
+        return payload
+
+    def deep_tile(self, zoom, tx, ty):
+        """Camera tile below DETAIL_ZOOM, cut from its precomputed parent."""
+        shift = zoom - DETAIL_ZOOM
+        members = self.detail.get((tx >> shift, ty >> shift), ())
+        scale = 1 << zoom
+        cameras = [record for x, y, record in members
+                   if int(x * scale) == tx and int(y * scale) == ty]
+        return Payload({"zoom": zoom, "x": tx, "y": ty, "count": len(cameras),
+                        "cameras": cameras})
+
+    def bbox(self, params):
+        """Payload for a /bbox query string (ValueError on bad parameters)."""
+        try:
+            box = [float(params[name][0]) for name in ("min_lat", "min_lon", "max_lat", "max_lon")]
+            limit = max(0, min(int(params.get("limit", [BBOX_LIMIT])[0]), BBOX_LIMIT))
+        except KeyError as e:
+            raise ValueError(f"missing parameter {e.args[0]}")
+        filters = {name: params[name] for name in ("state", "status", "road") if name in params}
+        rows = self.index.bbox(*box, **filters)
+        cameras = [self.index.camera(row) for row in sorted(rows)[:limit]]
+        return Payload({"bbox": box, "count": len(rows), "truncated": len(rows) > limit,
+                        "cameras": cameras})
+
+
+def output_stamp(output_path):
+    """What changes when a run rewrites the output (mtimes, plus the NDJSON sidecar)."""
+    paths = [output_path]
+    if output_path.endswith(".ndjson"):
+        paths.append(sidecar_path(output_path))
+    return tuple(os.stat(path).st_mtime_ns if os.path.exists(path) else None for path in paths)
+
+
+class CameraServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, output_path):
+        super().__init__(address, _Handler)
+        self.output_path = output_path
+        self.catalog = Catalog(output_path)
+        self._stop = threading.Event()
+
+    def watch(self, interval=RELOAD_INTERVAL):
+        """Rebuild the catalog whenever the output changes (run on a thread)."""
+        while not self._stop.wait(interval):
+            try:
+                if output_stamp(self.output_path) == self.catalog.stamp:
+                    continue
+                catalog = Catalog(self.output_path)
+            except Exception as e:
+                # Usually a run still writing the output; try again next time
+                log(f"Reload failed: {e}")
+                continue
+            # Requests in flight keep the old catalog until they finish
+            self.catalog = catalog
+            log(f"Reloaded: {catalog.cameras:,} cameras, {len(catalog.payloads):,} payloads "
+                f"in {catalog.build_seconds:.1f}s")
+
+    def shutdown(self):
+        self._stop.set()
+        super().shutdown()
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        self._respond(head=False)
+
+    def do_HEAD(self):
+        self._respond(head=True)
+
+    def _resolve(self, catalog, path, query):
+        """Payload for a request, or (status, message) for an error."""
+        payload = catalog.payloads.get(path)
+        if payload is not None:
+            return payload
+        if path.startswith("/tiles/"):
+            try:
+                zoom, tx, ty = (int(part) for part in path[len("/tiles/"):].split("/"))
+            except ValueError:
+                return 404, "tile paths are /tiles/<z>/<x>/<y>.json"
+            if not (0 <= zoom <= MAX_ZOOM and 0 <= tx < 1 << zoom and 0 <= ty < 1 << zoom):
+                return 404, "tile out of range"
+            if zoom <= DETAIL_ZOOM:
+                # Precomputed tiles cover every tile with cameras
+                return catalog.cached(("tile", zoom, tx, ty), lambda: Payload(
+                    {"zoom": zoom, "x": tx, "y": ty, "count": 0,
+                     "clusters" if zoom <= CLUSTER_MAX_ZOOM else "cameras": []}))
+            return catalog.cached(("tile", zoom, tx, ty),
+                                  lambda: catalog.deep_tile(zoom, tx, ty))
+        if path == "/bbox":
+            params = parse_qs(query)
+            key = ("bbox",) + tuple(sorted((k, tuple(v)) for k, v in params.items()))
+            try:
+                return catalog.cached(key, lambda: catalog.bbox(params))
+            except ValueError as e:
+                return 400, str(e)
+        return 404, "not found"
+
+    def _respond(self, head):
+        url = urlsplit(self.path)
+        path = unquote(url.path).rstrip("/") or "/"
+        if path.endswith(".json"):
+            path = path[:-len(".json")]
+        try:
+            payload = self._resolve(self.server.catalog, path, url.query)
+        except Exception as e:
+            log(f"{self.path}: {e}")
+            payload = (500, "internal error")
+        if isinstance(payload, tuple):
+            status, message = payload
+            body = json.dumps({"error": message}).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            if not head:
+                self.wfile.write(body)
+            return
+
+        self.send_response(200 if self.headers.get("If-None-Match") != payload.etag else 304)
+        self.send_header("ETag", payload.etag)
+        self.send_header("Cache-Control", f"public, max-age={CACHE_MAX_AGE}")
+        self.send_header("Vary", "Accept-Encoding")
+        if self.headers.get("If-None-Match") == payload.etag:
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        if "gzip" in self.headers.get("Accept-Encoding", ""):
+            body = payload.gzip
+            self.send_header("Content-Encoding", "gzip")
+        else:
+            body = payload.body()
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if not head:
+            self.wfile.write(body)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve the aggregated cameras over HTTP.")
+    parser.add_argument("output", nargs="?", default=OUTPUT_FILE,
+                        help=f"aggregated output file, any format (default: {OUTPUT_FILE})")
+    parser.add_argument("--host", default=HOST)
+    parser.add_argument("--port", type=int, default=PORT)
+    parser.add_argument("--reload", type=float, default=RELOAD_INTERVAL, metavar="SECONDS",
+                        help="how often to check the output for a new run (0 disables)")
+    args = parser.parse_args()
+
+    server = CameraServer((args.host, args.port), args.output)
+    catalog = server.catalog
+    log(f"Loaded {catalog.cameras:,} cameras, {len(catalog.payloads):,} payloads "
+        f"in {catalog.build_seconds:.1f}s")
+    if args.reload > 0:
+        threading.Thread(target=server.watch, args=(args.reload,), daemon=True).start()
+    log(f"Serving {args.output} on http://{args.host}:{args.port}/")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
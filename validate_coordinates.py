@@ -0,0 +1,273 @@
+#!/usr/bin/env python3
+"""
+Vectorized coordinate validation for the aggregated cameras.
+
+The feed formats hand coordinates over as they come: 511 sites trust the
+order of location[0]/[1], ArcGIS layers may fall back to geometry.x/y in
+Web Mercator metres, and placeholder zeros pass through as real points.
+This pass gathers every camera's latitude/longitude into two NumPy arrays
+(zero-copy for CameraTable sources) and classifies all of them at once:
+
+    missing        no usable latitude or longitude
+    reprojected    Web Mercator metres, converted to degrees
+    swapped        latitude and longitude exchanged
+    sign_flipped   longitude missing its minus sign
+    null_island    (0, 0)
+    out_of_bounds  outside the source's state bounding box (or the globe)
+
+Bounds come from each source's "state" (multi-state sources such as
+"ME/VT/NH" use the union of their boxes). In flag mode the cameras are
+left untouched and only counted; with fix the reprojected, swapped and
+sign-flipped points are corrected, null-island points become None and
+numeric strings become floats. Out-of-bounds points are only reported,
+since there is nothing to fix them from.
+
+Usage:
+    python validate_coordinates.py traffic_cameras_aggregated.json [--fix]
+"""
+
+import argparse
+import math
+import sys
+import time
+
+from output_writers import read_output, write_output
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# Configuration
+BOUNDS_PAD = 0.25  # Degrees added around each state box
+SAMPLES = 5  # Camera ids kept per issue and source in the report
+STATE_BOUNDS = {  # (min_lat, max_lat, min_lon, max_lon)
+    "AL": (30.1, 35.1, -88.5, -84.9), "AK": (51.2, 71.5, -180.0, -129.9),
+    "AZ": (31.3, 37.0, -114.9, -109.0), "AR": (33.0, 36.5, -94.7, -89.6),
+    "CA": (32.5, 42.0, -124.5, -114.1), "CO": (37.0, 41.0, -109.1, -102.0),
+    "CT": (40.9, 42.1, -73.8, -71.8), "DE": (38.4, 39.9, -75.8, -75.0),
+    "DC": (38.8, 39.0, -77.2, -76.9), "FL": (24.4, 31.0, -87.7, -80.0),
+    "GA": (30.3, 35.0, -85.7, -80.8), "HI": (18.9, 22.3, -160.3, -154.8),
+    "ID": (42.0, 49.0, -117.3, -111.0), "IL": (36.9, 42.5, -91.6, -87.0),
+    "IN": (37.7, 41.8, -88.1, -84.8), "IA": (40.4, 43.5, -96.7, -90.1),
+    "KS": (36.9, 40.0, -102.1, -94.6), "KY": (36.5, 39.2, -89.6, -81.9),
+    "LA": (28.9, 33.0, -94.1, -88.8), "ME": (43.0, 47.5, -71.1, -66.9),
+    "MD": (37.9, 39.8, -79.5, -75.0), "MA": (41.2, 42.9, -73.5, -69.9),
+    "MI": (41.7, 48.3, -90.4, -82.4), "MN": (43.5, 49.4, -97.3, -89.5),
+    "MS": (30.1, 35.0, -91.7, -88.1), "MO": (36.0, 40.6, -95.8, -89.1),
+    "MT": (44.4, 49.0, -116.1, -104.0), "NE": (40.0, 43.0, -104.1, -95.3),
+    "NV": (35.0, 42.0, -120.0, -114.0), "NH": (42.7, 45.3, -72.6, -70.6),
+    "NJ": (38.9, 41.4, -75.6, -73.9), "NM": (31.3, 37.0, -109.1, -103.0),
+    "NY": (40.5, 45.0, -79.8, -71.8), "NC": (33.8, 36.6, -84.3, -75.4),
+    "ND": (45.9, 49.0, -104.1, -96.6), "OH": (38.4, 42.0, -84.8, -80.5),
+    "OK": (33.6, 37.0, -103.0, -94.4), "OR": (42.0, 46.3, -124.6, -116.5),
+    "PA": (39.7, 42.3, -80.5, -74.7), "RI": (41.1, 42.0, -71.9, -71.1),
+    "SC": (32.0, 35.2, -83.4, -78.5), "SD": (42.5, 45.9, -104.1, -96.4),
+    "TN": (35.0, 36.7, -90.3, -81.6), "TX": (25.8, 36.5, -106.6, -93.5),
+    "UT": (37.0, 42.0, -114.1, -109.0), "VT": (42.7, 45.0, -73.4, -71.5),
+    "VA": (36.5, 39.5, -83.7, -75.2), "WA": (45.5, 49.0, -124.8, -116.9),
+    "WV": (37.2, 40.6, -82.6, -77.7), "WI": (42.5, 47.1, -92.9, -86.8),
+    "WY": (41.0, 45.0, -111.1, -104.0),
+}
+
+ISSUES = ("ok", "missing", "reprojected", "swapped", "sign_flipped", "null_island",
+          "out_of_bounds")
+OK, MISSING, REPROJECTED, SWAPPED, SIGN_FLIPPED, NULL_ISLAND, OUT_OF_BOUNDS = range(len(ISSUES))
+_FIXED = (REPROJECTED, SWAPPED, SIGN_FLIPPED, NULL_ISLAND)
+
+EARTH_RADIUS_M = 6378137.0  # Web Mercator sphere
+MERCATOR_MAX = math.pi * EARTH_RADIUS_M
+_NO_BOUNDS = (math.nan,) * 4
+
+
+def state_bounds(state):
+    """Padded (min_lat, max_lat, min_lon, max_lon) for a state code like "NY" or "ME/VT/NH"."""
+    boxes = [STATE_BOUNDS[code.strip()] for code in (state or "").split("/")
+             if code.strip() in STATE_BOUNDS]
+    if not boxes:
+        return _NO_BOUNDS
+    return (min(b[0] for b in boxes) - BOUNDS_PAD, max(b[1] for b in boxes) + BOUNDS_PAD,
+            min(b[2] for b in boxes) - BOUNDS_PAD, max(b[3] for b in boxes) + BOUNDS_PAD)
+
+
+def _inside(lat, lon, bounds):
+    return ((lat >= bounds[:, 0]) & (lat <= bounds[:, 1])
+            & (lon >= bounds[:, 2]) & (lon <= bounds[:, 3]))
+
+
+def check_coordinates(lat, lon, bounds):
+    """Classify coordinate pairs in one vectorized pass.
+
+    ``lat``/``lon`` are float arrays (NaN for missing) and ``bounds`` an
+    (n, 4) array of per-row boxes (NaN rows: no state check). Returns
+    ``(issues, fixed_lat, fixed_lon)``; the inputs are not modified.
+    """
+    issues = np.zeros(len(lat), dtype=np.uint8)
+    fixed_lat = lat.copy()
+    fixed_lon = lon.copy()
+    present = ~(np.isnan(lat) | np.isnan(lon))
+    issues[~present] = MISSING
+
+    abs_lat = np.abs(lat)
+    abs_lon = np.abs(lon)
+    off_globe = present & ((abs_lat > 90) | (abs_lon > 180))
+    mercator = off_globe & (abs_lat <= MERCATOR_MAX) & (abs_lon <= MERCATOR_MAX)
+    if mercator.any():
+        # Rounded to 7 decimals (~1 cm), about what the feeds publish
+        fixed_lon[mercator] = np.round(np.degrees(lon[mercator] / EARTH_RADIUS_M), 7)
+        fixed_lat[mercator] = np.round(np.degrees(
+            2 * np.arctan(np.exp(lat[mercator] / EARTH_RADIUS_M)) - math.pi / 2), 7)
+        issues[mercator] = REPROJECTED
+    # Off the globe even as Web Mercator: some other projection
+    issues[off_globe & ~mercator] = OUT_OF_BOUNDS
+    usable = present & ~(off_globe & ~mercator)
+
+    null_island = usable & (fixed_lat == 0) & (fixed_lon == 0)
+    issues[null_island] = NULL_ISLAND
+    fixed_lat[null_island] = np.nan
+    fixed_lon[null_island] = np.nan
+
+    outside = usable & ~null_island & ~np.isnan(bounds[:, 0]) & ~_inside(fixed_lat, fixed_lon,
+                                                                          bounds)
+    if outside.any():
+        swapped = outside & _inside(fixed_lon, fixed_lat, bounds)
+        flipped = outside & ~swapped & _inside(fixed_lat, -fixed_lon, bounds)
+        issues[swapped] = SWAPPED
+        issues[flipped] = SIGN_FLIPPED
+        issues[outside & ~swapped & ~flipped] = OUT_OF_BOUNDS
+        fixed_lat[swapped], fixed_lon[swapped] = fixed_lon[swapped], fixed_lat[swapped]
+        fixed_lon[flipped] = -fixed_lon[flipped]
+    return issues, fixed_lat, fixed_lon
+
+
+def _as_float(value):
+    if value is None or value.__class__ is float:
+        return math.nan if value is None else value
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return math.nan
+
+
+def _columns(cameras):
+    """(lat, lon, has_text) arrays for a CameraTable or a list of camera mappings."""
+    if hasattr(cameras, "coord_extra"):
+        lat = np.frombuffer(cameras.latitude, dtype=np.float64)
+        lon = np.frombuffer(cameras.longitude, dtype=np.float64)
+        has_text = np.zeros(len(lat), dtype=bool)
+        if cameras.coord_extra:
+            lat = lat.copy()
+            lon = lon.copy()
+            for (row, column), value in cameras.coord_extra.items():
+                (lat if column == 0 else lon)[row] = _as_float(value)
+                has_text[row] = True
+        return lat, lon, has_text
+    n = len(cameras)
+    lat = np.fromiter((_as_float(c.get("latitude")) for c in cameras), np.float64, n)
+    lon = np.fromiter((_as_float(c.get("longitude")) for c in cameras), np.float64, n)
+    has_text = np.fromiter((isinstance(c.get("latitude"), str) or isinstance(c.get("longitude"), str)
+                            for c in cameras), bool, n)
+    return lat, lon, has_text
+
+
+def _write_back(cameras, rows, lat, lon):
+    if hasattr(cameras, "coord_extra"):
+        np.frombuffer(cameras.latitude, dtype=np.float64)[rows] = lat[rows]
+        np.frombuffer(cameras.longitude, dtype=np.float64)[rows] = lon[rows]
+        for row in rows.tolist():
+            cameras.coord_extra.pop((row, 0), None)
+            cameras.coord_extra.pop((row, 1), None)
+        return
+    for row in rows.tolist():
+        camera = cameras[row]
+        camera["latitude"] = None if math.isnan(lat[row]) else float(lat[row])
+        camera["longitude"] = None if math.isnan(lon[row]) else float(lon[row])
+
+
+def validate_sources(sources, fix=False):
+    """Check every camera of every source in one pass.
+
+    ``sources`` are aggregated source entries ("source_id", "state",
+    "cameras"). Returns {source_id: {issue: count, ..., "samples": {issue:
+    [camera_id, ...]}}}; with ``fix`` the cameras are corrected in place.
+    """
+    if np is None:
+        raise RuntimeError("coordinate validation requires numpy")
+    sources = [source for source in sources if source.get("cameras")]
+    if not sources:
+        return {}
+    columns = [_columns(source["cameras"]) for source in sources]
+    counts = np.array([len(lat) for lat, _, _ in columns])
+    lat = np.concatenate([c[0] for c in columns])
+    lon = np.concatenate([c[1] for c in columns])
+    bounds = np.repeat(np.array([state_bounds(s.get("state")) for s in sources]), counts, axis=0)
+    issues, fixed_lat, fixed_lon = check_coordinates(lat, lon, bounds)
+
+    owner = np.repeat(np.arange(len(sources)), counts)
+    tally = np.bincount(owner * len(ISSUES) + issues,
+                        minlength=len(sources) * len(ISSUES)).reshape(len(sources), len(ISSUES))
+    report = {}
+    offsets = np.concatenate([[0], np.cumsum(counts)])
+    for i, source in enumerate(sources):
+        start, end = offsets[i], offsets[i + 1]
+        entry = {"state": source.get("state"), "checked": int(counts[i])}
+        entry.update((issue, int(tally[i, code])) for code, issue in enumerate(ISSUES) if code)
+        entry["samples"] = {}
+        source_issues = issues[start:end]
+        for code in np.unique(source_issues[source_issues > MISSING]).tolist():
+            rows = np.flatnonzero(source_issues == code)[:SAMPLES].tolist()
+            entry["samples"][ISSUES[code]] = [source["cameras"][row]["camera_id"] for row in rows]
+        if fix:
+            changed = np.isin(source_issues, _FIXED) | (columns[i][2] & ~np.isnan(lat[start:end]))
+            rows = np.flatnonzero(changed)
+            if len(rows):
+                _write_back(source["cameras"], rows, fixed_lat[start:end], fixed_lon[start:end])
+        report[source["source_id"]] = entry
+    return report
+
+
+def validate_result(result, fix=False):
+    """validate_sources for a single source entry; returns its report entry."""
+    return validate_sources([result], fix).get(result["source_id"])
+
+
+def total_issues(report):
+    return {issue: sum(entry[issue] for entry in report.values()) for issue in ISSUES[1:]}
+
+
+def print_report(report, fixed=False):
+    totals = total_issues(report)
+    checked = sum(entry["checked"] for entry in report.values())
+    found = ", ".join(f"{count} {issue}" for issue, count in totals.items() if count)
+    print(f"COORDINATES: {checked:,} checked, {found or 'all valid'}"
+          + (" (repaired where possible)" if fixed and any(totals[ISSUES[c]] for c in _FIXED)
+             else ""))
+    for source_id, entry in sorted(report.items()):
+        bad = [f"{issue} {entry[issue]}" for issue in ISSUES[1:] if entry[issue]]
+        if bad:
+            print(f"  {source_id} ({entry['state']}): {', '.join(bad)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Validate and repair camera coordinates.")
+    parser.add_argument("output", help="aggregated output file (any format)")
+    parser.add_argument("--fix", action="store_true", help="rewrite the file with fixes applied")
+    args = parser.parse_args()
+    if np is None:
+        print("validate_coordinates.py requires numpy")
+        sys.exit(1)
+
+    metadata, sources = read_output(args.output)
+    start = time.perf_counter()
+    report = validate_sources(sources, fix=args.fix)
+    elapsed = time.perf_counter() - start
+    print_report(report, fixed=args.fix)
+    print(f"Checked in {elapsed * 1000:.1f} ms")
+    if args.fix:
+        metadata["coordinate_issues"] = total_issues(report)
+        write_output(args.output, metadata, sources)
+        print(f"Output rewritten: {args.output}")
+
+
+if __name__ == "__main__":
+    main()